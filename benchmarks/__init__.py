@@ -0,0 +1,6 @@
+"""
+desktop-agent 离线基准测试
+
+不需要 GPU、付费 API 或显示器：servers 提供 Grounding / LLM 替身服务，run 驱动整条流水线并与基线对比。
+运行方式见 run 模块或 README。
+"""
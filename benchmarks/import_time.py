@@ -0,0 +1,112 @@
+# benchmarks/import_time.py
+"""
+导入耗时基准：在全新的子进程中计时 import 语句，并检查 import desktop_agent 是否提前加载了重量级依赖
+
+    python -m benchmarks.import_time --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+# 名称 -> 被计时的语句
+STATEMENTS = {
+    "package": "import desktop_agent",
+    "desktop_agent_class": "from desktop_agent import DesktopAgent",
+}
+
+# import desktop_agent 之后不应出现在 sys.modules 中的模块
+HEAVY_MODULES = (
+    "openai",
+    "anthropic",
+    "google.generativeai",
+    "pyautogui",
+    "requests",
+    "PIL",
+    "numpy",
+    "dotenv",
+)
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": elapsed, "modules": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(statement: str, runs: int = 5) -> Dict[str, Any]:
+    """
+    在 runs 个全新的解释器中执行 statement，取耗时中位数
+
+    Args:
+        statement: import 语句
+        runs: 运行次数
+
+    Returns:
+        {"ms": 中位数耗时, "runs": [每次耗时], "modules": 导入后已加载的重量级模块}
+
+    Raises:
+        RuntimeError: 子进程执行失败
+    """
+    code = _PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    timings: List[float] = []
+    modules: List[str] = []
+    for _ in range(max(1, runs)):
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"执行 {statement!r} 失败: {proc.stderr.strip()}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings.append(result["ms"])
+        modules = result["modules"]
+    return {
+        "ms": round(statistics.median(timings), 3),
+        "runs": [round(ms, 3) for ms in timings],
+        "modules": modules,
+    }
+
+
+def measure_imports(runs: int = 5, statements: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+    """对 STATEMENTS 中的每条语句调用 measure_import"""
+    statements = statements or STATEMENTS
+    return {name: {"statement": statement, **measure_import(statement, runs)} for name, statement in statements.items()}
+
+
+def compare_imports(
+    current: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float = 0.25,
+    min_delta_ms: float = 0.5,
+) -> List[str]:
+    """
+    与基线对比导入耗时和已加载的重量级模块
+
+    Returns:
+        退化项说明列表
+    """
+    regressions = []
+    for name, base in baseline.items():
+        result = current.get(name)
+        if result is None:
+            continue
+        if result["ms"] > base["ms"] * (1 + tolerance) and result["ms"] - base["ms"] > min_delta_ms:
+            regressions.append(f"{result['statement']}: 导入耗时 {result['ms']:.1f}ms > 基线 {base['ms']:.1f}ms")
+        added = sorted(set(result["modules"]) - set(base["modules"]))
+        if added:
+            regressions.append(f"{result['statement']}: 新增加载了 {', '.join(added)}")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.import_time", description="desktop-agent 导入耗时")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+    print(json.dumps(measure_imports(args.runs), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
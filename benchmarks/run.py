@@ -0,0 +1,492 @@
+# benchmarks/run.py
+"""
+离线端到端基准测试
+
+启动本地 Grounding / LLM 替身服务，用合成画面代替截图、RecordingBackend 代替真实输入，
+依次测量 VisionGrounder、DecisionAgent、Executor 和 DesktopAgent.run 的吞吐量、
+各阶段延迟（来自 tracing 直方图）和内存占用，并可与保存的基线对比：
+
+    python -m benchmarks --iterations 50 --output result.json
+    python -m benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks --baseline benchmarks/baseline.json --tolerance 0.25   # 退化时返回码为 1
+"""
+import argparse
+import dataclasses
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from PIL import Image, ImageDraw
+
+from desktop_agent.agent import DesktopAgent
+from desktop_agent.config import Config
+from desktop_agent.decision.agent import DecisionAgent
+from desktop_agent.execution.backends import RecordingBackend
+from desktop_agent.execution.executor import Executor
+from desktop_agent.tracing import tracer
+from desktop_agent.vision.grounding import VisionGrounder
+
+from .import_time import compare_imports, measure_imports
+from .servers import ChatServer, GroundingServer
+
+INSTRUCTION = "在搜索框中输入 hello world 并回车"
+
+
+@dataclass
+class BenchOptions:
+    """基准测试参数（会写入结果，对比基线时用于检查两次运行是否可比）"""
+    iterations: int = 30
+    warmup: int = 3
+    elements: int = 200
+    width: int = 1920
+    height: int = 1080
+    # 替身服务的模拟延迟（秒）
+    grounding_latency: float = 0.0
+    llm_ttft: float = 0.0
+    token_delay: float = 0.0
+    # RecordingBackend 每个输入事件的模拟耗时（秒）
+    input_latency: float = 0.0
+    capture_format: str = "png"
+    # 是否保留 Grounding 结果缓存和计划缓存（默认关闭，测量完整流水线）
+    cache: bool = False
+    # tracemalloc 统计内存峰值时运行的次数
+    memory_iterations: int = 3
+    # 导入耗时在多少个全新解释器中测量（0 表示跳过）
+    import_runs: int = 5
+
+
+@dataclass
+class ScenarioResult:
+    """一个场景的测量结果"""
+    name: str
+    ops: int
+    seconds: float
+    latencies_ms: List[float] = field(default_factory=list)
+    stages: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    memory_peak_kb: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """每秒完成的操作数"""
+        return self.ops / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ops": self.ops,
+            "seconds": round(self.seconds, 6),
+            "throughput": round(self.throughput, 3),
+            "latency_ms": _latency_stats(self.latencies_ms),
+            "stages": {
+                name: {key: round(value, 3) for key, value in stats.items()}
+                for name, stats in self.stages.items()
+            },
+            "memory_peak_kb": round(self.memory_peak_kb, 1),
+        }
+
+
+def _latency_stats(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "mean": round(statistics.fmean(ordered), 3),
+        "p50": round(pick(0.5), 3),
+        "p95": round(pick(0.95), 3),
+        "p99": round(pick(0.99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+class SyntheticScreen:
+    """合成屏幕：把替身服务返回的元素画成矩形，作为 VisionGrounder 的 frame_source"""
+
+    def __init__(self, elements: Sequence[Dict[str, Any]], size: Tuple[int, int] = (1920, 1080)):
+        image = Image.new("RGB", size, (240, 240, 240))
+        draw = ImageDraw.Draw(image)
+        for element in elements:
+            shade = 60 + (element["id"] * 37) % 160
+            draw.rectangle(element["bbox"], fill=(shade, shade, 255 - shade), outline=(0, 0, 0))
+            if element.get("text"):
+                draw.text((element["bbox"][0] + 2, element["bbox"][1] + 2), element["text"], fill=(0, 0, 0))
+        self.image = image
+
+    def __call__(self) -> Image.Image:
+        return self.image.copy()
+
+
+class ScrollingScreen:
+    """在合成屏幕上循环施加几个像素的平移（模拟滚动），用于 grounding_tracked 场景"""
+
+    def __init__(self, screen: SyntheticScreen, shifts: Sequence[Tuple[int, int]] = ((0, 0), (0, -6), (3, -12))):
+        self.frames = []
+        for dx, dy in shifts:
+            image = Image.new("RGB", screen.image.size, (240, 240, 240))
+            image.paste(screen.image, (dx, dy))
+            self.frames.append(image)
+        self._next = 0
+
+    def __call__(self) -> Image.Image:
+        image = self.frames[self._next % len(self.frames)]
+        self._next += 1
+        return image.copy()
+
+
+class Harness:
+    """启动替身服务并按 BenchOptions 组装流水线各组件"""
+
+    def __init__(self, options: BenchOptions):
+        self.options = options
+        self.grounding_server = GroundingServer(
+            latency=options.grounding_latency,
+            elements=options.elements,
+            resolution=(options.width, options.height),
+        ).start()
+        # 额外两个 Grounding 副本，其中一个有长尾延迟，用于 grounding_replicas 场景
+        self.replica_servers = [
+            GroundingServer(
+                latency=options.grounding_latency,
+                elements=options.elements,
+                resolution=(options.width, options.height),
+                slow_rate=slow_rate,
+                slow_latency=max(0.05, options.grounding_latency * 5) if slow_rate else 0.0,
+            ).start()
+            for slow_rate in (0.0, 0.2)
+        ]
+        self.chat_server = ChatServer(ttft=options.llm_ttft, token_delay=options.token_delay).start()
+
+        overrides = dict(
+            provider="vllm",
+            model="bench",
+            grounding_url=self.grounding_server.url,
+            grounding_width=options.width,
+            grounding_height=options.height,
+            grounding_incremental=False,
+            capture_format=options.capture_format,
+            input_backend="recording",
+            decision_stream=False,
+            enable_local_code=False,
+        )
+        if not options.cache:
+            overrides.update(grounding_cache_size=0, grounding_cache_dir=None, plan_cache_size=0, plan_cache_path=None)
+        self.config = dataclasses.replace(Config(), **overrides)
+
+        self.screen = SyntheticScreen(self.grounding_server.elements, (options.width, options.height))
+        self.grounder = VisionGrounder(config=self.config, frame_source=self.screen)
+        self.replica_grounder = VisionGrounder(
+            url=[self.grounding_server.url] + [server.url for server in self.replica_servers],
+            config=self.config,
+            frame_source=self.screen,
+        )
+        # 本地元素跟踪：只有第一帧调用模型，之后的小幅平移在本地重新定位
+        self.tracked_grounder = VisionGrounder(
+            config=dataclasses.replace(self.config, grounding_tracking=True),
+            frame_source=ScrollingScreen(self.screen),
+        )
+        self.decision_agent = DecisionAgent(
+            provider="vllm",
+            model="bench",
+            api_key="bench",
+            base_url=f"{self.chat_server.url}/v1",
+            config=self.config,
+        )
+        self.backend = RecordingBackend(latency=options.input_latency)
+        self.executor = Executor(config=self.config, backend=self.backend)
+        self.agent = DesktopAgent(
+            grounder=self.grounder,
+            decision_agent=self.decision_agent,
+            executor=self.executor,
+            config_instance=self.config,
+        )
+        self.vision_data = {
+            "elements": self.grounding_server.elements,
+            "resolution": [options.width, options.height],
+        }
+
+    def close(self) -> None:
+        self.executor.close()
+        self.grounder.close()
+        self.replica_grounder.close()
+        self.tracked_grounder.close()
+        self.grounding_server.stop()
+        for server in self.replica_servers:
+            server.stop()
+        self.chat_server.stop()
+
+
+def _grounding(h: Harness) -> Callable[[], Any]:
+    return lambda: h.grounder.perceive(INSTRUCTION)
+
+
+def _grounding_batch(h: Harness) -> Callable[[], Any]:
+    # 一帧多查询，合并为一次 multipart 请求
+    queries = [(None, f"{INSTRUCTION} #{i}") for i in range(4)]
+    return lambda: h.grounder.perceive_batch(queries, mode="multipart")
+
+
+def _grounding_replicas(h: Harness) -> Callable[[], Any]:
+    # 三个副本之间负载均衡，长尾请求向另一个副本对冲
+    return lambda: h.replica_grounder.perceive(INSTRUCTION)
+
+
+def _grounding_tracked(h: Harness) -> Callable[[], Any]:
+    return lambda: h.tracked_grounder.perceive(INSTRUCTION)
+
+
+def _decision(h: Harness) -> Callable[[], Any]:
+    return lambda: h.decision_agent.decide(INSTRUCTION, h.vision_data)
+
+
+def _decision_stream(h: Harness) -> Callable[[], Any]:
+    return lambda: list(h.decision_agent.decide_stream(INSTRUCTION, h.vision_data))
+
+
+def _executor(h: Harness) -> Callable[[], Any]:
+    actions = json.loads(h.chat_server.content)["actions"]
+    element_map = VisionGrounder.build_element_map(h.vision_data)
+
+    def op():
+        h.backend.clear()
+        return h.executor.execute(actions, element_map)
+
+    return op
+
+
+def _agent(h: Harness) -> Callable[[], Any]:
+    def op():
+        h.backend.clear()
+        return h.agent.run(INSTRUCTION)
+
+    return op
+
+
+# 场景名 -> 构造单次操作的函数
+SCENARIOS: Dict[str, Callable[[Harness], Callable[[], Any]]] = {
+    "grounding": _grounding,
+    "grounding_batch": _grounding_batch,
+    "grounding_replicas": _grounding_replicas,
+    "grounding_tracked": _grounding_tracked,
+    "decision": _decision,
+    "decision_stream": _decision_stream,
+    "executor": _executor,
+    "agent": _agent,
+}
+
+
+def run_scenario(name: str, harness: Harness) -> ScenarioResult:
+    """
+    运行一个场景：预热 → 计时（同时收集各阶段直方图）→ tracemalloc 统计内存峰值
+
+    Args:
+        name: 场景名，见 SCENARIOS
+        harness: 组装好的流水线
+
+    Returns:
+        测量结果
+    """
+    options = harness.options
+    op = SCENARIOS[name](harness)
+    for _ in range(options.warmup):
+        op()
+
+    gc.collect()
+    tracer.reset()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(options.iterations):
+        began = time.perf_counter()
+        op()
+        latencies.append((time.perf_counter() - began) * 1000)
+    seconds = time.perf_counter() - start
+    stages = tracer.summary()
+
+    # 单独统计内存，避免 tracemalloc 的开销影响延迟
+    peak_kb = 0.0
+    if options.memory_iterations > 0:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            for _ in range(options.memory_iterations):
+                op()
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+    return ScenarioResult(name, options.iterations, seconds, latencies, stages, peak_kb)
+
+
+def run_benchmarks(options: BenchOptions, scenarios: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    运行基准测试
+
+    Args:
+        options: 基准测试参数
+        scenarios: 要运行的场景（默认全部，空列表表示只测导入耗时）
+
+    Returns:
+        结果 dict：meta（环境和参数）、imports（导入耗时）与 scenarios（每个场景的测量结果）
+
+    Raises:
+        ValueError: 未知的场景名
+    """
+    scenarios = list(SCENARIOS) if scenarios is None else list(scenarios)
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"未知的场景: {', '.join(unknown)}")
+
+    # 在全新的子进程中测量，不受本进程已导入模块的影响
+    imports = measure_imports(options.import_runs) if options.import_runs > 0 else {}
+
+    results = {}
+    if scenarios:
+        was_enabled = tracer.enabled
+        tracer.enabled = True
+        harness = Harness(options)
+        try:
+            results = {name: run_scenario(name, harness).to_dict() for name in scenarios}
+        finally:
+            harness.close()
+            tracer.enabled = was_enabled
+            tracer.reset()
+
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": dataclasses.asdict(options),
+    }
+    if resource is not None:
+        # Linux 上单位为 KB
+        meta["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"meta": meta, "imports": imports, "scenarios": results}
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.25,
+    min_delta_ms: float = 0.5,
+) -> List[str]:
+    """
+    与基线对比，返回退化项说明（吞吐量下降、p50 延迟或内存峰值上升超过 tolerance）
+
+    Args:
+        current: 本次结果
+        baseline: 基线结果
+        tolerance: 允许的相对波动（0.25 表示 25%）
+        min_delta_ms: 单次操作耗时的绝对变化低于该值时不计为退化（过滤微秒级场景的噪声）
+
+    Returns:
+        退化项说明列表（为空表示没有退化）
+    """
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        result = current.get("scenarios", {}).get(name)
+        if result is None:
+            continue
+        if result["throughput"] < base["throughput"] * (1 - tolerance) and result["throughput"] > 0:
+            per_op_delta_ms = (1 / result["throughput"] - 1 / base["throughput"]) * 1000
+            if per_op_delta_ms > min_delta_ms:
+                regressions.append(f"{name}: 吞吐量 {result['throughput']:.2f}/s < 基线 {base['throughput']:.2f}/s")
+        p50, base_p50 = result["latency_ms"]["p50"], base["latency_ms"]["p50"]
+        if p50 > base_p50 * (1 + tolerance) and p50 - base_p50 > min_delta_ms:
+            regressions.append(f"{name}: p50 延迟 {p50:.2f}ms > 基线 {base_p50:.2f}ms")
+        if base.get("memory_peak_kb") and result["memory_peak_kb"] > base["memory_peak_kb"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: 内存峰值 {result['memory_peak_kb']:.0f}KB > 基线 {base['memory_peak_kb']:.0f}KB"
+            )
+    regressions.extend(compare_imports(current.get("imports", {}), baseline.get("imports", {}), tolerance, min_delta_ms))
+    return regressions
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """把结果格式化为文本表格"""
+    lines = []
+    for result in report.get("imports", {}).values():
+        modules = ", ".join(result["modules"]) or "-"
+        lines.append(f"{result['statement']:<40}{result['ms']:>10.1f}ms  已加载: {modules}")
+    lines.append(f"{'场景':<18}{'吞吐量/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'内存峰值 KB':>14}")
+    for name, result in report["scenarios"].items():
+        latency = result["latency_ms"]
+        lines.append(
+            f"{name:<20}{result['throughput']:>10.2f}{latency['p50']:>10.2f}"
+            f"{latency['p95']:>10.2f}{result['memory_peak_kb']:>14.0f}"
+        )
+        for stage, stats in result["stages"].items():
+            lines.append(f"    {stage:<24} n={stats['count']:<6.0f} p50={stats['p50']:.2f}ms p95={stats['p95']:.2f}ms")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    defaults = BenchOptions()
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="desktop-agent 离线基准测试")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景名（为空时只测导入耗时）")
+    parser.add_argument("--iterations", type=int, default=defaults.iterations)
+    parser.add_argument("--warmup", type=int, default=defaults.warmup)
+    parser.add_argument("--elements", type=int, default=defaults.elements, help="Grounding 替身返回的元素数量")
+    parser.add_argument("--width", type=int, default=defaults.width)
+    parser.add_argument("--height", type=int, default=defaults.height)
+    parser.add_argument("--grounding-latency", type=float, default=defaults.grounding_latency, help="秒")
+    parser.add_argument("--llm-ttft", type=float, default=defaults.llm_ttft, help="秒")
+    parser.add_argument("--token-delay", type=float, default=defaults.token_delay, help="秒")
+    parser.add_argument("--input-latency", type=float, default=defaults.input_latency, help="秒")
+    parser.add_argument("--capture-format", default=defaults.capture_format)
+    parser.add_argument("--cache", action="store_true", help="保留 Grounding 结果缓存和计划缓存")
+    parser.add_argument("--memory-iterations", type=int, default=defaults.memory_iterations)
+    parser.add_argument("--import-runs", type=int, default=defaults.import_runs, help="导入耗时的测量次数（0 表示跳过）")
+    parser.add_argument("--output", help="结果 JSON 的保存路径")
+    parser.add_argument("--baseline", help="对比的基线 JSON")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对波动")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="忽略低于该值的单次耗时变化（毫秒）")
+    args = parser.parse_args(argv)
+
+    options = BenchOptions(
+        iterations=args.iterations,
+        warmup=args.warmup,
+        elements=args.elements,
+        width=args.width,
+        height=args.height,
+        grounding_latency=args.grounding_latency,
+        llm_ttft=args.llm_ttft,
+        token_delay=args.token_delay,
+        input_latency=args.input_latency,
+        capture_format=args.capture_format,
+        cache=args.cache,
+        memory_iterations=args.memory_iterations,
+        import_runs=args.import_runs,
+    )
+    report = run_benchmarks(options, [name.strip() for name in args.scenarios.split(",") if name.strip()])
+    print(format_report(report))
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("options") != report["meta"]["options"]:
+            print("⚠️  基线的参数与本次运行不同，对比结果可能不可比", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("性能退化：", file=sys.stderr)
+            for line in regressions:
+                print(f"  - {line}", file=sys.stderr)
+            return 1
+        print(f"未发现超过 {args.tolerance:.0%} 的退化")
+    return 0
@@ -0,0 +1,314 @@
+# benchmarks/servers.py
+"""
+本地替身服务：/ground 端点和 OpenAI 兼容的 /v1/chat/completions 端点
+
+两者都在后台线程中运行 ThreadingHTTPServer，延迟和返回内容可配置，不需要 GPU 或付费 API。
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+_QUERIES_FIELD = re.compile(rb'name="queries"\r\n\r\n(.*?)\r\n--', re.S)
+
+ELEMENT_TYPES = ("button", "text_field", "label", "icon", "checkbox", "menu_item", "link")
+
+
+def make_elements(count: int, resolution: Tuple[int, int] = (1920, 1080), seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    生成确定性的合成 UI 元素
+
+    Args:
+        count: 元素数量
+        resolution: 屏幕分辨率
+        seed: 随机种子
+
+    Returns:
+        UI 元素列表（id 从 1 开始）
+    """
+    rng = random.Random(seed)
+    width, height = resolution
+    elements = []
+    for i in range(1, count + 1):
+        w, h = rng.randint(20, 240), rng.randint(16, 60)
+        x, y = rng.randint(0, width - w), rng.randint(0, height - h)
+        elements.append({
+            "id": i,
+            "bbox": [x, y, x + w, y + h],
+            "text": f"item {i}" if rng.random() < 0.7 else "",
+            "type": rng.choice(ELEMENT_TYPES),
+        })
+    return elements
+
+
+class _StandInServer:
+    """后台线程中运行的 HTTP 服务（作为上下文管理器使用）"""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        handler = type(self.handler_class.__name__, (self.handler_class,), {"server_state": self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._httpd.handle_error = self._handle_error
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @staticmethod
+    def _handle_error(request, client_address) -> None:
+        # 客户端提前断开（如对冲请求的失败方被取消）属于正常情况，其余错误照常打印
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            ThreadingHTTPServer.handle_error(None, request, client_address)
+
+    def _count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，不关闭 Nagle 会与客户端的延迟 ACK 叠加出约 40ms 的停顿
+    disable_nagle_algorithm = True
+    server_state: Any = None
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _GroundingHandler(_Handler):
+    def do_POST(self) -> None:
+        state: GroundingServer = self.server_state
+        body = self._read_body()
+        state._count()
+        path = self.path.rstrip("/")
+        if path == "/ground":
+            items, payload = 1, state.body
+        elif path == "/ground_batch":
+            # 批量请求：queries 字段为 JSON 列表，每条查询返回同一组元素
+            match = _QUERIES_FIELD.search(body)
+            items = len(json.loads(match.group(1))) if match else 0
+            payload = b'{"results": [' + b", ".join([state.body] * items) + b"]}"
+        else:
+            self._send_json({"error": "not found"}, status=404)
+            return
+        delay = state.latency + state.item_latency * items
+        failing = False
+        with state._lock:
+            if state.slow_rate and state._rng.random() < state.slow_rate:
+                delay += state.slow_latency
+            if state.fail_rate and state._rng.random() < state.fail_rate:
+                failing = True
+        if delay > 0:
+            time.sleep(delay)
+        if failing:
+            self._send_json({"error": "overloaded"}, status=503)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class GroundingServer(_StandInServer):
+    """
+    /ground 端点的替身：忽略上传的截图，固定返回 elements 个合成元素
+
+    同时提供 /ground_batch：每条查询返回同样的结果，耗时为 latency + item_latency * 查询数，
+    用于模拟批处理推理（固定开销被一批请求分摊）。
+
+    slow_rate / fail_rate 按比例注入长尾延迟和 503，用于测试多副本的负载均衡、对冲和熔断；
+    这些属性可以在运行中修改（例如把 fail_rate 设为 1 模拟副本宕机）。
+
+    示例：
+        with GroundingServer(latency=0.05, elements=200) as server:
+            grounder = VisionGrounder(url=server.url, frame_source=...)
+    """
+
+    handler_class = _GroundingHandler
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        elements: int = 50,
+        item_latency: float = 0.0,
+        resolution: Tuple[int, int] = (1920, 1080),
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        fail_rate: float = 0.0,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """
+        Args:
+            latency: 每个请求模拟的推理耗时（秒）
+            elements: 返回的 UI 元素数量
+            item_latency: 每条查询额外的推理耗时（秒）
+            resolution: 返回的分辨率
+            slow_rate: 额外变慢的请求比例
+            slow_latency: 变慢的请求额外的耗时（秒）
+            fail_rate: 返回 503 的请求比例
+            seed: 注入长尾和失败使用的随机种子
+            host: 监听地址
+            port: 监听端口（0 表示随机端口）
+        """
+        super().__init__(host, port)
+        self.latency = latency
+        self.item_latency = item_latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+        self.elements = make_elements(elements, resolution)
+        self.body = json.dumps({"elements": self.elements, "resolution": list(resolution)}).encode("utf-8")
+
+
+class _ChatHandler(_Handler):
+    def do_POST(self) -> None:
+        state: ChatServer = self.server_state
+        request = json.loads(self._read_body() or b"{}")
+        state._count()
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in request.get("messages", [])) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(state.content) // 4,
+            "total_tokens": prompt_tokens + len(state.content) // 4,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        if state.ttft > 0:
+            time.sleep(state.ttft)
+        if request.get("stream"):
+            self._stream(state, request, usage)
+            return
+        if state.token_delay > 0:
+            time.sleep(state.token_delay * len(state.chunks))
+        self._send_json({
+            "id": "bench",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request.get("model", "bench"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": state.content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _stream(self, state: "ChatServer", request: Dict[str, Any], usage: Dict[str, Any]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        model = request.get("model", "bench")
+        for piece in state.chunks:
+            self._event({
+                "id": "bench",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            })
+            if state.token_delay > 0:
+                time.sleep(state.token_delay)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._event({
+                "id": "bench",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            })
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _event(self, payload: Dict[str, Any]) -> None:
+        self._write_chunk(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+class ChatServer(_StandInServer):
+    """
+    OpenAI 兼容 /v1/chat/completions 端点的替身（支持 SSE 流式输出和 usage）
+
+    DecisionAgent 以 provider="vllm"、base_url=server.url + "/v1" 连接。
+    """
+
+    handler_class = _ChatHandler
+
+    def __init__(
+        self,
+        ttft: float = 0.0,
+        token_delay: float = 0.0,
+        actions: Optional[List[Dict[str, Any]]] = None,
+        chunk_size: int = 8,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """
+        Args:
+            ttft: 首 token 延迟（秒）
+            token_delay: 每个流式分块之间的延迟（秒），非流式请求按分块数累计
+            actions: 固定返回的动作列表（默认点击 1 号元素、输入文本并回车）
+            chunk_size: 流式输出时每个分块的字符数
+            host: 监听地址
+            port: 监听端口（0 表示随机端口）
+        """
+        super().__init__(host, port)
+        self.ttft = ttft
+        self.token_delay = token_delay
+        if actions is None:
+            actions = [
+                {"type": "click", "element_id": 1},
+                {"type": "type", "element_id": 2, "text": "hello world"},
+                {"type": "press", "key": "enter"},
+            ]
+        self.content = json.dumps({"actions": actions})
+        self.chunks = [self.content[i:i + chunk_size] for i in range(0, len(self.content), chunk_size)]
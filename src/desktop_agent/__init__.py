@@ -6,24 +6,61 @@ Desktop Agent - 桌面自动化代理
 - VisionGrounder: 视觉感知（截图和 UI 元素识别）
 - DecisionAgent: 决策代理（LLM 生成动作序列）
 - Executor: 执行器（执行动作序列）
+- SessionPool / run_many: 多会话并行（每个会话一个进程和虚拟显示器）
 - Config: 配置管理
+
+除 Config / config 外，组件在第一次访问时才导入（import desktop_agent 不加载 Pillow、requests、
+LLM SDK 或 pyautogui，也不需要显示器）；config 在第一次读取属性时才加载 .env。
 """
+import importlib
+from typing import TYPE_CHECKING
 
-from .agent import DesktopAgent
-from .vision.grounding import VisionGrounder
-from .vision.capture import capture_screenshot
-from .decision.agent import DecisionAgent
-from .execution.executor import Executor
 from .config import Config, config
 
 __version__ = "0.1.0"
+
+# 名称 -> 所在模块（相对于本包）
+_LAZY_EXPORTS = {
+    "DesktopAgent": ".agent",
+    "TaskResult": ".agent",
+    "VisionGrounder": ".vision.grounding",
+    "capture_screenshot": ".vision.capture",
+    "DecisionAgent": ".decision.agent",
+    "Executor": ".execution.executor",
+    "SessionPool": ".sessions",
+    "run_many": ".sessions",
+}
+
 __all__ = [
     "DesktopAgent",
+    "TaskResult",
     "VisionGrounder",
     "capture_screenshot",
     "DecisionAgent",
     "Executor",
+    "SessionPool",
+    "run_many",
     "Config",
     "config",
 ]
 
+if TYPE_CHECKING:
+    from .agent import DesktopAgent, TaskResult
+    from .vision.grounding import VisionGrounder
+    from .vision.capture import capture_screenshot
+    from .decision.agent import DecisionAgent
+    from .execution.executor import Executor
+    from .sessions import SessionPool, run_many
+
+
+def __getattr__(name: str):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
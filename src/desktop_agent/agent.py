@@ -1,17 +1,48 @@
 """
 高层 DesktopAgent 类：统一管理整个桌面自动化流程
 """
+import asyncio
+import json
 import logging
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
 from .vision.grounding import VisionGrounder
+from .vision.settle import SettleDetector, SettleResult
 from .decision.agent import DecisionAgent
+from .decision.cascade import DecisionCascade
+from .decision.speculation import SpeculativeDecider
 from .execution.executor import Executor
 from .config import Config, config
 from .types import VisionData, Action, ElementMap
+from .tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class StepRecord:
+    """多步任务中的一步"""
+    actions: List[Action]
+    vision_data: VisionData
+    # 动作执行后的屏幕稳定等待结果（任务完成的那一步为 None）
+    settle: Optional[SettleResult] = None
+    # 动作是否来自推测式决策（基于上一步视觉数据生成、经新感知结果校验后采用）
+    speculative: bool = False
+
+
+@dataclass
+class TaskResult:
+    """run_until_done 的结果"""
+    # 模型是否报告任务完成（False 表示达到步数上限）
+    done: bool
+    steps: List[StepRecord] = field(default_factory=list)
+
+    @property
+    def actions(self) -> List[Action]:
+        """所有步骤执行的动作"""
+        return [action for step in self.steps for action in step.actions]
+
+
 class DesktopAgent:
     """
     桌面自动化代理
@@ -28,34 +59,49 @@ class DesktopAgent:
         decision_agent: Optional[DecisionAgent] = None,
         executor: Optional[Executor] = None,
         config_instance: Optional[Config] = None,
+        settle_detector: Optional[SettleDetector] = None,
+        speculative: Optional[bool] = None,
     ):
         """
         Args:
             grounder: 视觉感知器（如未提供则使用 config 创建）
-            decision_agent: 决策代理（如未提供则使用 config 创建）
+            decision_agent: 决策代理（如未提供则使用 config 创建；配置了 DECISION_TIERS 时为 DecisionCascade）
             executor: 执行器（如未提供则使用 config 创建）
             config_instance: 配置对象（默认使用全局 config）
+            settle_detector: 多步任务中动作执行后的屏幕稳定检测（如未提供则使用 config 创建）
+            speculative: 多步任务中是否推测式决策（默认读取 config.agent_speculative，仅非流式决策时生效）
         """
         self.config = config_instance or config
         
         # 初始化组件
         self.grounder = grounder or VisionGrounder(config=self.config)
-        self.decision_agent = decision_agent or DecisionAgent(
-            provider=self.config.provider,
-            model=self.config.model,
-            config=self.config
-        )
+        if decision_agent is None:
+            if self.config.decision_tiers:
+                decision_agent = DecisionCascade.from_config(self.config)
+            else:
+                decision_agent = DecisionAgent(
+                    provider=self.config.provider,
+                    model=self.config.model,
+                    config=self.config
+                )
+        self.decision_agent = decision_agent
         self.executor = executor or Executor(
             enable_local_code=self.config.enable_local_code,
             config=self.config
         )
+        self.settle_detector = settle_detector or SettleDetector.from_config(
+            self.config, capture=getattr(self.grounder, "capture", None)
+        )
+        self.speculative = self.config.agent_speculative if speculative is None else speculative
+        self.speculator = SpeculativeDecider.from_config(self.decision_agent, self.config)
     
-    def run(self, instruction: str) -> tuple[list[Action], VisionData]:
+    def run(self, instruction: str, stream: Optional[bool] = None) -> tuple[list[Action], VisionData]:
         """
         执行完整的桌面自动化流程
         
         Args:
             instruction: 用户指令
+            stream: 是否流式决策（LLM 每生成一个动作就立即执行，默认读取 config.decision_stream）
         
         Returns:
             (动作序列, 视觉数据)
@@ -64,29 +110,279 @@ class DesktopAgent:
             RuntimeError: 执行失败时抛出
         """
         logger.info(f"开始执行任务: {instruction}")
+        vision_data = None
         
-        try:
-            # 1. 视觉感知
-            logger.debug("步骤 1: 视觉感知")
-            vision_data = self.grounder.perceive(instruction)
-            logger.info(f"识别到 {len(vision_data['elements'])} 个 UI 元素")
+        with tracer.span("agent.run") as span:
+            try:
+                # 1. 视觉感知
+                logger.debug("步骤 1: 视觉感知")
+                vision_data = self.grounder.perceive(instruction)
+                logger.info(f"识别到 {len(vision_data['elements'])} 个 UI 元素")
+                
+                element_map = VisionGrounder.build_element_map(vision_data)
+                if self._streaming(stream):
+                    # 2+3. 流式决策，边生成边执行
+                    logger.debug("步骤 2: 流式决策并执行")
+                    actions = self.executor.execute(
+                        self.decision_agent.decide_stream(instruction, vision_data), element_map
+                    )
+                else:
+                    # 2. 决策
+                    logger.debug("步骤 2: 决策生成")
+                    actions = self.decision_agent.decide(instruction, vision_data)
+                    logger.info(f"生成 {len(actions)} 个动作")
+                    
+                    # 3. 执行
+                    logger.debug("步骤 3: 执行动作")
+                    self.executor.execute(actions, element_map)
+                
+                span.set_attribute("actions", len(actions))
+                logger.info(f"✅ 任务完成！执行了 {len(actions)} 个动作")
+                return actions, vision_data
+                
+            except Exception as e:
+                logger.error(f"任务执行失败: {e}")
+                if vision_data is not None:
+                    # 失败的计划不应再被缓存复用
+                    self.decision_agent.invalidate_plan(instruction, vision_data)
+                raise RuntimeError(f"桌面自动化任务失败: {e}") from e
+    
+    async def arun(self, instruction: str, stream: Optional[bool] = None) -> tuple[list[Action], VisionData]:
+        """
+        run 的异步版本
+        
+        截图/编码和 pyautogui 执行在线程池中进行，Grounding 和 LLM 请求使用异步客户端，
+        因此同一事件循环中的多个代理可以并发运行，彼此的网络等待相互重叠。
+        
+        Args:
+            instruction: 用户指令
+            stream: 是否流式决策（默认读取 config.decision_stream）
+        
+        Returns:
+            (动作序列, 视觉数据)
+        
+        Raises:
+            RuntimeError: 执行失败时抛出
+        """
+        logger.info(f"开始执行任务: {instruction}")
+        vision_data = None
+        
+        with tracer.span("agent.run") as span:
+            try:
+                vision_data = await self.grounder.aperceive(instruction)
+                logger.info(f"识别到 {len(vision_data['elements'])} 个 UI 元素")
+                
+                element_map = VisionGrounder.build_element_map(vision_data)
+                if self._streaming(stream):
+                    actions = await self.executor.aexecute(
+                        self.decision_agent.adecide_stream(instruction, vision_data), element_map
+                    )
+                else:
+                    actions = await self.decision_agent.adecide(instruction, vision_data)
+                    logger.info(f"生成 {len(actions)} 个动作")
+                    await self.executor.aexecute(actions, element_map)
+                
+                span.set_attribute("actions", len(actions))
+                logger.info(f"✅ 任务完成！执行了 {len(actions)} 个动作")
+                return actions, vision_data
+                
+            except Exception as e:
+                logger.error(f"任务执行失败: {e}")
+                if vision_data is not None:
+                    # 失败的计划不应再被缓存复用
+                    self.decision_agent.invalidate_plan(instruction, vision_data)
+                raise RuntimeError(f"桌面自动化任务失败: {e}") from e
+    
+    def run_until_done(
+        self,
+        instruction: str,
+        max_steps: Optional[int] = None,
+        stream: Optional[bool] = None
+    ) -> TaskResult:
+        """
+        多步闭环执行：感知 → 决策 → 执行 → 等待屏幕稳定，直到模型输出 done 动作或达到步数上限
+        
+        每一步都会把之前执行过的动作告诉模型；动作执行后不做固定 sleep，
+        而是轮询低分辨率帧，屏幕连续若干帧不再变化就进入下一步。
+        启用推测式决策时，从第二步起 LLM 调用与新一轮 Grounding 并行进行（见 SpeculativeDecider）。
+        
+        Args:
+            instruction: 用户指令
+            max_steps: 最大步数（默认读取 config.agent_max_steps）
+            stream: 是否流式决策（默认读取 config.decision_stream）
+        
+        Returns:
+            任务结果（done 和每一步的动作、视觉数据）
+        
+        Raises:
+            RuntimeError: 某一步执行失败时抛出
+        """
+        max_steps = max_steps or self.config.agent_max_steps
+        logger.info(f"开始执行多步任务: {instruction}（最多 {max_steps} 步）")
+        result = TaskResult(done=False)
+        history: List[str] = []
+        
+        previous: Optional[VisionData] = None
+        
+        for step in range(1, max_steps + 1):
+            vision_data = None
+            speculation = None
+            speculative = False
+            if self.speculative and previous is not None and not self._streaming(stream):
+                speculation = self.speculator.speculate(instruction, previous, history)
+            try:
+                vision_data = self.grounder.perceive(instruction)
+                element_map = VisionGrounder.build_element_map(vision_data)
+                if self._streaming(stream):
+                    actions = self.executor.execute(
+                        self.decision_agent.decide_stream(instruction, vision_data, history), element_map
+                    )
+                else:
+                    actions = self.speculator.resolve(speculation, vision_data) if speculation else None
+                    speculative = actions is not None
+                    if actions is None:
+                        actions = self.decision_agent.decide(instruction, vision_data, history)
+                    self.executor.execute(actions, element_map)
+            except Exception as e:
+                self.speculator.discard(speculation)
+                logger.error(f"第 {step} 步执行失败: {e}")
+                raise RuntimeError(f"桌面自动化任务失败（第 {step} 步）: {e}") from e
             
-            # 2. 决策
-            logger.debug("步骤 2: 决策生成")
-            actions = self.decision_agent.decide(instruction, vision_data)
-            logger.info(f"生成 {len(actions)} 个动作")
+            previous = vision_data
+            record = StepRecord(actions=actions, vision_data=vision_data, speculative=speculative)
+            result.steps.append(record)
+            if self._is_done(actions):
+                result.done = True
+                logger.info(f"✅ 任务完成！共 {step} 步")
+                return result
             
-            # 3. 执行
-            logger.debug("步骤 3: 执行动作")
-            element_map = VisionGrounder.build_element_map(vision_data)
-            self.executor.execute(actions, element_map)
+            record.settle = self.settle_detector.wait()
+            tracer.observe("agent.settle", record.settle.elapsed_ms)
+            logger.debug(
+                f"第 {step} 步执行了 {len(actions)} 个动作，"
+                f"屏幕{'已稳定' if record.settle.settled else '等待超时'}（{record.settle.elapsed_ms:.0f}ms）"
+            )
+            history.extend(self._describe(action) for action in actions)
+        
+        logger.warning(f"达到步数上限 {max_steps}，任务未完成")
+        return result
+    
+    async def arun_until_done(
+        self,
+        instruction: str,
+        max_steps: Optional[int] = None,
+        stream: Optional[bool] = None
+    ) -> TaskResult:
+        """
+        run_until_done 的异步版本（屏幕稳定等待在线程池中进行）
+        
+        Args:
+            instruction: 用户指令
+            max_steps: 最大步数（默认读取 config.agent_max_steps）
+            stream: 是否流式决策（默认读取 config.decision_stream）
+        
+        Returns:
+            任务结果
+        
+        Raises:
+            RuntimeError: 某一步执行失败时抛出
+        """
+        max_steps = max_steps or self.config.agent_max_steps
+        logger.info(f"开始执行多步任务: {instruction}（最多 {max_steps} 步）")
+        loop = asyncio.get_running_loop()
+        result = TaskResult(done=False)
+        history: List[str] = []
+        
+        previous: Optional[VisionData] = None
+        
+        for step in range(1, max_steps + 1):
+            vision_data = None
+            speculation = None
+            speculative = False
+            if self.speculative and previous is not None and not self._streaming(stream):
+                speculation = await self.speculator.aspeculate(instruction, previous, history)
+            try:
+                vision_data = await self.grounder.aperceive(instruction)
+                element_map = VisionGrounder.build_element_map(vision_data)
+                if self._streaming(stream):
+                    actions = await self.executor.aexecute(
+                        self.decision_agent.adecide_stream(instruction, vision_data, history), element_map
+                    )
+                else:
+                    actions = await self.speculator.aresolve(speculation, vision_data) if speculation else None
+                    speculative = actions is not None
+                    if actions is None:
+                        actions = await self.decision_agent.adecide(instruction, vision_data, history)
+                    await self.executor.aexecute(actions, element_map)
+            except Exception as e:
+                self.speculator.discard(speculation)
+                logger.error(f"第 {step} 步执行失败: {e}")
+                raise RuntimeError(f"桌面自动化任务失败（第 {step} 步）: {e}") from e
             
-            logger.info(f"✅ 任务完成！执行了 {len(actions)} 个动作")
-            return actions, vision_data
+            previous = vision_data
+            record = StepRecord(actions=actions, vision_data=vision_data, speculative=speculative)
+            result.steps.append(record)
+            if self._is_done(actions):
+                result.done = True
+                logger.info(f"✅ 任务完成！共 {step} 步")
+                return result
             
-        except Exception as e:
-            logger.error(f"任务执行失败: {e}")
-            raise RuntimeError(f"桌面自动化任务失败: {e}") from e
+            record.settle = await loop.run_in_executor(None, self.settle_detector.wait)
+            tracer.observe("agent.settle", record.settle.elapsed_ms)
+            history.extend(self._describe(action) for action in actions)
+        
+        logger.warning(f"达到步数上限 {max_steps}，任务未完成")
+        return result
+    
+    def speculation_stats(self) -> Dict[str, float]:
+        """推测式决策的命中率和节省的延迟（见 SpeculativeDecider.stats）"""
+        return self.speculator.stats()
+    
+    @staticmethod
+    def _is_done(actions: List[Action]) -> bool:
+        return any(action.get("type") == "done" for action in actions)
+    
+    @staticmethod
+    def _describe(action: Action) -> str:
+        """动作的简短描述，写入后续步骤的 prompt"""
+        return json.dumps(action, ensure_ascii=False)
+    
+    @staticmethod
+    async def arun_many(
+        tasks: Iterable[Tuple["DesktopAgent", str]],
+        return_exceptions: bool = False,
+    ) -> list:
+        """
+        在同一事件循环中并发运行多个代理
+        
+        Args:
+            tasks: (代理, 指令) 列表
+            return_exceptions: 为 True 时失败的任务返回异常对象而不是中断其余任务
+        
+        Returns:
+            与 tasks 顺序一致的 (动作序列, 视觉数据) 列表
+        """
+        return await asyncio.gather(
+            *(agent.arun(instruction) for agent, instruction in tasks),
+            return_exceptions=return_exceptions,
+        )
+    
+    async def aperceive(self, instruction: Optional[str] = None) -> VisionData:
+        """perceive 的异步版本"""
+        return await self.grounder.aperceive(instruction)
+    
+    async def adecide(
+        self,
+        instruction: str,
+        vision_data: Optional[VisionData] = None
+    ) -> list[Action]:
+        """decide 的异步版本"""
+        if vision_data is None:
+            vision_data = await self.grounder.aperceive(instruction)
+        return await self.decision_agent.adecide(instruction, vision_data)
+    
+    def _streaming(self, stream: Optional[bool]) -> bool:
+        return self.config.decision_stream if stream is None else stream
     
     def perceive(self, instruction: Optional[str] = None) -> VisionData:
         """
@@ -1,32 +1,213 @@
 # src/desktop_agent/config.py
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Literal
+from dataclasses import dataclass, field
+from typing import Any, Callable, Literal, Optional
 import os
-from dotenv import load_dotenv
+import threading
+
+# .env 在第一次创建 Config 时才加载，import 本模块不读取任何文件或环境变量
+_dotenv_loaded = False
+
+
+def _load_dotenv() -> None:
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        _dotenv_loaded = True
+        from dotenv import load_dotenv
+        load_dotenv()
+
+
+def _env(name: str, default: Optional[str] = None, cast: Optional[Callable[[str], Any]] = None):
+    """配置项的默认值：创建 Config 实例时读取环境变量 name（未设置时使用 default，再经 cast 转换）"""
+    def factory():
+        _load_dotenv()
+        value = os.getenv(name, default)
+        if value is None or (cast is not None and value == "" and default is None):
+            return None
+        return cast(value) if cast is not None else value
+    return field(default_factory=factory)
+
+
+def _env_flag(name: str, default: str = "false"):
+    """布尔配置项：环境变量为 true（不区分大小写）时为 True"""
+    return _env(name, default, lambda value: value.lower() == "true")
 
-# 自动加载 .env
-load_dotenv()
 
 @dataclass
 class Config:
     # 主模型
-    provider: Literal["openai", "anthropic", "gemini", "vllm"] = os.getenv("PROVIDER", "openai")
-    model: str = os.getenv("MAIN_MODEL", "gpt-4o")
+    provider: Literal["openai", "anthropic", "gemini", "vllm"] = _env("PROVIDER", "openai")
+    model: str = _env("MAIN_MODEL", "gpt-4o")
+    # 流式决策：LLM 每生成完一个动作就立即执行
+    decision_stream: bool = _env_flag("DECISION_STREAM")
+    # 分级决策：逗号分隔的 provider:model[@base_url]（从快到慢），为空时只使用 PROVIDER / MAIN_MODEL
+    decision_tiers: str = _env("DECISION_TIERS", "")
+    decision_min_confidence: float = _env("DECISION_MIN_CONFIDENCE", "0.5", float)
+
+    # UI 元素 prompt 编码（json/compact；0 表示关闭对应功能）
+    prompt_format: str = _env("PROMPT_FORMAT", "json")
+    prompt_bbox_quantum: int = _env("PROMPT_BBOX_QUANTUM", "0", int)
+    prompt_top_k: int = _env("PROMPT_TOP_K", "0", int)
+    prompt_token_budget: int = _env("PROMPT_TOKEN_BUDGET", "0", int)
+
+    # 决策计划缓存（相同指令 + 相同界面结构时跳过 LLM）
+    plan_cache_size: int = _env("PLAN_CACHE_SIZE", "256", int)
+    plan_cache_ttl: float = _env("PLAN_CACHE_TTL", "3600", float)
+    plan_cache_path: str | None = _env("PLAN_CACHE_PATH")
 
     # Grounding 模型
-    grounding_url: str = os.getenv("GROUNDING_URL", "http://localhost:8080")
-    grounding_model: str = os.getenv("GROUNDING_MODEL", "ui-tars-1.5-7b")
-    grounding_api_key: str | None = os.getenv("GROUNDING_API_KEY")
-    grounding_width: int = int(os.getenv("GROUNDING_WIDTH", "1920"))
-    grounding_height: int = int(os.getenv("GROUNDING_HEIGHT", "1080"))
+    grounding_url: str = _env("GROUNDING_URL", "http://localhost:8080")
+    grounding_model: str = _env("GROUNDING_MODEL", "ui-tars-1.5-7b")
+    grounding_api_key: str | None = _env("GROUNDING_API_KEY")
+    grounding_width: int = _env("GROUNDING_WIDTH", "1920", int)
+    grounding_height: int = _env("GROUNDING_HEIGHT", "1080", int)
+
+    # Grounding HTTP 传输（连接池、超时、重试）
+    grounding_pool_size: int = _env("GROUNDING_POOL_SIZE", "4", int)
+    grounding_connect_timeout: float = _env("GROUNDING_CONNECT_TIMEOUT", "5", float)
+    grounding_read_timeout: float = _env("GROUNDING_READ_TIMEOUT", "30", float)
+    grounding_max_retries: int = _env("GROUNDING_MAX_RETRIES", "2", int)
+    grounding_retry_backoff: float = _env("GROUNDING_RETRY_BACKOFF", "0.5", float)
+    grounding_retry_backoff_max: float = _env("GROUNDING_RETRY_BACKOFF_MAX", "8.0", float)
+
+    # 批量 Grounding（concurrent: 并发单条请求；multipart: 一次请求多帧多指令）与微批处理窗口
+    grounding_batch_mode: str = _env("GROUNDING_BATCH_MODE", "concurrent")
+    grounding_batch_path: str = _env("GROUNDING_BATCH_PATH", "/ground_batch")
+    grounding_batch_size: int = _env("GROUNDING_BATCH_SIZE", "8", int)
+    grounding_batch_window_ms: float = _env("GROUNDING_BATCH_WINDOW_MS", "5", float)
+
+    # 多个 Grounding 副本（GROUNDING_URL 以逗号分隔）：选择策略 ewma/least_inflight、对冲请求与熔断
+    grounding_balance_policy: str = _env("GROUNDING_BALANCE_POLICY", "ewma")
+    grounding_hedge: bool = _env_flag("GROUNDING_HEDGE", "true")
+    grounding_hedge_quantile: float = _env("GROUNDING_HEDGE_QUANTILE", "0.95", float)
+    grounding_hedge_min_ms: float = _env("GROUNDING_HEDGE_MIN_MS", "20", float)
+    grounding_breaker_failures: int = _env("GROUNDING_BREAKER_FAILURES", "3", int)
+    grounding_breaker_cooldown: float = _env("GROUNDING_BREAKER_COOLDOWN", "10", float)
+
+    # Grounding 结果缓存（屏幕未变化时复用上次结果）
+    grounding_cache_size: int = _env("GROUNDING_CACHE_SIZE", "128", int)
+    grounding_cache_ttl: float = _env("GROUNDING_CACHE_TTL", "300", float)
+    grounding_cache_dir: str | None = _env("GROUNDING_CACHE_DIR")
+
+    # 增量 Grounding（只上传变化区域）
+    grounding_incremental: bool = _env_flag("GROUNDING_INCREMENTAL")
+    grounding_incremental_max_area: float = _env("GROUNDING_INCREMENTAL_MAX_AREA", "0.5", float)
+    grounding_diff_tile: int = _env("GROUNDING_DIFF_TILE", "32", int)
+    grounding_diff_threshold: int = _env("GROUNDING_DIFF_THRESHOLD", "16", int)
+
+    # 本地元素跟踪（界面小幅滚动/移动时用 NCC 模板匹配平移 bbox，不调用模型）
+    grounding_tracking: bool = _env_flag("GROUNDING_TRACKING")
+    grounding_tracking_radius: int = _env("GROUNDING_TRACKING_RADIUS", "32", int)
+    grounding_tracking_patch: int = _env("GROUNDING_TRACKING_PATCH", "32", int)
+    grounding_tracking_min_score: float = _env("GROUNDING_TRACKING_MIN_SCORE", "0.9", float)
+    grounding_tracking_max_change: float = _env("GROUNDING_TRACKING_MAX_CHANGE", "0.02", float)
+    grounding_tracking_max_region: int = _env("GROUNDING_TRACKING_MAX_REGION", "4096", int)
+
+    # 截图编码（png/jpeg/webp/raw；缩放滤镜 nearest/box/bilinear/hamming/bicubic/lanczos）
+    capture_format: str = _env("CAPTURE_FORMAT", "png")
+    capture_quality: int = _env("CAPTURE_QUALITY", "85", int)
+    capture_png_compress_level: int = _env("CAPTURE_PNG_COMPRESS_LEVEL", "6", int)
+    capture_resample: str = _env("CAPTURE_RESAMPLE", "lanczos")
+    capture_color_mode: str = _env("CAPTURE_COLOR_MODE", "RGB")
+    # 截图后端（pyautogui/mss）；CAPTURE_CONTINUOUS 开启后由后台线程按 CAPTURE_FPS 抓屏，
+    # 写入 CAPTURE_BUFFER 帧的环形缓冲区，感知和稳定检测直接读取最新一帧
+    capture_backend: str = _env("CAPTURE_BACKEND", "pyautogui")
+    capture_continuous: bool = _env_flag("CAPTURE_CONTINUOUS")
+    capture_fps: float = _env("CAPTURE_FPS", "30", float)
+    capture_buffer: int = _env("CAPTURE_BUFFER", "4", int)
+
+    # 输入后端（pyautogui/recording）；INPUT_PAUSE 为每个事件后的停顿，0 为快速模式，不设置时沿用 pyautogui 默认的 0.1 秒
+    input_backend: str = _env("INPUT_BACKEND", "pyautogui")
+    input_pause: float | None = _env("INPUT_PAUSE", cast=float)
+    # 文本输入方式：write（逐字符）、paste（剪贴板粘贴）、auto（长文本或非 ASCII 文本时粘贴）
+    input_text_mode: str = _env("INPUT_TEXT_MODE", "write")
+    input_paste_threshold: int = _env("INPUT_PASTE_THRESHOLD", "32", int)
+    # 执行前合并冗余输入事件（click 后紧跟 type 同一元素、连续 press 等）
+    executor_optimize: bool = _env_flag("EXECUTOR_OPTIMIZE", "true")
+
+    # 多步任务：最大步数；动作执行后轮询低分辨率帧，连续 SETTLE_FRAMES 帧无变化即进入下一步
+    agent_max_steps: int = _env("AGENT_MAX_STEPS", "10", int)
+    settle_interval: float = _env("SETTLE_INTERVAL", "0.05", float)
+    settle_frames: int = _env("SETTLE_FRAMES", "3", int)
+    settle_timeout: float = _env("SETTLE_TIMEOUT", "5", float)
+    settle_min_wait: float = _env("SETTLE_MIN_WAIT", "0.1", float)
+    # 推测式决策：新一轮 Grounding 进行时先用上一步的视觉数据决策，计划引用的元素未变化时直接采用
+    agent_speculative: bool = _env_flag("AGENT_SPECULATIVE")
+    speculation_bbox_tolerance: int = _env("SPECULATION_BBOX_TOLERANCE", "4", int)
+    speculation_min_match: float = _env("SPECULATION_MIN_MATCH", "0.8", float)
+
+    # 追踪：各阶段 span 与延迟直方图（导出器 jsonl/otel，为空时只保留进程内直方图）
+    tracing_enabled: bool = _env_flag("TRACING")
+    tracing_exporter: str = _env("TRACING_EXPORTER", "")
+    tracing_path: str | None = _env("TRACING_PATH")
+
+    # 多会话并行：每个会话一个进程和一个 Xvfb 显示器；并发上限为 0 表示不限制
+    session_pool_size: int = _env("SESSION_POOL_SIZE", "2", int)
+    session_display_start: int = _env("SESSION_DISPLAY_START", "99", int)
+    session_screen: str = _env("SESSION_SCREEN", "1920x1080x24")
+    session_grounding_limit: int = _env("SESSION_GROUNDING_LIMIT", "0", int)
+    session_llm_limit: int = _env("SESSION_LLM_LIMIT", "0", int)
 
     # 安全控制
-    enable_local_code: bool = os.getenv("ENABLE_LOCAL_CODE", "false").lower() == "true"
+    enable_local_code: bool = _env_flag("ENABLE_LOCAL_CODE")
+
+    # code 动作的常驻沙箱进程池（池大小为 0 时每次新建子进程；预加载模块以逗号分隔）
+    code_pool_size: int = _env("CODE_POOL_SIZE", "2", int)
+    code_timeout: float = _env("CODE_TIMEOUT", "10", float)
+    code_warm_imports: str = _env("CODE_WARM_IMPORTS", "")
+    code_memory_limit_mb: int = _env("CODE_MEMORY_LIMIT_MB", "512", int)
+    code_max_tasks_per_worker: int = _env("CODE_MAX_TASKS_PER_WORKER", "100", int)
 
     @classmethod
     def from_env(cls) -> "Config":
         return cls()
 
+
+_config: Optional[Config] = None
+_config_lock = threading.Lock()
+
+
+def get_config() -> Config:
+    """全局配置实例（首次调用时加载 .env 并读取环境变量）"""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = Config.from_env()
+    return _config
+
+
+class _LazyConfig:
+    """
+    全局配置的延迟代理：第一次访问属性时才调用 get_config()
+
+    isinstance(config, Config)、dataclasses.replace / asdict、比较和 pickle 都按真实的 Config 处理。
+    """
+
+    __slots__ = ()
+    __dataclass_fields__ = Config.__dataclass_fields__
+
+    @property
+    def __class__(self):
+        return Config
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_config(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(get_config(), name, value)
+
+    def __eq__(self, other: Any) -> bool:
+        return get_config() == other
+
+    __hash__ = None
+
+    def __reduce_ex__(self, protocol):
+        return get_config().__reduce_ex__(protocol)
+
+    def __repr__(self) -> str:
+        return repr(get_config())
+
+
 # 全局配置实例
-config = Config.from_env()
\ No newline at end of file
+config: Config = _LazyConfig()
\ No newline at end of file
@@ -1,5 +1,20 @@
 """决策模块：使用 LLM 生成动作序列"""
 from .agent import DecisionAgent
+from .streaming import ActionStreamParser
+from .plan_cache import PlanCache
+from .speculation import SpeculativeDecider
+from .cascade import DecisionCascade, validate_actions
+from .serializers import PromptEncoder, ElementSerializer, JsonSerializer, CompactSerializer
 
-__all__ = ["DecisionAgent"]
-
+__all__ = [
+    "DecisionAgent",
+    "ActionStreamParser",
+    "PlanCache",
+    "SpeculativeDecider",
+    "DecisionCascade",
+    "validate_actions",
+    "PromptEncoder",
+    "ElementSerializer",
+    "JsonSerializer",
+    "CompactSerializer",
+]
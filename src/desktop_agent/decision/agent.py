@@ -1,21 +1,45 @@
 # src/desktop_agent/decision/agent.py
+import contextlib
 import json
+import logging
 import os
-from typing import Optional, Literal, Tuple, List
-from openai import OpenAI
+import time
+from typing import AsyncIterator, ContextManager, Dict, Iterator, Optional, Literal, Tuple, List
+from .streaming import ActionStreamParser
+from .serializers import PromptEncoder, PromptStats
+from .plan_cache import PlanCache
 from ..types import VisionData, Action
 from ..config import Config
+from ..tracing import tracer
 
-# 可选依赖的条件导入
-try:
-    from anthropic import Anthropic
-except ImportError:
-    Anthropic = None
+logger = logging.getLogger(__name__)
+
+
+def _load_sdk(provider: str):
+    """
+    按 provider 导入对应的 SDK（延迟到创建 DecisionAgent 时，import desktop_agent 不加载任何 SDK）
+
+    Raises:
+        ImportError: 可选 SDK 未安装
+        ValueError: 不支持的 provider
+    """
+    if provider == "openai" or provider == "vllm":
+        import openai
+        return openai
+    if provider == "anthropic":
+        try:
+            import anthropic
+        except ImportError as e:
+            raise ImportError("请安装 anthropic 库: pip install anthropic") from e
+        return anthropic
+    if provider == "gemini":
+        try:
+            import google.generativeai as genai
+        except ImportError as e:
+            raise ImportError("请安装 google-generativeai 库: pip install google-generativeai") from e
+        return genai
+    raise ValueError(f"不支持的 provider: {provider}")
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
 
 class DecisionAgent:
     """决策代理：使用 LLM 将用户指令和视觉感知转换为动作序列"""
@@ -26,7 +50,11 @@ class DecisionAgent:
         model: str = "gpt-4o",
         api_key: Optional[str] = None,
         base_url: Optional[str] = None,
-        config: Optional[Config] = None
+        config: Optional[Config] = None,
+        prompt_encoder: Optional[PromptEncoder] = None,
+        plan_cache: Optional[PlanCache] = None,
+        limiter: Optional[ContextManager] = None,
+        request_confidence: bool = False
     ):
         """
         Args:
@@ -35,10 +63,30 @@ class DecisionAgent:
             api_key: API 密钥（如未提供则从环境变量读取）
             base_url: API 基础 URL（用于 vLLM 等）
             config: 配置对象（可选）
+            prompt_encoder: UI 元素的 prompt 编码器（格式、bbox 量化、top-k 筛选、token 预算，默认读取 config）
+            plan_cache: 计划缓存（相同指令 + 相同界面结构时跳过 LLM，默认读取 config，size 为 0 时禁用）
+            limiter: 同步 LLM 调用的并发限制器（如多个进程共享的 multiprocessing.Semaphore，流式决策时在整个流期间持有）
+            request_confidence: 是否要求模型在响应顶层给出 confidence（0~1），结果见 last_confidence
         """
         self.provider = provider
         self.model = model
         self.config = config
+        self.base_url = base_url
+        self._async_client = None
+        if prompt_encoder is None:
+            prompt_encoder = PromptEncoder.from_config(config) if config else PromptEncoder()
+        self.prompt_encoder = prompt_encoder
+        self._prefix: Optional[str] = None
+        # 最近一次和累计的 token 用量：input/output/cached/cache_creation
+        self.last_usage: Dict[str, int] = {}
+        self.usage_totals: Dict[str, int] = {}
+        if plan_cache is None:
+            plan_cache = PlanCache.from_config(config) if config else PlanCache()
+        self.plan_cache = plan_cache if plan_cache.enabled else None
+        self.limiter = limiter if limiter is not None else contextlib.nullcontext()
+        self.request_confidence = request_confidence
+        # 最近一次非流式决策中模型给出的 confidence（未给出时为 None）
+        self.last_confidence: Optional[float] = None
         
         # 获取 API 密钥
         if api_key is None:
@@ -48,26 +96,23 @@ class DecisionAgent:
                 api_key = os.getenv("ANTHROPIC_API_KEY")
             elif provider == "gemini":
                 api_key = os.getenv("GEMINI_API_KEY")
+        self.api_key = api_key
         
         # 初始化客户端
+        self._sdk = _load_sdk(provider)
         if provider == "openai" or provider == "vllm":
-            self.client = OpenAI(api_key=api_key, base_url=base_url)
+            self.client = self._sdk.OpenAI(api_key=api_key, base_url=base_url)
         elif provider == "anthropic":
-            if Anthropic is None:
-                raise ImportError("请安装 anthropic 库: pip install anthropic")
-            self.client = Anthropic(api_key=api_key)
-        elif provider == "gemini":
-            if genai is None:
-                raise ImportError("请安装 google-generativeai 库: pip install google-generativeai")
-            genai.configure(api_key=api_key)
-            self.client = genai.GenerativeModel(model)
+            self.client = self._sdk.Anthropic(api_key=api_key)
         else:
-            raise ValueError(f"不支持的 provider: {provider}")
+            self._sdk.configure(api_key=api_key)
+            self.client = self._sdk.GenerativeModel(model)
 
     def decide(
         self,
         instruction: str,
-        vision_data: VisionData
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
     ) -> List[Action]:
         """
         输入：用户指令 + 视觉数据
@@ -76,6 +121,7 @@ class DecisionAgent:
         Args:
             instruction: 用户指令
             vision_data: 视觉感知数据
+            history: 之前各步已执行动作的描述（多步任务中使用，提供时不读写计划缓存）
         
         Returns:
             动作序列列表
@@ -83,54 +129,330 @@ class DecisionAgent:
         Raises:
             Exception: API 调用失败时抛出
         """
-        try:
-            # 构建 prompt
-            prompt = self._build_prompt(instruction, vision_data)
+        with tracer.span("decision.decide", provider=self.provider, model=self.model) as span:
+            cached = None if history else self._cached_plan(instruction, vision_data)
+            if cached is not None:
+                span.set_attribute("plan_cache_hit", True)
+                return cached
+            
+            try:
+                # 构建 prompt
+                prompt = self._build_prompt(instruction, vision_data, history)
+                
+                # 调用 LLM
+                with tracer.span("decision.llm"), self.limiter:
+                    if self.provider == "openai" or self.provider == "vllm":
+                        response = self._call_openai(prompt)
+                    elif self.provider == "anthropic":
+                        response = self._call_anthropic(prompt)
+                    elif self.provider == "gemini":
+                        response = self._call_gemini(prompt)
+                    else:
+                        raise ValueError(f"不支持的 provider: {self.provider}")
+                
+                with tracer.span("decision.parse"):
+                    actions = self._parse_actions(response)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"LLM 返回的 JSON 格式错误: {e}") from e
+            except Exception as e:
+                raise RuntimeError(f"决策失败: {e}") from e
             
-            # 调用 LLM
+            span.set_attribute("actions", len(actions))
+            if not history:
+                self._store_plan(instruction, vision_data, actions)
+            return actions
+    
+    async def adecide(
+        self,
+        instruction: str,
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
+    ) -> List[Action]:
+        """
+        decide 的异步版本，使用各提供商的异步客户端
+        
+        Args:
+            instruction: 用户指令
+            vision_data: 视觉感知数据
+            history: 之前各步已执行动作的描述（多步任务中使用，提供时不读写计划缓存）
+        
+        Returns:
+            动作序列列表
+        
+        Raises:
+            ValueError: LLM 返回的 JSON 格式错误
+            RuntimeError: API 调用失败时抛出
+        """
+        with tracer.span("decision.decide", provider=self.provider, model=self.model) as span:
+            cached = None if history else self._cached_plan(instruction, vision_data)
+            if cached is not None:
+                span.set_attribute("plan_cache_hit", True)
+                return cached
+            
+            try:
+                prompt = self._build_prompt(instruction, vision_data, history)
+                
+                with tracer.span("decision.llm"):
+                    if self.provider == "openai" or self.provider == "vllm":
+                        response = await self._acall_openai(prompt)
+                    elif self.provider == "anthropic":
+                        response = await self._acall_anthropic(prompt)
+                    elif self.provider == "gemini":
+                        response = await self._acall_gemini(prompt)
+                    else:
+                        raise ValueError(f"不支持的 provider: {self.provider}")
+                
+                with tracer.span("decision.parse"):
+                    actions = self._parse_actions(response)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"LLM 返回的 JSON 格式错误: {e}") from e
+            except Exception as e:
+                raise RuntimeError(f"决策失败: {e}") from e
+            
+            span.set_attribute("actions", len(actions))
+            if not history:
+                self._store_plan(instruction, vision_data, actions)
+            return actions
+    
+    def decide_stream(
+        self,
+        instruction: str,
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
+    ) -> Iterator[Action]:
+        """
+        流式决策：LLM 每生成完一个动作就立即产出，无需等待完整响应
+        
+        可直接传给 Executor.execute，第一个动作在后续动作仍在生成时就开始执行。
+        
+        Args:
+            instruction: 用户指令
+            vision_data: 视觉感知数据
+            history: 之前各步已执行动作的描述（多步任务中使用，提供时不读写计划缓存）
+        
+        Yields:
+            动作
+        
+        Raises:
+            ValueError: LLM 返回的 JSON 格式错误
+            RuntimeError: API 调用失败时抛出
+        """
+        cached = None if history else self._cached_plan(instruction, vision_data)
+        if cached is not None:
+            yield from cached
+            return
+        
+        prompt = self._build_prompt(instruction, vision_data, history)
+        parser = ActionStreamParser()
+        emitted = []
+        start = time.perf_counter()
+        ttft_ms = None
+        try:
             if self.provider == "openai" or self.provider == "vllm":
-                response = self._call_openai(prompt)
+                chunks = self._stream_openai(prompt)
             elif self.provider == "anthropic":
-                response = self._call_anthropic(prompt)
+                chunks = self._stream_anthropic(prompt)
             elif self.provider == "gemini":
-                response = self._call_gemini(prompt)
+                chunks = self._stream_gemini(prompt)
             else:
                 raise ValueError(f"不支持的 provider: {self.provider}")
             
-            # 解析响应
-            if isinstance(response, str):
-                result = json.loads(response)
+            with self.limiter:
+                for chunk in chunks:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                        tracer.observe("decision.ttft", ttft_ms)
+                    for action in parser.feed(chunk):
+                        emitted.append(action)
+                        yield action
+            for action in parser.close():
+                emitted.append(action)
+                yield action
+        except json.JSONDecodeError as e:
+            raise ValueError(f"LLM 返回的 JSON 格式错误: {e}") from e
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"决策失败: {e}") from e
+        
+        tracer.observe("decision.stream", (time.perf_counter() - start) * 1000)
+        if not history:
+            self._store_plan(instruction, vision_data, emitted)
+    
+    async def adecide_stream(
+        self,
+        instruction: str,
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
+    ) -> AsyncIterator[Action]:
+        """
+        decide_stream 的异步版本，可直接传给 Executor.aexecute
+        
+        Args:
+            instruction: 用户指令
+            vision_data: 视觉感知数据
+            history: 之前各步已执行动作的描述（多步任务中使用，提供时不读写计划缓存）
+        
+        Yields:
+            动作
+        
+        Raises:
+            ValueError: LLM 返回的 JSON 格式错误
+            RuntimeError: API 调用失败时抛出
+        """
+        cached = None if history else self._cached_plan(instruction, vision_data)
+        if cached is not None:
+            for action in cached:
+                yield action
+            return
+        
+        prompt = self._build_prompt(instruction, vision_data, history)
+        parser = ActionStreamParser()
+        emitted = []
+        start = time.perf_counter()
+        ttft_ms = None
+        try:
+            if self.provider == "openai" or self.provider == "vllm":
+                chunks = self._astream_openai(prompt)
+            elif self.provider == "anthropic":
+                chunks = self._astream_anthropic(prompt)
+            elif self.provider == "gemini":
+                chunks = self._astream_gemini(prompt)
             else:
-                result = response
+                raise ValueError(f"不支持的 provider: {self.provider}")
             
-            actions = result.get("actions", [])
-            return actions
+            async for chunk in chunks:
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                    tracer.observe("decision.ttft", ttft_ms)
+                for action in parser.feed(chunk):
+                    emitted.append(action)
+                    yield action
+            for action in parser.close():
+                emitted.append(action)
+                yield action
         except json.JSONDecodeError as e:
             raise ValueError(f"LLM 返回的 JSON 格式错误: {e}") from e
+        except GeneratorExit:
+            raise
         except Exception as e:
             raise RuntimeError(f"决策失败: {e}") from e
+        
+        tracer.observe("decision.stream", (time.perf_counter() - start) * 1000)
+        if not history:
+            self._store_plan(instruction, vision_data, emitted)
     
-    def _build_prompt(self, instruction: str, vision_data: VisionData) -> Tuple[str, str]:
-        """构建完整的 prompt"""
-        system_prompt = self._system_prompt()
+    def invalidate_plan(self, instruction: str, vision_data: VisionData) -> None:
+        """作废缓存的计划（例如执行失败后），下次决策会重新调用 LLM"""
+        if self.plan_cache is not None:
+            self.plan_cache.invalidate(instruction, vision_data)
+    
+    def _cached_plan(self, instruction: str, vision_data: VisionData) -> Optional[List[Action]]:
+        if self.plan_cache is None:
+            return None
+        actions = self.plan_cache.get(instruction, vision_data)
+        if actions is not None:
+            logger.debug("命中计划缓存，跳过 LLM 调用")
+        return actions
+    
+    def _store_plan(self, instruction: str, vision_data: VisionData, actions: List[Action]) -> None:
+        if self.plan_cache is not None and actions:
+            self.plan_cache.put(instruction, vision_data, actions)
+    
+    def _parse_actions(self, response) -> List[Action]:
+        """解析 LLM 响应中的动作序列"""
+        if isinstance(response, str):
+            result = json.loads(response)
+        else:
+            result = response
+        confidence = result.get("confidence")
+        self.last_confidence = float(confidence) if isinstance(confidence, (int, float)) else None
+        return result.get("actions", [])
+    
+    def _get_async_client(self):
+        """按需创建异步客户端（Gemini 的同步模型对象自带异步接口）"""
+        if self._async_client is None:
+            if self.provider == "openai" or self.provider == "vllm":
+                self._async_client = self._sdk.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+            elif self.provider == "anthropic":
+                self._async_client = self._sdk.AsyncAnthropic(api_key=self.api_key)
+            else:
+                self._async_client = self.client
+        return self._async_client
+    
+    def _build_prompt(
+        self,
+        instruction: str,
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
+    ) -> Tuple[str, str]:
+        """
+        构建完整的 prompt
+        
+        静态部分（系统提示词 + 动作格式说明）放在最前面且逐字节不变，
+        可变部分（任务 + UI 元素）放在其后，以便命中提供商的前缀缓存。
+        
+        Returns:
+            (静态前缀, 可变部分)
+        """
+        elements_text = self.prompt_encoder.encode(instruction, vision_data)
+        stats = self.prompt_encoder.last_stats
+        logger.debug(
+            f"UI 元素 {stats.elements_before} → {stats.elements_after} 个，"
+            f"token {stats.tokens_before} → {stats.tokens_after}"
+        )
         user_prompt = f"""Task: {instruction}
 
 UI Elements:
-{json.dumps(vision_data, indent=2, ensure_ascii=False)}
-
-请根据以上 UI 元素和任务要求，输出一个 JSON 对象，包含一个 "actions" 数组。
-每个动作应该是以下格式之一：
-- {{"type": "click", "element_id": 1}}
-- {{"type": "type", "element_id": 2, "text": "要输入的文本"}}
-- {{"type": "press", "key": "enter"}}
-- {{"type": "code", "language": "python", "code": "代码内容"}}
+{elements_text}
+"""
+        if history:
+            steps = "\n".join(f"{i}. {step}" for i, step in enumerate(history, 1))
+            user_prompt += f"""
+Actions already executed in previous steps:
+{steps}
 """
-        return system_prompt, user_prompt
+        return self._static_prompt(), user_prompt
     
-    def _call_openai(self, prompt: Tuple[str, str]) -> str:
-        """调用 OpenAI API"""
+    def _static_prompt(self) -> str:
+        """静态前缀：系统提示词 + 动作格式说明 + 元素格式说明（构建一次后复用）"""
+        if self._prefix is None:
+            parts = [self._system_prompt(), self._format_instructions()]
+            if self.prompt_encoder.format_hint:
+                parts.append(self.prompt_encoder.format_hint)
+            self._prefix = "\n\n".join(parts)
+        return self._prefix
+    
+    def _format_instructions(self) -> str:
+        """动作格式说明"""
+        text = """请根据任务要求和 UI 元素，输出一个 JSON 对象，包含一个 "actions" 数组。
+每个动作应该是以下格式之一：
+- {"type": "click", "element_id": 1}
+- {"type": "type", "element_id": 2, "text": "要输入的文本"}
+- {"type": "press", "key": "enter"}
+- {"type": "code", "language": "python", "code": "代码内容"}
+- {"type": "done"}"""
+        if self.request_confidence:
+            text += '\n\n在 JSON 对象顶层加入 "confidence" 字段（0~1 的小数），表示这组动作能正确完成当前步骤的把握。'
+        return text
+    
+    @property
+    def last_prompt_stats(self) -> PromptStats:
+        """最近一次构建 prompt 时元素部分的数量和 token 统计"""
+        return self.prompt_encoder.last_stats
+    
+    def _record_usage(self, usage: Optional[Dict[str, int]]) -> None:
+        """记录最近一次调用和累计的 token 用量（含前缀缓存命中的 token 数）"""
+        if not usage:
+            return
+        tracer.current_span().set_attributes(**usage)
+        self.last_usage = usage
+        for key, value in usage.items():
+            self.usage_totals[key] = self.usage_totals.get(key, 0) + value
+    
+    def _openai_request(self, prompt: Tuple[str, str]) -> dict:
         system_prompt, user_prompt = prompt
-        resp = self.client.chat.completions.create(
+        return dict(
             model=self.model,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -139,32 +461,140 @@ UI Elements:
             response_format={"type": "json_object"},
             temperature=0.0
         )
-        return resp.choices[0].message.content
     
-    def _call_anthropic(self, prompt: Tuple[str, str]) -> str:
-        """调用 Anthropic API"""
+    def _anthropic_request(self, prompt: Tuple[str, str]) -> dict:
         system_prompt, user_prompt = prompt
-        resp = self.client.messages.create(
+        return dict(
             model=self.model,
             max_tokens=4096,
-            system=system_prompt,
+            # 在静态前缀末尾设置缓存断点
+            system=[{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
             messages=[{"role": "user", "content": user_prompt}]
         )
+    
+    def _gemini_prompt(self, prompt: Tuple[str, str]) -> str:
+        system_prompt, user_prompt = prompt
+        return f"{system_prompt}\n\n{user_prompt}"
+    
+    def _call_openai(self, prompt: Tuple[str, str]) -> str:
+        """调用 OpenAI API"""
+        resp = self.client.chat.completions.create(**self._openai_request(prompt))
+        self._record_usage(_openai_usage(resp.usage))
+        return resp.choices[0].message.content
+    
+    async def _acall_openai(self, prompt: Tuple[str, str]) -> str:
+        """异步调用 OpenAI API"""
+        resp = await self._get_async_client().chat.completions.create(**self._openai_request(prompt))
+        self._record_usage(_openai_usage(resp.usage))
+        return resp.choices[0].message.content
+    
+    def _call_anthropic(self, prompt: Tuple[str, str]) -> str:
+        """调用 Anthropic API"""
+        resp = self.client.messages.create(**self._anthropic_request(prompt))
+        self._record_usage(_anthropic_usage(resp.usage))
+        return resp.content[0].text
+    
+    async def _acall_anthropic(self, prompt: Tuple[str, str]) -> str:
+        """异步调用 Anthropic API"""
+        resp = await self._get_async_client().messages.create(**self._anthropic_request(prompt))
+        self._record_usage(_anthropic_usage(resp.usage))
         return resp.content[0].text
     
     def _call_gemini(self, prompt: Tuple[str, str]) -> str:
         """调用 Gemini API"""
-        system_prompt, user_prompt = prompt
-        full_prompt = f"{system_prompt}\n\n{user_prompt}"
         resp = self.client.generate_content(
-            full_prompt,
+            self._gemini_prompt(prompt),
             generation_config={
                 "temperature": 0.0,
                 "response_mime_type": "application/json"
             }
         )
+        self._record_usage(_gemini_usage(getattr(resp, "usage_metadata", None)))
         return resp.text
     
+    async def _acall_gemini(self, prompt: Tuple[str, str]) -> str:
+        """异步调用 Gemini API"""
+        resp = await self._get_async_client().generate_content_async(
+            self._gemini_prompt(prompt),
+            generation_config={
+                "temperature": 0.0,
+                "response_mime_type": "application/json"
+            }
+        )
+        self._record_usage(_gemini_usage(getattr(resp, "usage_metadata", None)))
+        return resp.text
+    
+    def _stream_openai(self, prompt: Tuple[str, str]) -> Iterator[str]:
+        """流式调用 OpenAI API"""
+        stream = self.client.chat.completions.create(
+            **self._openai_request(prompt),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, "usage", None):
+                self._record_usage(_openai_usage(chunk.usage))
+    
+    async def _astream_openai(self, prompt: Tuple[str, str]) -> AsyncIterator[str]:
+        """异步流式调用 OpenAI API"""
+        stream = await self._get_async_client().chat.completions.create(
+            **self._openai_request(prompt),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, "usage", None):
+                self._record_usage(_openai_usage(chunk.usage))
+    
+    def _stream_anthropic(self, prompt: Tuple[str, str]) -> Iterator[str]:
+        """流式调用 Anthropic API"""
+        with self.client.messages.stream(**self._anthropic_request(prompt)) as stream:
+            yield from stream.text_stream
+            self._record_usage(_anthropic_usage(stream.get_final_message().usage))
+    
+    async def _astream_anthropic(self, prompt: Tuple[str, str]) -> AsyncIterator[str]:
+        """异步流式调用 Anthropic API"""
+        async with self._get_async_client().messages.stream(**self._anthropic_request(prompt)) as stream:
+            async for text in stream.text_stream:
+                yield text
+            self._record_usage(_anthropic_usage((await stream.get_final_message()).usage))
+    
+    def _stream_gemini(self, prompt: Tuple[str, str]) -> Iterator[str]:
+        """流式调用 Gemini API"""
+        stream = self.client.generate_content(
+            self._gemini_prompt(prompt),
+            generation_config={
+                "temperature": 0.0,
+                "response_mime_type": "application/json"
+            },
+            stream=True
+        )
+        usage = None
+        for chunk in stream:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            yield chunk.text
+        self._record_usage(_gemini_usage(usage))
+    
+    async def _astream_gemini(self, prompt: Tuple[str, str]) -> AsyncIterator[str]:
+        """异步流式调用 Gemini API"""
+        stream = await self._get_async_client().generate_content_async(
+            self._gemini_prompt(prompt),
+            generation_config={
+                "temperature": 0.0,
+                "response_mime_type": "application/json"
+            },
+            stream=True
+        )
+        usage = None
+        async for chunk in stream:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            yield chunk.text
+        self._record_usage(_gemini_usage(usage))
+    
     def _system_prompt(self) -> str:
         """系统提示词"""
         return """You are a desktop automation agent. Given a user task and UI elements with bounding boxes,
@@ -175,5 +605,45 @@ Available actions:
 - type(element_id, text): Type text into an element
 - press(key): Press a keyboard key (e.g., "enter", "tab", "escape")
 - code(language, code): Execute code (use with caution)
+- done(): The task is already complete on the current screen; output it as the only action
+
+Use element_id from the UI elements list. Be precise and follow the task step by step."""
+
+
+def _openai_usage(usage) -> Optional[Dict[str, int]]:
+    """从 OpenAI/vLLM 的 usage 中提取 token 用量（cached_tokens 为前缀缓存命中数）"""
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": usage.prompt_tokens or 0,
+        "output_tokens": usage.completion_tokens or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+        "cache_creation_tokens": 0,
+    }
+
+
+def _anthropic_usage(usage) -> Optional[Dict[str, int]]:
+    """从 Anthropic 的 usage 中提取 token 用量（input_tokens 不含缓存部分，这里统一为总输入）"""
+    if usage is None:
+        return None
+    cached = getattr(usage, "cache_read_input_tokens", None) or 0
+    created = getattr(usage, "cache_creation_input_tokens", None) or 0
+    return {
+        "input_tokens": (usage.input_tokens or 0) + cached + created,
+        "output_tokens": usage.output_tokens or 0,
+        "cached_tokens": cached,
+        "cache_creation_tokens": created,
+    }
+
 
-Use element_id from the UI elements list. Be precise and follow the task step by step."""
\ No newline at end of file
+def _gemini_usage(usage) -> Optional[Dict[str, int]]:
+    """从 Gemini 的 usage_metadata 中提取 token 用量"""
+    if usage is None:
+        return None
+    return {
+        "input_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+        "cache_creation_tokens": 0,
+    }
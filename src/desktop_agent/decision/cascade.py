@@ -0,0 +1,371 @@
+# src/desktop_agent/decision/cascade.py
+"""
+分级决策：先用快速的小模型决策，动作校验不通过或置信度不足时才升级到更大的模型
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set
+
+from .agent import DecisionAgent
+from .plan_cache import PlanCache
+from ..types import Action, ActionRecord, VisionData, normalize_id
+from ..tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# press 动作允许的按键名（与 pyautogui 的按键名一致，单个可打印字符另行允许）
+KEY_NAMES = frozenset(
+    [
+        "enter", "return", "tab", "space", "backspace", "delete", "del", "escape", "esc", "insert",
+        "up", "down", "left", "right", "home", "end", "pageup", "pagedown", "pgup", "pgdn",
+        "shift", "shiftleft", "shiftright", "ctrl", "ctrlleft", "ctrlright", "alt", "altleft", "altright",
+        "option", "command", "win", "winleft", "winright", "fn", "capslock", "numlock", "scrolllock",
+        "printscreen", "prtsc", "pause", "apps", "volumeup", "volumedown", "volumemute",
+    ]
+    + [f"f{i}" for i in range(1, 25)]
+)
+
+
+def _valid_key(key: str) -> bool:
+    """单个按键名，或 "ctrl+c" 形式的组合键（执行时转换为 hotkey）"""
+    parts = [part.strip() for part in key.split("+")] if len(key) > 1 else [key]
+    return all(len(part) == 1 or part.lower() in KEY_NAMES for part in parts)
+
+
+def _known_id(element_id: Any, element_ids: Set[Any]) -> bool:
+    try:
+        return normalize_id(element_id) in element_ids
+    except TypeError:
+        # 不可哈希的 id（如模型返回了列表）
+        return False
+
+
+def validate_actions(actions: Any, vision_data: VisionData) -> List[str]:
+    """
+    校验动作序列能否在当前界面上执行
+
+    检查项：actions 为非空列表；每个动作类型受支持且必填字段齐全（type 动作还需要 text）；
+    click/type 引用的 element_id 存在于当前视觉数据中（按 normalize_id 比较，与执行器查找元素的方式一致）；press 的按键名（或 ctrl+c 形式的组合键）有效；done 是唯一的动作。
+
+    Args:
+        actions: 模型返回的 actions
+        vision_data: 当前视觉数据
+
+    Returns:
+        问题描述列表（为空表示校验通过）
+    """
+    if not isinstance(actions, list):
+        return ["actions 不是数组"]
+    if not actions:
+        return ["actions 为空"]
+    element_ids = {normalize_id(element["id"]) for element in vision_data.get("elements", [])}
+    problems = []
+    for i, action in enumerate(actions, 1):
+        if not isinstance(action, dict):
+            problems.append(f"第 {i} 个动作不是对象")
+            continue
+        try:
+            record = ActionRecord.from_dict(action)
+        except ValueError as e:
+            problems.append(f"第 {i} 个动作: {e}")
+            continue
+        if record.element_id is not None and not _known_id(record.element_id, element_ids):
+            problems.append(f"第 {i} 个动作引用了不存在的元素 {record.element_id}")
+        if record.type == "type" and record.text is None:
+            problems.append(f"第 {i} 个动作缺少 'text'")
+        if record.type == "press" and not _valid_key(record.key):
+            problems.append(f"第 {i} 个动作的按键无效: {record.key}")
+        if record.type == "done" and len(actions) > 1:
+            problems.append("done 必须是唯一的动作")
+    return problems
+
+
+class TierSpec(NamedTuple):
+    """一级决策模型"""
+    provider: str
+    model: str
+    base_url: Optional[str] = None
+
+
+def parse_tiers(spec: str) -> List[TierSpec]:
+    """
+    解析 DECISION_TIERS
+
+    格式为逗号分隔的 provider:model[@base_url]，按从快到慢排列，例如
+    vllm:qwen2.5-7b-instruct@http://localhost:8000/v1,openai:gpt-4o
+
+    Raises:
+        ValueError: 某一项缺少 provider 或 model
+    """
+    tiers = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        target, _, base_url = item.partition("@")
+        provider, _, model = target.partition(":")
+        if not provider or not model:
+            raise ValueError(f"无效的决策层级: {item}（格式为 provider:model[@base_url]）")
+        tiers.append(TierSpec(provider.strip(), model.strip(), base_url.strip() or None))
+    return tiers
+
+
+class _TierStats:
+    """单个层级的调用统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.accepted = 0
+        self.escalated: Dict[str, int] = {"invalid": 0, "low_confidence": 0, "error": 0}
+        self.total_ms = 0.0
+        # 在该层被采用的请求从进入分级决策到返回的总耗时
+        self.accepted_ms = 0.0
+
+
+class DecisionCascade:
+    """
+    分级决策代理，与 DecisionAgent 接口兼容（可直接作为 DesktopAgent 的 decision_agent）
+
+    tiers 按从快到慢排列。除最后一级外，每一级的结果都要经过 validate_actions 校验，
+    并在模型给出的 confidence 低于 min_confidence 时视为不可靠；校验失败、置信度不足或调用出错时
+    升级到下一级。最后一级的结果直接采用。
+
+    流式决策不会先执行未经校验的动作：decide_stream 完成分级决策后再逐个产出动作。
+    """
+
+    def __init__(
+        self,
+        tiers: Sequence[DecisionAgent],
+        min_confidence: float = 0.5,
+        plan_cache: Optional[PlanCache] = None,
+    ):
+        """
+        Args:
+            tiers: 各级决策代理（从快到慢）
+            min_confidence: 非最后一级的结果所需的最低置信度（模型未给出时不检查）
+            plan_cache: 最终采用的计划的缓存（默认不缓存；各级代理自身的计划缓存应关闭）
+
+        Raises:
+            ValueError: tiers 为空
+        """
+        if not tiers:
+            raise ValueError("至少需要一级决策模型")
+        self.tiers = list(tiers)
+        self.min_confidence = min_confidence
+        self.plan_cache = plan_cache if plan_cache is not None and plan_cache.enabled else None
+        self._lock = threading.Lock()
+        self._stats = [_TierStats(f"{tier.provider}:{tier.model}") for tier in self.tiers]
+        self.provider = self.tiers[-1].provider
+        self.model = self.tiers[-1].model
+
+    @classmethod
+    def from_config(cls, config, limiter=None) -> "DecisionCascade":
+        """
+        按 config.decision_tiers 创建各级代理（非最后一级要求模型给出 confidence）
+
+        Args:
+            config: 配置对象
+            limiter: 各级共享的 LLM 并发限制器（见 DecisionAgent）
+
+        Raises:
+            ValueError: decision_tiers 为空或格式错误
+        """
+        specs = parse_tiers(config.decision_tiers or "")
+        if not specs:
+            raise ValueError("未配置 DECISION_TIERS")
+        tiers = []
+        for i, spec in enumerate(specs):
+            tiers.append(DecisionAgent(
+                provider=spec.provider,
+                model=spec.model,
+                # vLLM 的 OpenAI 兼容接口不校验密钥，但 SDK 要求非空
+                api_key="EMPTY" if spec.provider == "vllm" and not os.getenv("OPENAI_API_KEY") else None,
+                base_url=spec.base_url,
+                config=config,
+                plan_cache=PlanCache(maxsize=0),
+                limiter=limiter,
+                request_confidence=i < len(specs) - 1,
+            ))
+        return cls(tiers, min_confidence=config.decision_min_confidence, plan_cache=PlanCache.from_config(config))
+
+    def decide(
+        self,
+        instruction: str,
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
+    ) -> List[Action]:
+        """
+        逐级决策，返回第一个可靠的结果
+
+        Args:
+            instruction: 用户指令
+            vision_data: 视觉感知数据
+            history: 之前各步已执行动作的描述（提供时不读写计划缓存）
+
+        Returns:
+            动作序列
+
+        Raises:
+            ValueError / RuntimeError: 最后一级决策失败
+        """
+        with tracer.span("decision.cascade") as span:
+            cached = None if history or self.plan_cache is None else self.plan_cache.get(instruction, vision_data)
+            if cached is not None:
+                span.set_attribute("plan_cache_hit", True)
+                return cached
+            start = time.perf_counter()
+            for level, tier in enumerate(self.tiers):
+                began = time.perf_counter()
+                try:
+                    actions = tier.decide(instruction, vision_data, history)
+                except Exception as e:
+                    if level == len(self.tiers) - 1:
+                        self._record(level, began)
+                        raise
+                    self._escalate(level, began, "error", str(e))
+                    continue
+                if self._accept(level, began, start, actions, tier.last_confidence, vision_data):
+                    span.set_attribute("tier", level)
+                    self._store(instruction, vision_data, history, actions)
+                    return actions
+        raise AssertionError("unreachable")
+
+    async def adecide(
+        self,
+        instruction: str,
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
+    ) -> List[Action]:
+        """decide 的异步版本"""
+        with tracer.span("decision.cascade") as span:
+            cached = None if history or self.plan_cache is None else self.plan_cache.get(instruction, vision_data)
+            if cached is not None:
+                span.set_attribute("plan_cache_hit", True)
+                return cached
+            start = time.perf_counter()
+            for level, tier in enumerate(self.tiers):
+                began = time.perf_counter()
+                try:
+                    actions = await tier.adecide(instruction, vision_data, history)
+                except Exception as e:
+                    if level == len(self.tiers) - 1:
+                        self._record(level, began)
+                        raise
+                    self._escalate(level, began, "error", str(e))
+                    continue
+                if self._accept(level, began, start, actions, tier.last_confidence, vision_data):
+                    span.set_attribute("tier", level)
+                    self._store(instruction, vision_data, history, actions)
+                    return actions
+        raise AssertionError("unreachable")
+
+    def decide_stream(
+        self,
+        instruction: str,
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
+    ) -> Iterator[Action]:
+        """分级决策完成后逐个产出动作（未经校验的动作不会提前执行）"""
+        yield from self.decide(instruction, vision_data, history)
+
+    async def adecide_stream(
+        self,
+        instruction: str,
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
+    ) -> AsyncIterator[Action]:
+        """decide_stream 的异步版本"""
+        for action in await self.adecide(instruction, vision_data, history):
+            yield action
+
+    def invalidate_plan(self, instruction: str, vision_data: VisionData) -> None:
+        """作废缓存的计划"""
+        if self.plan_cache is not None:
+            self.plan_cache.invalidate(instruction, vision_data)
+
+    @property
+    def usage_totals(self) -> Dict[str, int]:
+        """各级累计 token 用量之和"""
+        totals: Dict[str, int] = {}
+        for tier in self.tiers:
+            for key, value in tier.usage_totals.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        每一级的统计
+
+        Returns:
+            列表，每项包含 tier、calls、accepted、hit_rate（采用数 / 调用数）、escalated（按原因）、
+            mean_ms（该级单次调用平均耗时）和 saved_ms（在该级被采用的请求相对直接调用最后一级节省的总耗时，
+            最后一级还没有调用记录时为 None）
+        """
+        with self._lock:
+            last = self._stats[-1]
+            last_mean = last.total_ms / last.calls if last.calls else None
+            result = []
+            for level, tier in enumerate(self._stats):
+                saved = None
+                if level == len(self._stats) - 1:
+                    saved = 0.0
+                elif last_mean is not None:
+                    saved = round(tier.accepted * last_mean - tier.accepted_ms, 3)
+                result.append({
+                    "tier": tier.name,
+                    "calls": tier.calls,
+                    "accepted": tier.accepted,
+                    "hit_rate": tier.accepted / tier.calls if tier.calls else 0.0,
+                    "escalated": dict(tier.escalated),
+                    "mean_ms": round(tier.total_ms / tier.calls, 3) if tier.calls else 0.0,
+                    "saved_ms": saved,
+                })
+            return result
+
+    def _accept(
+        self,
+        level: int,
+        began: float,
+        start: float,
+        actions: List[Action],
+        confidence: Optional[float],
+        vision_data: VisionData,
+    ) -> bool:
+        if level < len(self.tiers) - 1:
+            problems = validate_actions(actions, vision_data)
+            if problems:
+                self._escalate(level, began, "invalid", "; ".join(problems))
+                return False
+            if confidence is not None and confidence < self.min_confidence:
+                self._escalate(level, began, "low_confidence", f"confidence={confidence:.2f}")
+                return False
+        now = time.perf_counter()
+        with self._lock:
+            stats = self._stats[level]
+            stats.calls += 1
+            stats.accepted += 1
+            stats.total_ms += (now - began) * 1000
+            stats.accepted_ms += (now - start) * 1000
+        return True
+
+    def _escalate(self, level: int, began: float, reason: str, detail: str) -> None:
+        with self._lock:
+            stats = self._stats[level]
+            stats.calls += 1
+            stats.escalated[reason] += 1
+            stats.total_ms += (time.perf_counter() - began) * 1000
+        tracer.current_span().set_attribute(f"escalated_{level}", reason)
+        logger.info(f"{self._stats[level].name} 的结果不可用（{detail}），升级到下一级")
+
+    def _record(self, level: int, began: float) -> None:
+        with self._lock:
+            stats = self._stats[level]
+            stats.calls += 1
+            stats.total_ms += (time.perf_counter() - began) * 1000
+
+    def _store(self, instruction: str, vision_data: VisionData, history: Optional[List[str]], actions: List[Action]) -> None:
+        if self.plan_cache is not None and not history and actions:
+            self.plan_cache.put(instruction, vision_data, actions)
@@ -0,0 +1,275 @@
+# src/desktop_agent/decision/plan_cache.py
+"""
+决策计划缓存：以规范化指令 + UI 结构指纹为键，复用 LLM 生成过的动作序列
+"""
+import copy
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from ..cache import LRUCache
+from ..types import Action, UIElement, VisionData, normalize_id
+
+logger = logging.getLogger(__name__)
+
+_SPACE_RE = re.compile(r"\s+")
+
+# 元素签名：(类型, 规范化文本, 量化 bbox)
+Signature = Tuple[str, str, Tuple[int, ...]]
+
+
+def normalize_instruction(instruction: str) -> str:
+    """规范化指令：小写、合并空白、去掉首尾标点"""
+    text = _SPACE_RE.sub(" ", instruction.strip().lower())
+    return text.strip(" .。!！?？")
+
+
+def element_signature(element: UIElement, bbox_quantum: int = 16) -> Signature:
+    """
+    计算元素的结构签名（与 id 无关）
+
+    Args:
+        element: UI 元素
+        bbox_quantum: bbox 量化步长（像素），吸收几个像素的抖动
+
+    Returns:
+        (类型, 文本, 量化后的 bbox)
+    """
+    q = max(1, bbox_quantum)
+    text = _SPACE_RE.sub(" ", str(element.get("text", "")).strip())
+    bbox = tuple(int(round(v / q)) for v in element.get("bbox", []))
+    return str(element.get("type", "")), text, bbox
+
+
+def ui_fingerprint(elements: Sequence[UIElement], bbox_quantum: int = 16) -> str:
+    """
+    计算 UI 结构指纹：所有元素签名排序后的哈希，与元素 id 和顺序无关
+
+    Args:
+        elements: UI 元素列表
+        bbox_quantum: bbox 量化步长
+
+    Returns:
+        十六进制指纹
+    """
+    signatures = sorted(element_signature(element, bbox_quantum) for element in elements)
+    return hashlib.blake2b(
+        json.dumps(signatures, ensure_ascii=False).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+class PlanCache:
+    """
+    决策计划缓存
+
+    缓存条目记录动作引用的每个元素的签名；复用时按签名在当前元素中重新定位，
+    并把 element_id 重映射到当前的 id。任何引用无法定位时该条目作废。
+
+    - 内存层：带 TTL 的 LRU
+    - 持久层（可选）：SQLite 文件
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl: Optional[float] = 3600.0,
+        path: Optional[str] = None,
+        bbox_quantum: int = 16,
+    ):
+        """
+        Args:
+            maxsize: 内存层最大条目数（<= 0 禁用内存层）
+            ttl: 条目存活时间（秒，None 或 <= 0 表示永不过期）
+            path: SQLite 文件路径（None 表示不持久化）
+            bbox_quantum: 元素签名的 bbox 量化步长
+        """
+        self.memory: LRUCache[Dict[str, Any]] = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = self.memory.ttl
+        self.path = path
+        self.bbox_quantum = bbox_quantum
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, ts REAL, payload TEXT)"
+                )
+
+    @classmethod
+    def from_config(cls, config) -> "PlanCache":
+        return cls(
+            maxsize=config.plan_cache_size,
+            ttl=config.plan_cache_ttl,
+            path=config.plan_cache_path,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory.maxsize > 0 or self._db is not None
+
+    def make_key(self, instruction: str, vision_data: VisionData) -> str:
+        """由规范化指令和 UI 结构指纹生成缓存键"""
+        fingerprint = ui_fingerprint(vision_data.get("elements", []), self.bbox_quantum)
+        digest = hashlib.blake2b(normalize_instruction(instruction).encode("utf-8"), digest_size=8)
+        return f"{digest.hexdigest()}-{fingerprint}"
+
+    def get(self, instruction: str, vision_data: VisionData) -> Optional[List[Action]]:
+        """
+        查询缓存，命中时返回 element_id 已重映射到当前元素的动作序列
+
+        Args:
+            instruction: 用户指令
+            vision_data: 当前视觉数据
+
+        Returns:
+            动作序列，未命中或引用失效时返回 None
+        """
+        key = self.make_key(instruction, vision_data)
+        entry = self.memory.get(key)
+        if entry is None and self._db is not None:
+            entry = self._db_get(key)
+            if entry is not None:
+                self.memory.put(key, entry)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        actions = self._remap(entry, vision_data.get("elements", []))
+        if actions is None:
+            self.invalidations += 1
+            self.misses += 1
+            self._delete(key)
+            logger.debug("缓存的计划引用了不存在的元素，已作废")
+            return None
+        self.hits += 1
+        return actions
+
+    def put(self, instruction: str, vision_data: VisionData, actions: List[Action]) -> bool:
+        """
+        缓存动作序列
+
+        Args:
+            instruction: 用户指令
+            vision_data: 生成该计划时的视觉数据
+            actions: 动作序列
+
+        Returns:
+            是否已缓存（引用了不存在元素的计划不会被缓存；element_id 按 normalize_id 查找，"3" 即元素 3）
+        """
+        if not self.enabled:
+            return False
+        targets = self._targets(vision_data.get("elements", []))
+        refs: Dict[str, Any] = {}
+        for action in actions:
+            element_id = action.get("element_id")
+            if element_id is None:
+                continue
+            try:
+                target = targets.get(normalize_id(element_id))
+            except TypeError:
+                # 不可哈希的 element_id（如模型返回了列表）
+                return False
+            if target is None:
+                return False
+            refs[str(element_id)] = target
+
+        key = self.make_key(instruction, vision_data)
+        entry = {"actions": copy.deepcopy(actions), "refs": refs}
+        self.memory.put(key, entry)
+        if self._db is not None:
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO plans (key, ts, payload) VALUES (?, ?, ?)",
+                    (key, time.time(), json.dumps(entry, ensure_ascii=False)),
+                )
+        return True
+
+    def invalidate(self, instruction: str, vision_data: VisionData) -> None:
+        """作废指定指令和界面的缓存计划（例如执行失败后）"""
+        self._delete(self.make_key(instruction, vision_data))
+
+    def clear(self) -> None:
+        """清空内存层和持久层"""
+        self.memory.clear()
+        if self._db is not None:
+            with self._db_lock, self._db:
+                self._db.execute("DELETE FROM plans")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.memory.evictions,
+            "size": len(self.memory),
+        }
+
+    def close(self) -> None:
+        """关闭 SQLite 连接"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _targets(self, elements: Sequence[UIElement]) -> Dict[Any, List[Any]]:
+        """规范化 element_id（见 normalize_id）-> [签名, 同签名元素中的序号]"""
+        return {normalize_id(element_id): target for element_id, target in self._signatures(elements)}
+
+    def _signatures(self, elements: Sequence[UIElement]) -> Iterator[Tuple[Any, List[Any]]]:
+        """逐个产出 (原始 element_id, [签名, 同签名元素中的序号])（序号区分外观完全相同的元素）"""
+        counts: Dict[Signature, int] = {}
+        for element in elements:
+            signature = element_signature(element, self.bbox_quantum)
+            index = counts.get(signature, 0)
+            counts[signature] = index + 1
+            yield element["id"], [list(signature[:2]) + [list(signature[2])], index]
+
+    def _remap(self, entry: Dict[str, Any], elements: Sequence[UIElement]) -> Optional[List[Action]]:
+        lookup = {
+            json.dumps(target, ensure_ascii=False): element_id
+            for element_id, target in self._signatures(elements)
+        }
+        actions = copy.deepcopy(entry["actions"])
+        for action in actions:
+            element_id = action.get("element_id")
+            if element_id is None:
+                continue
+            target = entry["refs"].get(str(element_id))
+            if target is None:
+                return None
+            current = lookup.get(json.dumps(target, ensure_ascii=False))
+            if current is None:
+                return None
+            action["element_id"] = current
+        return actions
+
+    def _delete(self, key: str) -> None:
+        self.memory.pop(key)
+        if self._db is not None:
+            with self._db_lock, self._db:
+                self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+
+    def _db_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            row = self._db.execute("SELECT ts, payload FROM plans WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        ts, payload = row
+        if self.ttl is not None and time.time() - ts > self.ttl:
+            self._delete(key)
+            return None
+        try:
+            return json.loads(payload)
+        except ValueError as e:
+            logger.warning(f"读取计划缓存失败: {e}")
+            return None
@@ -0,0 +1,239 @@
+# src/desktop_agent/decision/serializers.py
+"""
+UI 元素序列化：控制写入 prompt 的元素格式、数量和 token 预算
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+from ..types import UIElement, VisionData
+
+# 可选依赖：精确的 token 计数
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_ENCODING = None
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RE = re.compile(r"[぀-ヿ㐀-鿿가-힯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+
+    安装了 tiktoken 时使用 cl100k_base 精确计数，否则按经验估算：
+    CJK 字符每个约 1 token，其余字符约 4 个 1 token。
+
+    Args:
+        text: 文本
+
+    Returns:
+        token 数
+    """
+    global _ENCODING
+    if tiktoken is not None:
+        if _ENCODING is None:
+            try:
+                _ENCODING = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                _ENCODING = False
+        if _ENCODING:
+            return len(_ENCODING.encode(text))
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class ElementSerializer:
+    """元素序列化器基类：将视觉数据转换为 prompt 中的文本"""
+
+    name = "base"
+    # 放在 prompt 中说明格式的一句话（可为空）
+    format_hint = ""
+
+    def serialize(self, vision_data: VisionData) -> str:
+        raise NotImplementedError
+
+
+class JsonSerializer(ElementSerializer):
+    """JSON 格式（indent=2 时与旧版 prompt 完全一致）"""
+
+    name = "json"
+
+    def __init__(self, indent: Optional[int] = 2):
+        self.indent = indent
+
+    def serialize(self, vision_data: VisionData) -> str:
+        separators = None if self.indent is not None else (",", ":")
+        return json.dumps(vision_data, indent=self.indent, ensure_ascii=False, separators=separators)
+
+
+class CompactSerializer(ElementSerializer):
+    """
+    紧凑表格格式：每个元素一行，省去重复的键名和空白
+
+        resolution: 1920x1080
+        id|type|text|x1,y1,x2,y2
+        1|button|File|100,200,300,250
+    """
+
+    name = "compact"
+    format_hint = "UI elements are listed one per line as id|type|text|x1,y1,x2,y2."
+
+    def serialize(self, vision_data: VisionData) -> str:
+        lines = []
+        resolution = vision_data.get("resolution")
+        if resolution:
+            lines.append(f"resolution: {resolution[0]}x{resolution[1]}")
+        lines.append("id|type|text|x1,y1,x2,y2")
+        for element in vision_data.get("elements", []):
+            text = str(element.get("text", "")).replace("\n", " ").replace("|", "/")
+            bbox = ",".join(str(v) for v in element.get("bbox", []))
+            lines.append(f"{element.get('id')}|{element.get('type', '')}|{text}|{bbox}")
+        return "\n".join(lines)
+
+
+SERIALIZERS = {
+    "json": JsonSerializer,
+    "compact": CompactSerializer,
+}
+
+
+@dataclass
+class PromptStats:
+    """元素序列化前后的统计"""
+    elements_before: int = 0
+    elements_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+class PromptEncoder:
+    """
+    元素 prompt 编码流水线：bbox 量化 → 相关性筛选 → 序列化 → token 预算截断
+
+    截断是确定性的：元素按（相关性降序, id 升序）排名，超出预算时从排名末尾开始丢弃，
+    输出中的元素始终按 id 排序。
+    """
+
+    def __init__(
+        self,
+        serializer: Optional[ElementSerializer] = None,
+        bbox_quantum: int = 0,
+        top_k: int = 0,
+        token_budget: int = 0,
+    ):
+        """
+        Args:
+            serializer: 序列化器（默认 indent=2 的 JSON，与旧版一致）
+            bbox_quantum: bbox 量化步长（像素，<= 1 表示不量化）
+            top_k: 只保留与指令最相关的 k 个元素（0 表示不筛选）
+            token_budget: 元素部分的 token 上限（0 表示不限制）
+        """
+        self.serializer = serializer or JsonSerializer()
+        self.bbox_quantum = bbox_quantum
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.last_stats = PromptStats()
+
+    @classmethod
+    def from_config(cls, config) -> "PromptEncoder":
+        serializer_cls = SERIALIZERS.get(config.prompt_format)
+        if serializer_cls is None:
+            raise ValueError(f"不支持的元素序列化格式: {config.prompt_format}")
+        return cls(
+            serializer=serializer_cls(),
+            bbox_quantum=config.prompt_bbox_quantum,
+            top_k=config.prompt_top_k,
+            token_budget=config.prompt_token_budget,
+        )
+
+    @property
+    def format_hint(self) -> str:
+        return self.serializer.format_hint
+
+    def encode(self, instruction: str, vision_data: VisionData) -> str:
+        """
+        将视觉数据编码为 prompt 文本，统计结果写入 last_stats
+
+        Args:
+            instruction: 用户指令（用于相关性筛选）
+            vision_data: 视觉数据
+
+        Returns:
+            元素文本
+        """
+        elements = list(vision_data.get("elements", []))
+        stats = PromptStats(
+            elements_before=len(elements),
+            tokens_before=estimate_tokens(json.dumps(vision_data, indent=2, ensure_ascii=False)),
+        )
+
+        if self.bbox_quantum > 1:
+            elements = [self._quantize(element) for element in elements]
+
+        ranked = self._rank(instruction, elements)
+        if self.top_k > 0:
+            ranked = ranked[:self.top_k]
+
+        text = self._render(vision_data, ranked)
+        if self.token_budget > 0 and estimate_tokens(text) > self.token_budget:
+            # 二分查找能放进预算的最多元素数
+            lo, hi = 0, len(ranked) - 1
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if estimate_tokens(self._render(vision_data, ranked[:mid])) <= self.token_budget:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            ranked = ranked[:lo]
+            text = self._render(vision_data, ranked)
+
+        stats.elements_after = len(ranked)
+        stats.tokens_after = estimate_tokens(text)
+        self.last_stats = stats
+        return text
+
+    def _render(self, vision_data: VisionData, elements: Sequence[UIElement]) -> str:
+        ordered = sorted(elements, key=lambda element: element.get("id", 0))
+        return self.serializer.serialize({**vision_data, "elements": ordered})
+
+    def _quantize(self, element: UIElement) -> UIElement:
+        q = self.bbox_quantum
+        return {**element, "bbox": [int(round(v / q)) * q for v in element.get("bbox", [])]}
+
+    def _rank(self, instruction: str, elements: List[UIElement]) -> List[UIElement]:
+        """按与指令的文本相关性降序、id 升序排名"""
+        if not (self.top_k > 0 or self.token_budget > 0):
+            return elements
+        query = _terms(instruction)
+        lowered = instruction.lower()
+        scored: List[Tuple[float, int, UIElement]] = []
+        for element in elements:
+            text = str(element.get("text", "")).lower()
+            score = 0.0
+            if text:
+                terms = _terms(text)
+                if query and terms:
+                    score = len(query & terms) / len(terms)
+                if len(text) >= 2 and text in lowered:
+                    score += 1.0
+            scored.append((-score, element.get("id", 0), element))
+        scored.sort(key=lambda item: (item[0], item[1]))
+        return [element for _, _, element in scored]
+
+
+def _terms(text: str) -> set:
+    """提取匹配用的词项：英文/数字单词 + CJK 单字和双字"""
+    text = text.lower()
+    terms = set(_WORD_RE.findall(text))
+    cjk = _CJK_RE.findall(text)
+    terms.update(cjk)
+    terms.update(a + b for a, b in zip(cjk, cjk[1:]))
+    return terms
+
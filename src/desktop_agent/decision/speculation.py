@@ -0,0 +1,311 @@
+# src/desktop_agent/decision/speculation.py
+"""
+推测式决策：多步任务中，在新一轮 Grounding 返回之前先用上一步的视觉数据调用 LLM，
+新的感知结果到达后校验计划引用的元素是否仍然存在且位置、文本一致，一致则直接采用，否则作废并重新决策
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from ..types import Action, UIElement, VisionData, normalize_id
+from ..tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+def _elements_by_id(vision_data: VisionData) -> Dict[Any, UIElement]:
+    """规范化 id（见 normalize_id）-> 元素"""
+    return {normalize_id(element["id"]): element for element in vision_data.get("elements", [])}
+
+
+def element_matches(old: UIElement, new: Optional[UIElement], tolerance: int = 4) -> bool:
+    """
+    判断同一 id 的元素在两次感知之间是否一致
+
+    Args:
+        old: 推测时使用的元素
+        new: 新感知结果中的同 id 元素（None 表示已不存在）
+        tolerance: bbox 每个坐标允许的偏差（像素）
+
+    Returns:
+        text、type 相同且 bbox 偏差不超过 tolerance 时为 True
+    """
+    if new is None:
+        return False
+    if old.get("text") != new.get("text") or old.get("type") != new.get("type"):
+        return False
+    return all(abs(a - b) <= tolerance for a, b in zip(old["bbox"], new["bbox"]))
+
+
+def match_ratio(old: VisionData, new: VisionData, tolerance: int = 4) -> float:
+    """
+    两次感知结果中一致的元素占比（分母取两者元素数的较大值，新增或消失的元素都会降低占比）
+
+    Args:
+        old: 推测时使用的视觉数据
+        new: 新的视觉数据
+        tolerance: bbox 允许的偏差（像素）
+
+    Returns:
+        0~1 之间的占比；分辨率不同时为 0
+    """
+    if old.get("resolution") != new.get("resolution"):
+        return 0.0
+    old_elements = old.get("elements", [])
+    new_elements = _elements_by_id(new)
+    total = max(len(old_elements), len(new_elements))
+    if total == 0:
+        return 1.0
+    matched = sum(
+        element_matches(element, new_elements.get(normalize_id(element["id"])), tolerance) for element in old_elements
+    )
+    return matched / total
+
+
+def referenced_ids(actions: List[Action]) -> Set[Any]:
+    """动作序列引用的元素 id（规范化后，"3" 与 3 视为同一个元素）"""
+    return {normalize_id(action["element_id"]) for action in actions if action.get("element_id") is not None}
+
+
+def validate_plan(actions: List[Action], speculated_on: VisionData, fresh: VisionData, tolerance: int = 4) -> bool:
+    """
+    校验基于旧视觉数据生成的计划在新视觉数据上是否仍然可以执行
+
+    Args:
+        actions: 推测得到的动作序列
+        speculated_on: 推测时使用的视觉数据
+        fresh: 新的视觉数据
+        tolerance: bbox 允许的偏差（像素）
+
+    Returns:
+        分辨率相同，且计划引用的每个元素在新结果中都存在并与旧结果一致时为 True；
+        计划包含 done 或不引用任何元素（如只有 press）时无法据此判断它是否仍然适用，一律为 False
+    """
+    if speculated_on.get("resolution") != fresh.get("resolution"):
+        return False
+    try:
+        element_ids = referenced_ids(actions)
+    except TypeError:
+        # 不可哈希的 element_id，执行时也会失败
+        return False
+    if not element_ids or any(action.get("type") == "done" for action in actions):
+        return False
+    old_elements = _elements_by_id(speculated_on)
+    new_elements = _elements_by_id(fresh)
+    for element_id in element_ids:
+        element = old_elements.get(element_id)
+        if element is None or not element_matches(element, new_elements.get(element_id), tolerance):
+            return False
+    return True
+
+
+@dataclass
+class Speculation:
+    """一次进行中的推测决策"""
+    vision_data: VisionData
+    # concurrent.futures.Future（同步）或 asyncio.Task（异步）
+    future: Any = None
+    started: float = 0.0
+    # LLM 调用结束的时间（perf_counter），未结束时为 None
+    finished: Optional[float] = None
+
+
+class SpeculativeDecider:
+    """
+    推测式决策器
+
+    speculate 在后台线程中用上一步的视觉数据开始决策，调用方随即进行新的 Grounding；
+    resolve 在新感知结果到达后决定采用还是作废推测结果：
+    - 整体一致的元素占比低于 min_match：界面变化太大，直接作废（未开始的调用会被取消）
+    - 计划引用的元素都存在且 bbox、文本一致：采用（命中），记录节省的延迟
+    - 否则（包括含 done 或不引用任何元素的计划）：作废（未命中），由调用方重新决策
+
+    推测调用与调用方共用同一个决策代理（last_usage、prompt 统计、置信度等都记录在代理上），
+    因此作废时若调用已在进行，会等它结束后才返回，保证调用方重新决策时没有并发的推测调用。
+    """
+
+    def __init__(self, decision_agent, bbox_tolerance: int = 4, min_match: float = 0.8):
+        """
+        Args:
+            decision_agent: DecisionAgent
+            bbox_tolerance: bbox 每个坐标允许的偏差（像素）
+            min_match: 继续等待推测结果所需的最低元素一致占比
+        """
+        self.decision_agent = decision_agent
+        self.bbox_tolerance = bbox_tolerance
+        self.min_match = min_match
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.aborted = 0
+        self.errors = 0
+        self.saved_ms = 0.0
+
+    @classmethod
+    def from_config(cls, decision_agent, config) -> "SpeculativeDecider":
+        return cls(
+            decision_agent,
+            bbox_tolerance=config.speculation_bbox_tolerance,
+            min_match=config.speculation_min_match,
+        )
+
+    def speculate(self, instruction: str, vision_data: VisionData, history: Optional[List[str]] = None) -> Speculation:
+        """
+        在后台线程中开始推测决策
+
+        Args:
+            instruction: 用户指令
+            vision_data: 上一步的视觉数据
+            history: 已执行动作的描述
+
+        Returns:
+            推测句柄，交给 resolve
+        """
+        speculation = Speculation(vision_data=vision_data, started=time.perf_counter())
+        history = list(history) if history is not None else None
+        context = contextvars.copy_context()
+        speculation.future = self._executor().submit(context.run, self._decide, speculation, instruction, history)
+        self._count("started")
+        return speculation
+
+    async def aspeculate(
+        self,
+        instruction: str,
+        vision_data: VisionData,
+        history: Optional[List[str]] = None
+    ) -> Speculation:
+        """speculate 的异步版本（在当前事件循环中创建任务）"""
+        speculation = Speculation(vision_data=vision_data, started=time.perf_counter())
+        history = list(history) if history is not None else None
+        speculation.future = asyncio.ensure_future(self._adecide(speculation, instruction, history))
+        # 被作废的任务不再被 await，在这里取走异常，避免事件循环报告未处理的异常
+        speculation.future.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self._count("started")
+        return speculation
+
+    def resolve(self, speculation: Speculation, fresh: VisionData) -> Optional[List[Action]]:
+        """
+        根据新的视觉数据决定是否采用推测结果
+
+        Args:
+            speculation: speculate 返回的句柄
+            fresh: 新的视觉数据
+
+        Returns:
+            采用时返回动作序列，作废时返回 None（调用方应基于 fresh 重新决策）
+        """
+        arrived = time.perf_counter()
+        if not self._worth_waiting(speculation, fresh):
+            # 已开始的线程无法取消，等它结束
+            if not speculation.future.cancel():
+                wait([speculation.future])
+            return None
+        try:
+            actions = speculation.future.result()
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"推测决策失败，改为重新决策: {e}")
+            return None
+        return self._commit(speculation, fresh, actions, arrived)
+
+    async def aresolve(self, speculation: Speculation, fresh: VisionData) -> Optional[List[Action]]:
+        """resolve 的异步版本（作废时会取消进行中的 LLM 请求）"""
+        arrived = time.perf_counter()
+        if not self._worth_waiting(speculation, fresh):
+            # 等任务处理完取消，之后它不会再修改决策代理的状态
+            speculation.future.cancel()
+            await asyncio.wait([speculation.future])
+            return None
+        try:
+            actions = await speculation.future
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"推测决策失败，改为重新决策: {e}")
+            return None
+        return self._commit(speculation, fresh, actions, arrived)
+
+    def discard(self, speculation: Optional[Speculation]) -> None:
+        """放弃推测（例如新一轮感知失败时；只取消，不等待进行中的调用）"""
+        if speculation is not None:
+            speculation.future.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        """返回推测次数、命中/未命中/提前作废/失败次数、命中率和累计节省的延迟"""
+        with self._lock:
+            resolved = self.hits + self.misses + self.aborted + self.errors
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "aborted": self.aborted,
+                "errors": self.errors,
+                "hit_rate": self.hits / resolved if resolved else 0.0,
+                "saved_ms": round(self.saved_ms, 3),
+            }
+
+    def close(self) -> None:
+        """关闭后台线程（进行中的推测结果会被丢弃）"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # 被作废但仍在进行的调用不应阻塞下一次推测
+                self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculative-decision")
+            return self._pool
+
+    def _decide(self, speculation: Speculation, instruction: str, history: Optional[List[str]]) -> List[Action]:
+        try:
+            with tracer.span("decision.speculative"):
+                return self.decision_agent.decide(instruction, speculation.vision_data, history)
+        finally:
+            speculation.finished = time.perf_counter()
+
+    async def _adecide(self, speculation: Speculation, instruction: str, history: Optional[List[str]]) -> List[Action]:
+        try:
+            with tracer.span("decision.speculative"):
+                return await self.decision_agent.adecide(instruction, speculation.vision_data, history)
+        finally:
+            speculation.finished = time.perf_counter()
+
+    def _worth_waiting(self, speculation: Speculation, fresh: VisionData) -> bool:
+        ratio = match_ratio(speculation.vision_data, fresh, self.bbox_tolerance)
+        if ratio >= self.min_match:
+            return True
+        self._count("aborted")
+        logger.debug(f"界面变化较大（一致元素占比 {ratio:.0%}），作废推测决策")
+        return False
+
+    def _commit(
+        self,
+        speculation: Speculation,
+        fresh: VisionData,
+        actions: List[Action],
+        arrived: float
+    ) -> Optional[List[Action]]:
+        if not validate_plan(actions, speculation.vision_data, fresh, self.bbox_tolerance):
+            self._count("misses")
+            logger.debug("推测计划引用的元素已变化或计划不可推测采用，重新决策")
+            return None
+        # 不推测时，决策要等感知结果到达后才开始，耗时与推测调用相同
+        duration = speculation.finished - speculation.started
+        saved_ms = (arrived + duration - max(arrived, speculation.finished)) * 1000
+        with self._lock:
+            self.hits += 1
+            self.saved_ms += saved_ms
+        tracer.observe("decision.speculation_saved", saved_ms)
+        logger.debug(f"采用推测计划，节省 {saved_ms:.0f}ms")
+        return actions
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
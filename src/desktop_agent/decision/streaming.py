@@ -0,0 +1,136 @@
+# src/desktop_agent/decision/streaming.py
+"""
+增量 JSON 解析：从 LLM 流式输出中逐个取出 "actions" 数组里已闭合的动作
+"""
+import json
+from typing import List, Optional
+from ..types import Action
+
+
+class ActionStreamParser:
+    """
+    增量解析形如 {"actions": [{...}, {...}]} 的流式文本
+
+    每次 feed 一段文本，返回本段内新闭合的动作对象；
+    只跟踪括号深度和字符串状态，不会重复扫描已处理过的文本。
+
+    示例：
+        parser = ActionStreamParser()
+        for chunk in stream:
+            for action in parser.feed(chunk):
+                executor.execute([action], element_map)
+        parser.close()
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._pending_key: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._actions_depth: Optional[int] = None
+        self._element_start: Optional[int] = None
+        self._actions_closed = False
+        self.emitted = 0
+
+    @property
+    def text(self) -> str:
+        """目前收到的完整文本"""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Action]:
+        """
+        输入一段流式文本
+
+        Args:
+            chunk: 新到达的文本片段
+
+        Returns:
+            本段内闭合的动作列表（可能为空）
+
+        Raises:
+            json.JSONDecodeError: 已闭合的动作不是合法 JSON
+        """
+        if not chunk:
+            return []
+        self._text += chunk
+        text = self._text
+        actions: List[Action] = []
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1 and self._stack[0] == "{":
+                        self._pending_key = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and len(self._stack) == 1:
+                self._current_key = self._pending_key
+            elif ch == "," and len(self._stack) == 1:
+                self._current_key = None
+            elif ch in "{[":
+                if (
+                    ch == "["
+                    and len(self._stack) == 1
+                    and self._current_key == "actions"
+                    and self._actions_depth is None
+                ):
+                    self._actions_depth = 2
+                elif (
+                    ch == "{"
+                    and self._actions_depth is not None
+                    and not self._actions_closed
+                    and len(self._stack) == self._actions_depth
+                ):
+                    self._element_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                depth = len(self._stack)
+                if self._actions_depth is not None and not self._actions_closed:
+                    if ch == "}" and depth == self._actions_depth and self._element_start is not None:
+                        actions.append(json.loads(text[self._element_start:i + 1]))
+                        self._element_start = None
+                    elif ch == "]" and depth == self._actions_depth - 1:
+                        self._actions_closed = True
+
+        self._pos = len(text)
+        self.emitted += len(actions)
+        return actions
+
+    def close(self) -> List[Action]:
+        """
+        流结束时调用：若流中没有识别出顶层的 actions 数组，
+        则对完整文本整体解析一次（兼容代码块包裹等格式），返回尚未输出的动作
+
+        Returns:
+            剩余的动作列表
+
+        Raises:
+            json.JSONDecodeError: 完整文本不是合法 JSON
+        """
+        if self._actions_depth is not None:
+            return []
+        text = self._text.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[4:]
+        result = json.loads(text)
+        actions = result.get("actions", []) if isinstance(result, dict) else []
+        remaining = actions[self.emitted:]
+        self.emitted += len(remaining)
+        return remaining
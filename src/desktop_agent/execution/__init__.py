@@ -1,5 +1,11 @@
 """执行模块：执行动作序列"""
 from .executor import Executor
+from .backends import InputBackend, PyAutoGUIBackend, RecordingBackend
+from .plan import CompiledPlan, compile_plan
+from .sandbox import SandboxPool, CodeResult
 
-__all__ = ["Executor"]
+__all__ = [
+    "Executor", "InputBackend", "PyAutoGUIBackend", "RecordingBackend", "SandboxPool", "CodeResult",
+    "CompiledPlan", "compile_plan",
+]
 
@@ -0,0 +1,175 @@
+# src/desktop_agent/execution/_sandbox_worker.py
+"""
+沙箱工作进程（由 SandboxPool 按文件路径启动，不导入 desktop_agent 包）
+
+协议：stdin/stdout 上的帧，每帧为 4 字节大端长度 + UTF-8 JSON
+- 启动参数（argv[1]）：{"warm_imports": [...], "memory_limit_mb": int, "cpu_limit": float}
+- 启动完成后输出 {"ready": true}
+- 请求 {"code": str}，响应 {"stdout": str, "stderr": str, "exit_code": int}
+
+每个任务在从本进程 fork 出的子进程中运行：子进程继承已预加载的模块（fork 约 1 毫秒），
+而任务对 cwd、环境变量、sys.path、sys.modules、线程等进程状态的修改随子进程退出一起丢弃，
+不会泄漏到下一个任务。
+"""
+import io
+import json
+import os
+import signal
+import struct
+import sys
+import traceback
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_HEADER = struct.Struct(">I")
+
+
+def _read_exact(fd, n):
+    chunks = []
+    while n:
+        chunk = os.read(fd, n)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(fd):
+    header = _read_exact(fd, _HEADER.size)
+    if header is None:
+        return None
+    body = _read_exact(fd, _HEADER.unpack(header)[0])
+    return None if body is None else json.loads(body.decode("utf-8"))
+
+
+def _send(fd, message):
+    body = json.dumps(message).encode("utf-8")
+    os.write(fd, _HEADER.pack(len(body)) + body)
+
+
+def _apply_limits(options):
+    if resource is None:
+        return
+    memory_mb = options.get("memory_limit_mb") or 0
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    # 禁止生成 core 文件
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def _set_cpu_budget(seconds):
+    """CPU 时间是累计的，把软上限设为已用时间 + 预算，超出时收到 SIGXCPU 退出"""
+    if resource is None or not seconds or seconds <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(used + seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _run(code):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    exit_code = 0
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        exec(compile(code, "<code>", "exec"), namespace)
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc(file=stderr)
+        exit_code = 1
+    finally:
+        sys.stdout, sys.stderr = real_stdout, real_stderr
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "exit_code": exit_code}
+
+
+def _read_all(fd):
+    chunks = []
+    while True:
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def _run_forked(code, options, protocol_fds):
+    """在子进程中运行一个任务，结果通过管道以 JSON 传回"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # 子进程：不持有协议描述符，结果写完后直接退出（不执行 atexit 和缓冲区刷新）
+        status = 1
+        try:
+            os.close(read_fd)
+            for fd in protocol_fds:
+                os.close(fd)
+            _set_cpu_budget(options.get("cpu_limit"))
+            result = json.dumps(_run(code)).encode("utf-8")
+            view = memoryview(result)
+            while view:
+                view = view[os.write(write_fd, view):]
+            status = 0
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    try:
+        body = _read_all(read_fd)
+    finally:
+        os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+    if body and os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+        return json.loads(body.decode("utf-8"))
+    # 子进程被信号终止（如超出 CPU 上限时的 SIGXCPU）或没有写完结果
+    if os.WIFSIGNALED(status):
+        signum = os.WTERMSIG(status)
+        try:
+            name = signal.Signals(signum).name
+        except ValueError:
+            name = str(signum)
+        return {"stdout": "", "stderr": f"代码进程被信号 {name} 终止", "exit_code": -signum}
+    code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1
+    return {"stdout": "", "stderr": f"代码进程异常退出（返回码 {code}）", "exit_code": code or 1}
+
+
+def main():
+    options = json.loads(sys.argv[1]) if len(sys.argv) > 1 else {}
+    # 协议使用复制出来的描述符，用户代码直接写 fd 0/1 不会破坏帧
+    fd_in, fd_out = os.dup(0), os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    for name in options.get("warm_imports", []):
+        try:
+            __import__(name)
+        except Exception as e:
+            print(f"预加载模块 {name} 失败: {e}", file=sys.stderr)
+    _apply_limits(options)
+    _send(fd_out, {"ready": True})
+
+    while True:
+        request = _recv(fd_in)
+        if request is None:
+            break
+        _send(fd_out, _run_forked(request["code"], options, (fd_in, fd_out)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# src/desktop_agent/execution/backends.py
+"""
+输入后端：Executor 通过后端发送鼠标和键盘事件
+
+- PyAutoGUIBackend: 真实桌面输入，事件间停顿可配置（0 即快速模式），长文本可粘贴输入
+- RecordingBackend: 只记录带时间戳的事件流，用于无显示环境下的测试和吞吐量测量
+"""
+import logging
+import sys
+import time
+from typing import Any, Callable, Dict, List, Literal, NamedTuple, Optional, Sequence, Union
+
+# 可选依赖：剪贴板（pyautogui 的依赖 mouseinfo 通常会带上）
+try:
+    import pyperclip
+except ImportError:
+    pyperclip = None
+
+logger = logging.getLogger(__name__)
+
+TextMode = Literal["write", "paste", "auto"]
+
+
+class InputBackend:
+    """输入后端基类"""
+
+    name = "base"
+
+    def click(self, x: int, y: int) -> None:
+        raise NotImplementedError
+
+    def type_text(self, text: str) -> None:
+        raise NotImplementedError
+
+    def press(self, keys: Union[str, Sequence[str]]) -> None:
+        """按下一个或依次按下多个按键"""
+        raise NotImplementedError
+
+    def hotkey(self, *keys: str) -> None:
+        raise NotImplementedError
+
+
+class PyAutoGUIBackend(InputBackend):
+    """
+    基于 pyautogui 的输入后端
+
+    pyautogui 默认在每次调用后停顿 PAUSE（0.1 秒），write 逐字符发送。
+    本后端对每个事件关闭 pyautogui 自带的停顿，改为自己的 pause；
+    文本可整段粘贴（一次 Ctrl+V），也可作为一个无间隔的按键流发送。
+    """
+
+    name = "pyautogui"
+
+    def __init__(
+        self,
+        pause: Optional[float] = None,
+        text_mode: TextMode = "write",
+        paste_threshold: int = 32,
+        restore_clipboard: bool = True,
+    ):
+        """
+        Args:
+            pause: 每个事件后的停顿（秒，0 为快速模式；None 沿用 pyautogui.PAUSE）
+            text_mode: 文本输入方式：write 逐字符按键，paste 剪贴板粘贴，
+                       auto 在文本较长或含非 ASCII 字符时粘贴
+            paste_threshold: auto 模式下改用粘贴的最小文本长度
+            restore_clipboard: 粘贴后是否恢复原剪贴板内容
+        """
+        import pyautogui
+
+        self._gui = pyautogui
+        self.pause = pause
+        self.text_mode = text_mode
+        self.paste_threshold = paste_threshold
+        self.restore_clipboard = restore_clipboard
+        if text_mode not in ("write", "paste", "auto"):
+            raise ValueError(f"不支持的文本输入方式: {text_mode}")
+        if text_mode == "paste" and pyperclip is None:
+            raise ImportError("粘贴输入需要 pyperclip 库: pip install pyperclip")
+
+    def click(self, x: int, y: int) -> None:
+        self._gui.click(x, y, _pause=False)
+        self._sleep()
+
+    def type_text(self, text: str) -> None:
+        if self._should_paste(text):
+            self._paste(text)
+        else:
+            self._gui.write(text, interval=0.0, _pause=False)
+        self._sleep()
+
+    def press(self, keys: Union[str, Sequence[str]]) -> None:
+        self._gui.press(keys, _pause=False)
+        self._sleep()
+
+    def hotkey(self, *keys: str) -> None:
+        self._gui.hotkey(*keys, _pause=False)
+        self._sleep()
+
+    def _should_paste(self, text: str) -> bool:
+        if self.text_mode == "write" or pyperclip is None:
+            return False
+        if self.text_mode == "paste":
+            return True
+        return len(text) >= self.paste_threshold or not text.isascii()
+
+    def _paste(self, text: str) -> None:
+        previous = None
+        if self.restore_clipboard:
+            try:
+                previous = pyperclip.paste()
+            except Exception as e:
+                logger.debug(f"读取剪贴板失败: {e}")
+        pyperclip.copy(text)
+        self._gui.hotkey("command" if sys.platform == "darwin" else "ctrl", "v", _pause=False)
+        if previous is not None:
+            # 等目标程序读完剪贴板再恢复
+            time.sleep(0.05)
+            pyperclip.copy(previous)
+
+    def _sleep(self) -> None:
+        pause = self._gui.PAUSE if self.pause is None else self.pause
+        if pause > 0:
+            time.sleep(pause)
+
+
+class InputEvent(NamedTuple):
+    """记录的输入事件"""
+    ts: float
+    kind: str
+    args: tuple
+
+
+class RecordingBackend(InputBackend):
+    """
+    记录事件而不操作桌面的后端（无需显示器）
+
+    可选的 latency 模拟每个事件的耗时，用于估算真实环境下的吞吐量。
+    """
+
+    name = "recording"
+
+    def __init__(self, latency: float = 0.0, clock: Callable[[], float] = time.perf_counter):
+        """
+        Args:
+            latency: 每个事件模拟的耗时（秒）
+            clock: 时间戳来源
+        """
+        self.latency = latency
+        self.clock = clock
+        self.events: List[InputEvent] = []
+
+    def click(self, x: int, y: int) -> None:
+        self._record("click", x, y)
+
+    def type_text(self, text: str) -> None:
+        self._record("type", text)
+
+    def press(self, keys: Union[str, Sequence[str]]) -> None:
+        self._record("press", keys if isinstance(keys, str) else tuple(keys))
+
+    def hotkey(self, *keys: str) -> None:
+        self._record("hotkey", *keys)
+
+    def _record(self, kind: str, *args: Any) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        self.events.append(InputEvent(self.clock(), kind, args))
+
+    def clear(self) -> None:
+        self.events.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回事件数、首尾事件间隔和每秒事件数"""
+        count = len(self.events)
+        duration = self.events[-1].ts - self.events[0].ts if count > 1 else 0.0
+        return {
+            "events": count,
+            "duration": duration,
+            "events_per_second": (count - 1) / duration if duration > 0 else 0.0,
+        }
+
+
+BACKENDS = {
+    "pyautogui": PyAutoGUIBackend,
+    "recording": RecordingBackend,
+}
+
+
+def create_backend(config) -> InputBackend:
+    """
+    按配置创建输入后端
+
+    Args:
+        config: 配置对象
+
+    Returns:
+        输入后端
+
+    Raises:
+        ValueError: 不支持的后端名称
+    """
+    name = config.input_backend
+    if name not in BACKENDS:
+        raise ValueError(f"不支持的输入后端: {name}")
+    if name == "recording":
+        return RecordingBackend()
+    return PyAutoGUIBackend(
+        pause=config.input_pause,
+        text_mode=config.input_text_mode,
+        paste_threshold=config.input_paste_threshold,
+    )
@@ -1,132 +1,269 @@
 # src/desktop_agent/execution/executor.py
-import pyautogui
+import asyncio
+import os
 import subprocess
 import logging
-from typing import Optional
+import threading
+import time
+from typing import Any, AsyncIterable, Dict, Iterable, Optional, Tuple, Union
+from .backends import InputBackend, PyAutoGUIBackend, create_backend
+from .plan import CompiledPlan, Step, center, compile_plan
+from .sandbox import SandboxPool
 from ..config import Config
-from ..types import Action, ElementMap
+from ..tracing import tracer
+from ..types import Action, ActionRecord, ElementMap
 
 logger = logging.getLogger(__name__)
 
+# pyautogui 操作的是进程内唯一的桌面，多个代理并发执行时需串行化输入事件
+_INPUT_LOCK = threading.Lock()
+
 class Executor:
     """执行器：将动作序列转换为实际的桌面操作"""
     
-    def __init__(self, enable_local_code: bool = False, config: Optional[Config] = None):
+    def __init__(
+        self,
+        enable_local_code: bool = False,
+        config: Optional[Config] = None,
+        backend: Optional[InputBackend] = None,
+        optimize: Optional[bool] = None
+    ):
         """
         Args:
             enable_local_code: 是否启用本地代码执行（安全风险）
             config: 配置对象（可选）
+            backend: 输入后端（默认按 config 创建，无 config 时为 pyautogui 默认行为）
+            optimize: 执行动作列表前是否合并冗余事件（见 compile_plan，默认读取 config.executor_optimize）
         """
         self.enable_local_code = enable_local_code or (config and config.enable_local_code if config else False)
         if self.enable_local_code:
             logger.warning("⚠️  已启用本地代码执行，存在安全风险！")
+        if backend is None:
+            backend = create_backend(config) if config else PyAutoGUIBackend()
+        self.backend = backend
+        self.config = config
+        self.code_timeout = config.code_timeout if config else 10.0
+        self._sandbox: Optional[SandboxPool] = None
+        self._sandbox_lock = threading.Lock()
+        if optimize is None:
+            optimize = config.executor_optimize if config else True
+        self.optimize = optimize
+        self.actions_executed = 0
+        self.busy_seconds = 0.0
+        self.plans_compiled = 0
+        self.events_saved = 0
 
-    def execute(self, actions: list[Action], element_map: ElementMap) -> None:
+    def compile(self, actions: Iterable[Action], element_map: ElementMap) -> CompiledPlan:
         """
-        执行动作序列
+        校验整个动作序列并编译为不可变的计划（预先计算点击坐标，按 self.optimize 合并冗余事件）
         
         Args:
             actions: 动作列表
             element_map: 元素 ID 到边界框的映射
         
+        Returns:
+            已编译的计划
+        
         Raises:
-            KeyError: 动作引用了不存在的 element_id
-            ValueError: 动作格式错误
-            RuntimeError: 执行失败
+            ValueError: 动作格式错误或引用了不存在的 element_id
         """
-        if not actions:
-            logger.info("没有需要执行的动作")
-            return
+        plan = compile_plan(actions, element_map, optimize=self.optimize)
+        self.plans_compiled += 1
+        self.events_saved += plan.events_saved
+        if plan.events_saved:
+            logger.debug(f"计划编译：输入事件 {plan.events_before} → {plan.events_after}")
+        return plan
+    
+    def execute(self, actions: Union[Iterable[Action], CompiledPlan], element_map: ElementMap) -> list[Action]:
+        """
+        执行动作序列
+        
+        动作列表先整体编译（见 compile）：任何一个动作无效时，在产生输入事件之前就失败。
         
-        logger.info(f"开始执行 {len(actions)} 个动作")
+        Args:
+            actions: 动作列表、已编译的计划，或逐个产出动作的迭代器（如 DecisionAgent.decide_stream），
+                     迭代器模式下每产出一个动作立即执行（不做整体校验和合并）
+            element_map: 元素 ID 到边界框的映射（dict 或 ElementIndex）
+        
+        Returns:
+            已执行的动作列表
         
+        Raises:
+            RuntimeError: 动作序列校验失败或执行失败
+        """
+        if isinstance(actions, (list, tuple)):
+            if not actions:
+                logger.info("没有需要执行的动作")
+                return []
+            
+            if isinstance(actions, CompiledPlan):
+                plan = actions
+            else:
+                try:
+                    plan = self.compile(actions, element_map)
+                except ValueError as e:
+                    logger.error(f"动作序列校验失败: {e}")
+                    raise RuntimeError(f"动作序列校验失败（未执行任何动作）: {e}") from e
+            
+            logger.info(f"开始执行 {plan.num_actions} 个动作（{len(plan.steps)} 步）")
+            with _INPUT_LOCK:
+                for step in plan.steps:
+                    self._execute_step(step, plan.num_actions)
+            return list(plan.actions)
+        
+        logger.info("开始流式执行动作")
+        executed = []
         for i, act in enumerate(actions):
-            try:
-                typ = act.get("type")
-                if not typ:
-                    raise ValueError(f"动作 {i+1} 缺少 'type' 字段")
-                
-                logger.debug(f"执行动作 {i+1}/{len(actions)}: {typ}")
-                
+            self._execute_locked(i, act, element_map)
+            executed.append(act)
+        if not executed:
+            logger.info("没有需要执行的动作")
+        return executed
+    
+    async def aexecute(
+        self,
+        actions: Union[Iterable[Action], AsyncIterable[Action]],
+        element_map: ElementMap
+    ) -> list[Action]:
+        """
+        execute 的异步版本：在线程池中执行，不阻塞事件循环
+        
+        Args:
+            actions: 动作列表、迭代器，或异步迭代器（如 DecisionAgent.adecide_stream）
+            element_map: 元素 ID 到边界框的映射（dict 或 ElementIndex）
+        
+        Returns:
+            已执行的动作列表
+        """
+        loop = asyncio.get_running_loop()
+        if not hasattr(actions, "__aiter__"):
+            return await loop.run_in_executor(None, self.execute, actions, element_map)
+        
+        logger.info("开始流式执行动作")
+        executed = []
+        async for act in actions:
+            await loop.run_in_executor(None, self._execute_locked, len(executed), act, element_map)
+            executed.append(act)
+        if not executed:
+            logger.info("没有需要执行的动作")
+        return executed
+    
+    def _execute_locked(self, i: int, act: Action, element_map: ElementMap) -> None:
+        with _INPUT_LOCK:
+            self._execute_one(i, act, element_map)
+    
+    def _execute_one(self, i: int, act: Action, element_map: ElementMap, total: Optional[int] = None) -> None:
+        start = time.perf_counter()
+        try:
+            # 字段校验在构造 ActionRecord 时一次完成
+            record = ActionRecord.from_dict(act)
+            typ = record.type
+            
+            logger.debug(f"执行动作 {i+1}/{total or '?'}: {typ}")
+            
+            with tracer.span("execute.action", type=typ, index=i):
                 if typ == "click":
-                    self._execute_click(act, element_map)
+                    self._execute_click(record, element_map)
                 elif typ == "type":
-                    self._execute_type(act, element_map)
+                    self._execute_type(record, element_map)
                 elif typ == "press":
-                    self._execute_press(act)
+                    self._execute_press(record)
                 elif typ == "code":
-                    self._execute_code(act)
+                    self._execute_code(record)
                 else:
-                    raise ValueError(f"不支持的动作类型: {typ}")
-            except Exception as e:
-                logger.error(f"执行动作 {i+1} 失败: {e}")
-                raise RuntimeError(f"执行动作 {i+1} 失败: {e}") from e
+                    logger.debug("模型报告任务已完成")
+        except Exception as e:
+            logger.error(f"执行动作 {i+1} 失败: {e}")
+            raise RuntimeError(f"执行动作 {i+1} 失败: {e}") from e
+        finally:
+            self.busy_seconds += time.perf_counter() - start
+        self.actions_executed += 1
 
-    def _execute_click(self, action: Action, element_map: ElementMap) -> None:
+    def _execute_step(self, step: Step, total: int) -> None:
+        """执行编译后的一个步骤（坐标已预先计算）"""
+        start = time.perf_counter()
+        index = step.indices[-1]
+        try:
+            logger.debug(f"执行动作 {index + 1}/{total}: {step.op}")
+            with tracer.span("execute.action", type=step.op, index=index, merged=len(step.indices)):
+                if step.op == "click":
+                    self.backend.click(*step.point)
+                    logger.debug(f"点击位置: {step.point}")
+                elif step.op == "type":
+                    if step.focus:
+                        self.backend.click(*step.point)
+                    self.backend.type_text(step.text)
+                    logger.debug(f"在元素 {step.element_id} 输入文本: {step.text[:50]}...")
+                elif step.op == "press":
+                    self.backend.press(step.keys[0] if len(step.keys) == 1 else list(step.keys))
+                    logger.debug(f"按键: {', '.join(step.keys)}")
+                elif step.op == "hotkey":
+                    self.backend.hotkey(*step.keys)
+                    logger.debug(f"组合键: {'+'.join(step.keys)}")
+                elif step.op == "code":
+                    if not self.enable_local_code:
+                        raise RuntimeError("代码执行未启用（安全考虑），需要设置 enable_local_code=True")
+                    logger.warning(f"⚠️  执行 {step.language} 代码: {step.code[:100]}...")
+                    self._run_code(step.language, step.code)
+                else:
+                    logger.debug("模型报告任务已完成")
+        except Exception as e:
+            logger.error(f"执行动作 {index + 1} 失败: {e}")
+            raise RuntimeError(f"执行动作 {index + 1} 失败: {e}") from e
+        finally:
+            self.busy_seconds += time.perf_counter() - start
+        self.actions_executed += len(step.indices)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回已执行动作数、执行耗时、每秒动作数，以及编译的计划数和合并省下的输入事件数"""
+        return {
+            "actions": self.actions_executed,
+            "seconds": self.busy_seconds,
+            "actions_per_second": self.actions_executed / self.busy_seconds if self.busy_seconds else 0.0,
+            "plans": self.plans_compiled,
+            "events_saved": self.events_saved,
+            "events_saved_per_plan": self.events_saved / self.plans_compiled if self.plans_compiled else 0.0,
+        }
+
+    def _execute_click(self, action: ActionRecord, element_map: ElementMap) -> None:
         """执行点击动作"""
-        element_id = action.get("element_id")
-        if element_id is None:
-            raise ValueError("click 动作缺少 'element_id'")
+        element_id = action.element_id
         if element_id not in element_map:
             raise KeyError(f"element_id {element_id} 不存在于 element_map")
         
         x, y = self._center(element_map[element_id])
-        pyautogui.click(x, y)
+        self.backend.click(x, y)
         logger.debug(f"点击位置: ({x}, {y})")
 
-    def _execute_type(self, action: Action, element_map: ElementMap) -> None:
+    def _execute_type(self, action: ActionRecord, element_map: ElementMap) -> None:
         """执行输入文本动作"""
-        element_id = action.get("element_id")
-        text = action.get("text", "")
+        element_id = action.element_id
+        text = action.text or ""
         
-        if element_id is None:
-            raise ValueError("type 动作缺少 'element_id'")
         if element_id not in element_map:
             raise KeyError(f"element_id {element_id} 不存在于 element_map")
         
         x, y = self._center(element_map[element_id])
-        pyautogui.click(x, y)
-        pyautogui.write(text)
+        self.backend.click(x, y)
+        self.backend.type_text(text)
         logger.debug(f"在元素 {element_id} 输入文本: {text[:50]}...")
 
-    def _execute_press(self, action: Action) -> None:
+    def _execute_press(self, action: ActionRecord) -> None:
         """执行按键动作"""
-        key = action.get("key")
-        if not key:
-            raise ValueError("press 动作缺少 'key'")
-        
-        pyautogui.press(key)
-        logger.debug(f"按键: {key}")
+        self.backend.press(action.key)
+        logger.debug(f"按键: {action.key}")
 
-    def _execute_code(self, action: Action) -> None:
+    def _execute_code(self, action: ActionRecord) -> None:
         """执行代码动作"""
         if not self.enable_local_code:
             raise RuntimeError("代码执行未启用（安全考虑），需要设置 enable_local_code=True")
         
-        lang = action.get("language")
-        code = action.get("code")
-        
-        if not lang or not code:
-            raise ValueError("code 动作缺少 'language' 或 'code'")
-        
-        logger.warning(f"⚠️  执行 {lang} 代码: {code[:100]}...")
-        self._run_code(lang, code)
+        logger.warning(f"⚠️  执行 {action.language} 代码: {action.code[:100]}...")
+        self._run_code(action.language, action.code)
 
     def _center(self, bbox: tuple) -> Tuple[int, int]:
-        """
-        计算边界框的中心点
-        
-        Args:
-            bbox: (x1, y1, x2, y2) 格式的边界框
-        
-        Returns:
-            (x, y) 中心点坐标
-        """
-        if len(bbox) != 4:
-            raise ValueError(f"边界框格式错误，应为 (x1, y1, x2, y2)，得到: {bbox}")
-        
-        x1, y1, x2, y2 = bbox
-        return (x1 + x2) // 2, (y1 + y2) // 2
+        """计算边界框的中心点（见 plan.center）"""
+        return center(bbox)
 
     def _run_code(self, lang: str, code: str) -> None:
         """
@@ -138,14 +275,23 @@ class Executor:
         
         Raises:
             ValueError: 不支持的编程语言
-            subprocess.TimeoutExpired: 代码执行超时
-            subprocess.CalledProcessError: 代码执行失败
+            RuntimeError: 代码执行超时或失败
         """
         if lang == "python":
+            pool = self._sandbox_pool()
+            if pool is not None:
+                result = pool.run(code, timeout=self.code_timeout)
+                if result.timed_out:
+                    raise RuntimeError(f"代码执行超时（{self.code_timeout:g}秒）")
+                if result.exit_code != 0:
+                    raise RuntimeError(f"代码执行失败: {result.stderr}")
+                if result.stdout:
+                    logger.info(f"代码输出: {result.stdout}")
+                return
             try:
                 result = subprocess.run(
                     ["python", "-c", code],
-                    timeout=10,
+                    timeout=self.code_timeout,
                     capture_output=True,
                     text=True,
                     check=True
@@ -153,8 +299,25 @@ class Executor:
                 if result.stdout:
                     logger.info(f"代码输出: {result.stdout}")
             except subprocess.TimeoutExpired:
-                raise RuntimeError("代码执行超时（10秒）")
+                raise RuntimeError(f"代码执行超时（{self.code_timeout:g}秒）")
             except subprocess.CalledProcessError as e:
                 raise RuntimeError(f"代码执行失败: {e.stderr}")
         else:
-            raise ValueError(f"不支持的编程语言: {lang}")
\ No newline at end of file
+            raise ValueError(f"不支持的编程语言: {lang}")
+
+    def _sandbox_pool(self) -> Optional[SandboxPool]:
+        """首次运行代码时创建沙箱进程池；池大小为 0 或非 POSIX 系统时返回 None（每次新建子进程）"""
+        if self._sandbox is None:
+            size = self.config.code_pool_size if self.config else 2
+            if size <= 0 or os.name != "posix":
+                return None
+            with self._sandbox_lock:
+                if self._sandbox is None:
+                    self._sandbox = SandboxPool.from_config(self.config) if self.config else SandboxPool()
+        return self._sandbox
+
+    def close(self) -> None:
+        """终止沙箱进程池"""
+        if self._sandbox is not None:
+            self._sandbox.close()
+            self._sandbox = None
@@ -0,0 +1,147 @@
+# src/desktop_agent/execution/plan.py
+"""
+动作计划编译：执行前一次性校验整个动作序列、预先计算点击坐标，并合并冗余的输入事件
+
+"ctrl+c" 形式的组合键总是转换为一次 hotkey（逐个 press 无法按下组合键）。
+开启优化时另外合并：
+- click N 之后紧跟 type N：type 本身会先点击 N，前面的 click 省略
+- 连续 type 同一元素：焦点已经在该元素上，后面的 type 不再点击
+- 连续的 press：合并为一次按键序列
+"""
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+from ..types import Action, ActionRecord, ElementMap
+
+# 编译后的步骤类型
+STEP_OPS = ("click", "type", "press", "hotkey", "code", "done")
+
+
+class Step(NamedTuple):
+    """编译后的一个执行步骤"""
+    op: str
+    # 对应的原始动作序号（合并后可能有多个）
+    indices: Tuple[int, ...]
+    point: Optional[Tuple[int, int]] = None
+    element_id: Optional[object] = None
+    text: Optional[str] = None
+    keys: Tuple[str, ...] = ()
+    # type 步骤是否需要先点击目标元素
+    focus: bool = True
+    language: Optional[str] = None
+    code: Optional[str] = None
+
+    @property
+    def events(self) -> int:
+        """该步骤产生的输入事件（后端调用）数"""
+        if self.op == "type":
+            return 2 if self.focus else 1
+        return 0 if self.op == "done" else 1
+
+
+class CompiledPlan(NamedTuple):
+    """不可变的已编译计划，由 compile_plan 生成，可多次传给 Executor.execute"""
+    steps: Tuple[Step, ...]
+    actions: Tuple[Action, ...]
+    # 逐个执行原始动作需要的输入事件数
+    events_before: int
+
+    @property
+    def events_after(self) -> int:
+        return sum(step.events for step in self.steps)
+
+    @property
+    def events_saved(self) -> int:
+        return self.events_before - self.events_after
+
+    @property
+    def num_actions(self) -> int:
+        """原始动作数（len() 仍是 NamedTuple 的字段数）"""
+        return len(self.actions)
+
+
+def center(bbox) -> Tuple[int, int]:
+    """
+    计算边界框的中心点
+
+    Raises:
+        ValueError: bbox 不是 (x1, y1, x2, y2)
+    """
+    if len(bbox) != 4:
+        raise ValueError(f"边界框格式错误，应为 (x1, y1, x2, y2)，得到: {bbox}")
+    x1, y1, x2, y2 = bbox
+    return int((x1 + x2) // 2), int((y1 + y2) // 2)
+
+
+def _naive_events(record: ActionRecord) -> int:
+    if record.type == "type":
+        return 2
+    return 0 if record.type == "done" else 1
+
+
+def compile_plan(actions: Iterable[Action], element_map: ElementMap, optimize: bool = True) -> CompiledPlan:
+    """
+    编译动作序列
+
+    Args:
+        actions: 动作列表
+        element_map: 元素 ID 到边界框的映射
+        optimize: 是否合并冗余事件（False 时只做校验、坐标预计算和组合键转换）
+
+    Returns:
+        已编译的计划
+
+    Raises:
+        ValueError: 某个动作格式错误、引用了不存在的 element_id 或边界框格式错误（在产生任何输入事件之前）
+    """
+    actions = tuple(actions)
+    records = []
+    points = []
+    for i, action in enumerate(actions):
+        try:
+            record = ActionRecord.from_dict(action)
+            point = None
+            if record.type in ("click", "type"):
+                if record.element_id not in element_map:
+                    raise ValueError(f"element_id {record.element_id} 不存在于 element_map")
+                point = center(element_map[record.element_id])
+        except ValueError as e:
+            raise ValueError(f"动作 {i + 1}: {e}") from e
+        records.append(record)
+        points.append(point)
+
+    steps = []
+    for i, (record, point) in enumerate(zip(records, points)):
+        if record.type == "click":
+            steps.append(Step("click", (i,), point=point, element_id=record.element_id))
+        elif record.type == "type":
+            step = Step("type", (i,), point=point, element_id=record.element_id, text=record.text or "")
+            previous = steps[-1] if steps else None
+            if optimize and previous is not None and previous.element_id == record.element_id:
+                if previous.op == "click":
+                    # 紧跟在 click 之后：由 type 的点击代替
+                    step = step._replace(indices=previous.indices + step.indices)
+                    steps.pop()
+                elif previous.op == "type":
+                    # 焦点已在该元素上
+                    step = step._replace(focus=False)
+            steps.append(step)
+        elif record.type == "press":
+            parts = tuple(part.strip() for part in record.key.split("+"))
+            keys = parts if len(parts) > 1 and all(parts) else (record.key,)
+            if len(keys) > 1:
+                steps.append(Step("hotkey", (i,), keys=keys))
+            elif optimize and steps and steps[-1].op == "press":
+                previous = steps.pop()
+                steps.append(previous._replace(indices=previous.indices + (i,), keys=previous.keys + keys))
+            else:
+                steps.append(Step("press", (i,), keys=keys))
+        elif record.type == "code":
+            steps.append(Step("code", (i,), language=record.language, code=record.code))
+        else:
+            steps.append(Step("done", (i,)))
+
+    return CompiledPlan(
+        steps=tuple(steps),
+        actions=actions,
+        events_before=sum(_naive_events(record) for record in records),
+    )
@@ -0,0 +1,270 @@
+# src/desktop_agent/execution/sandbox.py
+"""
+code 动作的常驻沙箱进程池：预先启动若干 Python 工作进程，通过管道下发代码
+
+每个任务在从预热好的工作进程 fork 出的子进程中运行，任务对进程状态的修改不会带到下一个任务；
+子进程有内存/CPU 资源限制，超时或崩溃的工作进程（连同其子进程）会被杀掉并替换，
+执行一定次数后也会主动回收。
+"""
+import json
+import logging
+import os
+import queue
+import select
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+_WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_sandbox_worker.py")
+_HEADER = struct.Struct(">I")
+
+
+@dataclass
+class CodeResult:
+    """一次代码运行的结果"""
+    stdout: str = ""
+    stderr: str = ""
+    exit_code: int = 0
+    timed_out: bool = False
+    duration_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.timed_out and self.exit_code == 0
+
+
+class WorkerCrashed(Exception):
+    """工作进程在运行中退出"""
+
+
+class _Worker:
+    """单个工作进程及其管道"""
+
+    def __init__(self, options: Dict[str, Any]):
+        self.proc = subprocess.Popen(
+            [sys.executable, _WORKER_PATH, json.dumps(options)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            # 独立进程组：超时时连同正在运行任务的子进程一起杀掉
+            start_new_session=True,
+        )
+        self.ready = False
+        self.tasks = 0
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def send(self, message: Dict[str, Any]) -> None:
+        body = json.dumps(message).encode("utf-8")
+        try:
+            self.proc.stdin.write(_HEADER.pack(len(body)) + body)
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerCrashed(f"工作进程已退出: {e}") from e
+
+    def recv(self, deadline: Optional[float]) -> Optional[Dict[str, Any]]:
+        """读取一帧，超过 deadline 时返回 None"""
+        header = self._read(_HEADER.size, deadline)
+        if header is None:
+            return None
+        body = self._read(_HEADER.unpack(header)[0], deadline)
+        if body is None:
+            return None
+        return json.loads(body.decode("utf-8"))
+
+    def _read(self, n: int, deadline: Optional[float]) -> Optional[bytes]:
+        fd = self.proc.stdout.fileno()
+        chunks = []
+        while n:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                return None
+            readable, _, _ = select.select([fd], [], [], timeout)
+            if not readable:
+                return None
+            chunk = os.read(fd, n)
+            if not chunk:
+                raise WorkerCrashed(f"工作进程已退出（返回码 {self.proc.wait()}）")
+            chunks.append(chunk)
+            n -= len(chunk)
+        return b"".join(chunks)
+
+    def kill(self) -> None:
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.proc.wait()
+        for pipe in (self.proc.stdin, self.proc.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+
+class SandboxPool:
+    """
+    常驻 Python 沙箱进程池（仅 POSIX）
+
+    示例：
+        pool = SandboxPool(size=2, warm_imports=["json"])
+        result = pool.run("print(1 + 1)")
+        print(result.stdout)   # "2\\n"
+        pool.close()
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        timeout: float = 10.0,
+        warm_imports: Sequence[str] = (),
+        memory_limit_mb: int = 512,
+        max_tasks_per_worker: int = 100,
+    ):
+        """
+        Args:
+            size: 工作进程数
+            timeout: 默认单次运行超时（秒），同时作为每个任务的 CPU 时间上限
+            warm_imports: 工作进程启动时预先导入的模块
+            memory_limit_mb: 每个工作进程的地址空间上限（MB，0 表示不限制）
+            max_tasks_per_worker: 每个工作进程执行多少次后回收（0 表示不回收）
+        """
+        if os.name != "posix":
+            raise RuntimeError("沙箱进程池仅支持 POSIX 系统")
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.warm_imports = list(warm_imports)
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.runs = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = 0
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    @classmethod
+    def from_config(cls, config) -> "SandboxPool":
+        return cls(
+            size=config.code_pool_size,
+            timeout=config.code_timeout,
+            warm_imports=[name.strip() for name in config.code_warm_imports.split(",") if name.strip()],
+            memory_limit_mb=config.code_memory_limit_mb,
+            max_tasks_per_worker=config.code_max_tasks_per_worker,
+        )
+
+    def run(self, code: str, timeout: Optional[float] = None) -> CodeResult:
+        """
+        在空闲的工作进程中运行代码
+
+        Args:
+            code: Python 代码
+            timeout: 超时（秒，默认使用池的 timeout）
+
+        Returns:
+            运行结果（超时时 timed_out 为 True，崩溃时 exit_code 为负的信号值或非零返回码）
+
+        Raises:
+            RuntimeError: 进程池已关闭
+        """
+        if self._closed:
+            raise RuntimeError("沙箱进程池已关闭")
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        start = time.monotonic()
+        try:
+            if not worker.ready:
+                # 首次使用时等待启动和预加载完成（不计入任务超时）
+                if worker.recv(None) is None:
+                    raise WorkerCrashed("工作进程启动失败")
+                worker.ready = True
+                start = time.monotonic()
+            worker.send({"code": code})
+            reply = worker.recv(start + timeout if timeout and timeout > 0 else None)
+        except WorkerCrashed as e:
+            self.crashes += 1
+            returncode = worker.proc.poll()
+            logger.warning(f"沙箱工作进程崩溃，已替换: {e}")
+            self._replace(worker)
+            return CodeResult(
+                stderr=str(e),
+                exit_code=returncode if returncode else 1,
+                duration_ms=(time.monotonic() - start) * 1000,
+            )
+
+        duration_ms = (time.monotonic() - start) * 1000
+        self.runs += 1
+        if reply is None:
+            self.timeouts += 1
+            logger.warning(f"沙箱代码执行超时（{timeout}秒），工作进程已替换")
+            self._replace(worker)
+            return CodeResult(timed_out=True, exit_code=-1, duration_ms=duration_ms)
+
+        worker.tasks += 1
+        if self.max_tasks_per_worker > 0 and worker.tasks >= self.max_tasks_per_worker:
+            self.recycled += 1
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+        return CodeResult(
+            stdout=reply.get("stdout", ""),
+            stderr=reply.get("stderr", ""),
+            exit_code=reply.get("exit_code", 0),
+            duration_ms=duration_ms,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """返回运行、超时、崩溃和回收次数"""
+        return {
+            "size": self.size,
+            "runs": self.runs,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "recycled": self.recycled,
+        }
+
+    def close(self) -> None:
+        """终止所有工作进程"""
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.kill()
+
+    def __enter__(self) -> "SandboxPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker({
+            "warm_imports": self.warm_imports,
+            "memory_limit_mb": self.memory_limit_mb,
+            "cpu_limit": self.timeout,
+        })
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if not self._closed:
+            self._idle.put(self._spawn())
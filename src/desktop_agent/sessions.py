@@ -0,0 +1,386 @@
+"""
+多会话并行：每个会话是一个独立进程，连接自己的虚拟显示器（Xvfb），拥有独立的
+VisionGrounder / DecisionAgent / Executor；所有会话共享 Grounding 和 LLM 的并发上限。
+
+用法：
+    from desktop_agent.sessions import SessionPool, run_many
+
+    results = run_many(["打开记事本", "打开计算器"], size=4)
+
+    with SessionPool(size=4, until_done=True) as pool:
+        for result in pool.imap_unordered(tasks):
+            print(result.display, result.ok, len(result.actions))
+        print(pool.stats())
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+from .config import Config, config as global_config
+from .types import Action
+
+logger = logging.getLogger(__name__)
+
+_X11_SOCKET_DIR = "/tmp/.X11-unix"
+
+
+class VirtualDisplay:
+    """一个 Xvfb 虚拟显示器"""
+
+    def __init__(self, number: int, screen: str = "1920x1080x24", xvfb: str = "Xvfb"):
+        """
+        Args:
+            number: 显示器编号（DISPLAY 为 ":<number>"）
+            screen: 分辨率和色深，格式为 WxHxD
+            xvfb: Xvfb 可执行文件
+        """
+        self.number = number
+        self.screen = screen
+        self.xvfb = xvfb
+        self.proc: Optional[subprocess.Popen] = None
+
+    @property
+    def name(self) -> str:
+        return f":{self.number}"
+
+    @staticmethod
+    def in_use(number: int) -> bool:
+        """该编号是否已被其他 X 服务器占用"""
+        return os.path.exists(f"/tmp/.X{number}-lock") or os.path.exists(f"{_X11_SOCKET_DIR}/X{number}")
+
+    def start(self, timeout: float = 10.0) -> "VirtualDisplay":
+        """
+        启动 Xvfb 并等待其就绪
+
+        Raises:
+            RuntimeError: 未安装 Xvfb、启动失败或超时
+        """
+        if shutil.which(self.xvfb) is None:
+            raise RuntimeError(f"未找到 {self.xvfb}，请先安装（如 apt install xvfb）或通过 displays 指定已有的显示器")
+        self.proc = subprocess.Popen(
+            [self.xvfb, self.name, "-screen", "0", self.screen, "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + timeout
+        socket_path = f"{_X11_SOCKET_DIR}/X{self.number}"
+        while not os.path.exists(socket_path):
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"Xvfb {self.name} 启动失败（返回码 {self.proc.returncode}）")
+            if time.monotonic() >= deadline:
+                self.stop()
+                raise RuntimeError(f"Xvfb {self.name} 启动超时")
+            time.sleep(0.05)
+        return self
+
+    def stop(self) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.proc = None
+
+
+@dataclass
+class SessionResult:
+    """一个任务在某个会话中的执行结果"""
+    instruction: str
+    display: str
+    ok: bool
+    actions: List[Action] = field(default_factory=list)
+    # until_done 模式下模型是否报告完成（单步模式为 None）
+    done: Optional[bool] = None
+    steps: int = 1
+    error: Optional[str] = None
+    duration_ms: float = 0.0
+    # 本任务消耗的 token（input/output/cached/cache_creation）
+    usage: Dict[str, int] = field(default_factory=dict)
+    # 本任务的 Grounding 请求数、重试数和输入动作执行耗时
+    metrics: Dict[str, float] = field(default_factory=dict)
+    pid: int = 0
+
+
+# ---- 工作进程 ----
+
+# 当前进程的会话（由 _init_session 创建）
+_session = None
+
+
+class _Session:
+    """工作进程内的会话：DISPLAY 已指向分配的显示器"""
+
+    def __init__(self, display: str, config: Config, grounding_limiter, llm_limiter, until_done: bool, max_steps):
+        from .agent import DesktopAgent
+        from .decision.agent import DecisionAgent
+        from .decision.cascade import DecisionCascade
+        from .execution.executor import Executor
+        from .vision.grounding import VisionGrounder
+
+        self.display = display
+        self.until_done = until_done
+        self.max_steps = max_steps
+        grounder = VisionGrounder(config=config)
+        if grounding_limiter is not None:
+            grounder.transport.limiter = grounding_limiter
+        if config.decision_tiers:
+            decision_agent = DecisionCascade.from_config(config, limiter=llm_limiter)
+        else:
+            decision_agent = DecisionAgent(
+                provider=config.provider,
+                model=config.model,
+                config=config,
+                limiter=llm_limiter,
+            )
+        executor = Executor(enable_local_code=config.enable_local_code, config=config)
+        self.agent = DesktopAgent(
+            grounder=grounder,
+            decision_agent=decision_agent,
+            executor=executor,
+            config_instance=config,
+        )
+
+    def run(self, instruction: str) -> SessionResult:
+        agent = self.agent
+        usage_before = dict(agent.decision_agent.usage_totals)
+        transport_before = agent.grounder.transport_stats()
+        busy_before = agent.executor.busy_seconds
+        result = SessionResult(instruction=instruction, display=self.display, ok=False, pid=os.getpid())
+        start = time.perf_counter()
+        try:
+            if self.until_done:
+                task = agent.run_until_done(instruction, max_steps=self.max_steps)
+                result.actions, result.done, result.steps = task.actions, task.done, len(task.steps)
+            else:
+                result.actions, _ = agent.run(instruction)
+            result.ok = True
+        except Exception as e:
+            logger.error(f"会话 {self.display} 执行任务失败: {e}")
+            result.error = str(e)
+        result.duration_ms = (time.perf_counter() - start) * 1000
+
+        usage_after = agent.decision_agent.usage_totals
+        result.usage = {key: value - usage_before.get(key, 0) for key, value in usage_after.items()}
+        transport_after = agent.grounder.transport_stats()
+        result.metrics = {
+            "grounding_requests": transport_after["requests"] - transport_before["requests"],
+            "grounding_retries": transport_after["retries"] - transport_before["retries"],
+            "input_seconds": agent.executor.busy_seconds - busy_before,
+        }
+        return result
+
+
+def _init_session(displays, config, grounding_limiter, llm_limiter, until_done, max_steps) -> None:
+    """进程池初始化函数：领取一个显示器，在导入 pyautogui 之前设置 DISPLAY"""
+    global _session
+    display = displays.get()
+    os.environ["DISPLAY"] = display
+    _session = _Session(display, config, grounding_limiter, llm_limiter, until_done, max_steps)
+
+
+def _run_task(instruction: str) -> SessionResult:
+    return _session.run(instruction)
+
+
+# ---- 进程池 ----
+
+class SessionPool:
+    """
+    多会话进程池
+
+    每个工作进程启动时领取一个显示器：未指定 displays 时从 display_start 开始为每个会话启动一个 Xvfb。
+    进程使用 spawn 方式创建，保证 pyautogui 在子进程中按各自的 DISPLAY 初始化。
+    任务按提交顺序进入共享队列，由空闲的会话领取。
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        config: Optional[Config] = None,
+        displays: Optional[Sequence[str]] = None,
+        screen: Optional[str] = None,
+        display_start: Optional[int] = None,
+        grounding_limit: Optional[int] = None,
+        llm_limit: Optional[int] = None,
+        until_done: bool = False,
+        max_steps: Optional[int] = None,
+    ):
+        """
+        Args:
+            size: 会话数（默认读取 config.session_pool_size；指定 displays 时为其长度）
+            config: 配置对象（默认使用全局 config，会传给每个会话）
+            displays: 使用已有的显示器（如 [":1", ":2"]），不再启动 Xvfb
+            screen: Xvfb 分辨率和色深（默认读取 config.session_screen）
+            display_start: 自动分配显示器编号的起点（默认读取 config.session_display_start）
+            grounding_limit: 所有会话同时进行的 Grounding 请求上限（0 表示不限制，默认读取 config）
+            llm_limit: 所有会话同时进行的 LLM 调用上限（0 表示不限制，默认读取 config）
+            until_done: 是否以 run_until_done 多步执行每个任务（默认单步 run）
+            max_steps: until_done 模式的最大步数（默认读取 config.agent_max_steps）
+        """
+        self.config = config or global_config
+        self.until_done = until_done
+        self.max_steps = max_steps
+        if displays:
+            self.size = len(displays)
+        else:
+            self.size = max(1, size if size is not None else self.config.session_pool_size)
+        self.screen = screen or self.config.session_screen
+        self.display_start = display_start if display_start is not None else self.config.session_display_start
+        self.grounding_limit = grounding_limit if grounding_limit is not None else self.config.session_grounding_limit
+        self.llm_limit = llm_limit if llm_limit is not None else self.config.session_llm_limit
+
+        self._displays: List[str] = list(displays or [])
+        self._xvfb: List[VirtualDisplay] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._started_at = 0.0
+        self._results: List[SessionResult] = []
+
+    def start(self) -> "SessionPool":
+        """启动虚拟显示器和进程池（首次提交任务时会自动调用）"""
+        if self._executor is not None:
+            return self
+        if not self._displays:
+            self._start_displays()
+        ctx = multiprocessing.get_context("spawn")
+        queue = ctx.Queue()
+        for display in self._displays:
+            queue.put(display)
+        grounding_limiter = ctx.BoundedSemaphore(self.grounding_limit) if self.grounding_limit > 0 else None
+        llm_limiter = ctx.BoundedSemaphore(self.llm_limit) if self.llm_limit > 0 else None
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=ctx,
+            initializer=_init_session,
+            initargs=(queue, self.config, grounding_limiter, llm_limiter, self.until_done, self.max_steps),
+        )
+        self._started_at = time.perf_counter()
+        logger.info(f"会话池已启动：{self.size} 个会话，显示器 {', '.join(self._displays)}")
+        return self
+
+    def submit(self, instruction: str) -> "Future[SessionResult]":
+        """
+        提交一个任务
+
+        Args:
+            instruction: 用户指令
+
+        Returns:
+            结果的 Future
+        """
+        self.start()
+        future = self._executor.submit(_run_task, instruction)
+        future.add_done_callback(self._collect)
+        return future
+
+    def map(self, instructions: Iterable[str]) -> List[SessionResult]:
+        """执行所有任务，按提交顺序返回结果"""
+        futures = [self.submit(instruction) for instruction in instructions]
+        return [future.result() for future in futures]
+
+    def imap_unordered(self, instructions: Iterable[str]) -> Iterator[SessionResult]:
+        """执行所有任务，按完成顺序逐个产出结果"""
+        futures = [self.submit(instruction) for instruction in instructions]
+        for future in as_completed(futures):
+            yield future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        汇总已完成任务的指标
+
+        Returns:
+            任务数、成功/失败数、动作数、吞吐量（任务/秒）、平均和 p95 任务耗时、
+            token 用量合计，以及每个显示器完成的任务数
+        """
+        with self._lock:
+            results = list(self._results)
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        durations = sorted(result.duration_ms for result in results)
+        usage: Dict[str, int] = {}
+        per_display: Dict[str, int] = {}
+        for result in results:
+            for key, value in result.usage.items():
+                usage[key] = usage.get(key, 0) + value
+            per_display[result.display] = per_display.get(result.display, 0) + 1
+        return {
+            "sessions": self.size,
+            "tasks": len(results),
+            "succeeded": sum(1 for result in results if result.ok),
+            "failed": sum(1 for result in results if not result.ok),
+            "actions": sum(len(result.actions) for result in results),
+            "elapsed_seconds": elapsed,
+            "tasks_per_second": len(results) / elapsed if elapsed else 0.0,
+            "mean_task_ms": sum(durations) / len(durations) if durations else 0.0,
+            "p95_task_ms": durations[min(len(durations) - 1, int(0.95 * len(durations)))] if durations else 0.0,
+            "usage": usage,
+            "per_display": per_display,
+        }
+
+    def close(self) -> None:
+        """等待进行中的任务完成，关闭进程池和虚拟显示器"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        for display in self._xvfb:
+            display.stop()
+        if self._xvfb:
+            self._displays = []
+        self._xvfb = []
+
+    def __enter__(self) -> "SessionPool":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _start_displays(self) -> None:
+        number = self.display_start
+        try:
+            while len(self._xvfb) < self.size:
+                if not VirtualDisplay.in_use(number):
+                    self._xvfb.append(VirtualDisplay(number, self.screen).start())
+                number += 1
+        except Exception:
+            for display in self._xvfb:
+                display.stop()
+            self._xvfb = []
+            raise
+        self._displays = [display.name for display in self._xvfb]
+
+    def _collect(self, future: "Future[SessionResult]") -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._lock:
+            self._results.append(future.result())
+
+
+def run_many(
+    instructions: Iterable[str],
+    size: Optional[int] = None,
+    config: Optional[Config] = None,
+    until_done: bool = False,
+    **kwargs: Any,
+) -> List[SessionResult]:
+    """
+    在多个隔离会话中并行执行一组任务
+
+    Args:
+        instructions: 用户指令
+        size: 会话数（默认读取 config.session_pool_size）
+        config: 配置对象
+        until_done: 是否以 run_until_done 多步执行
+        **kwargs: 透传给 SessionPool 的其他参数（displays、grounding_limit 等）
+
+    Returns:
+        按输入顺序排列的结果
+    """
+    with SessionPool(size=size, config=config, until_done=until_done, **kwargs) as pool:
+        return pool.map(instructions)
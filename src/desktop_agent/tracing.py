@@ -0,0 +1,404 @@
+"""
+追踪模块：流水线各阶段的 span、进程内延迟直方图和可插拔的导出器
+
+用法：
+    from desktop_agent.tracing import tracer, JsonLinesExporter
+
+    tracer.enable(JsonLinesExporter("trace.jsonl"))
+    agent.run("...")
+    print(tracer.summary())             # 每个阶段的 count / p50 / p95 / p99
+    print(tracer.prometheus_text())     # Prometheus 文本格式
+
+未启用时 span() 返回共享的空操作对象，开销只有一次属性判断。
+"""
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界（毫秒），覆盖从本地编码到远程推理的延迟范围
+DEFAULT_BUCKETS_MS = (
+    1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000,
+)
+
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("desktop_agent_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Histogram:
+    """固定桶的延迟直方图（线程安全），分位数在桶内线性插值估算"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """估算分位数（q 取 0~1）"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                if n and seen + n >= rank:
+                    lower = self.buckets[i - 1] if i > 0 else 0.0
+                    upper = self.buckets[i] if i < len(self.buckets) else self.max
+                    lower, upper = max(lower, self.min), min(upper, self.max)
+                    return lower + (upper - lower) * ((rank - seen) / n)
+                seen += n
+            return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class Span:
+    """一个计时区间（作为上下文管理器使用，结束时记入直方图并交给导出器）"""
+
+    __slots__ = (
+        "tracer", "name", "attributes", "trace_id", "span_id", "parent_id",
+        "start_ns", "end_ns", "error", "_token", "_perf",
+    )
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        parent = _current_span.get()
+        self.trace_id = parent.trace_id if parent is not None else _new_id(16)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = _new_id(8)
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self._token = None
+        self._perf = 0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        self._perf = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # 用单调时钟计算时长，避免系统时间调整的影响
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._perf)
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """追踪未启用时使用的空操作 span"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter:
+    """span 导出器基类"""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """把结束的 span 保存在列表中（测试和基准测试用）"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+class JsonLinesExporter(SpanExporter):
+    """每个 span 写一行 JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class OTelJsonExporter(SpanExporter):
+    """
+    以 OTLP/JSON（ExportTraceServiceRequest）格式每行写一个 span，
+    可由 OpenTelemetry Collector 的 otlpjsonfile 接收器读取
+    """
+
+    def __init__(self, path: str, service_name: str = "desktop-agent"):
+        self.path = path
+        self.service_name = service_name
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        otel_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [_otel_attribute(k, v) for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otel_span["parentSpanId"] = span.parent_id
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otel_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "desktop_agent"}, "spans": [otel_span]}],
+            }]
+        }
+        line = json.dumps(request, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _otel_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+EXPORTERS = {
+    "jsonl": JsonLinesExporter,
+    "otel": OTelJsonExporter,
+}
+
+
+def _exporters_from_config(config) -> List[SpanExporter]:
+    if not config.tracing_exporter:
+        return []
+    exporter_cls = EXPORTERS.get(config.tracing_exporter)
+    if exporter_cls is None:
+        raise ValueError(f"不支持的追踪导出器: {config.tracing_exporter}")
+    return [exporter_cls(config.tracing_path or f"trace.{config.tracing_exporter}.jsonl")]
+
+
+class Tracer:
+    """
+    进程内追踪器：span 结束时按名称记入延迟直方图，并交给所有导出器
+
+    span 通过 contextvars 记录父子关系，同一线程或同一 asyncio 任务内嵌套的 span 属于同一条 trace。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        exporters: Optional[Sequence[SpanExporter]] = None,
+        config_loader: Optional[Callable[[], Any]] = None,
+    ):
+        """
+        Args:
+            enabled: 是否启用
+            exporters: span 导出器
+            config_loader: 延迟获取配置的函数（全局追踪器使用：第一次创建 span 时才按配置启用和创建导出器）
+        """
+        self.enabled = enabled
+        self.exporters: List[SpanExporter] = list(exporters or [])
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._config_loader = config_loader
+
+    @classmethod
+    def from_config(cls, config) -> "Tracer":
+        return cls(enabled=config.tracing_enabled, exporters=_exporters_from_config(config))
+
+    def enable(self, *exporters: SpanExporter) -> None:
+        """启用追踪并追加导出器"""
+        self._apply_config()
+        self.exporters.extend(exporters)
+        self.enabled = True
+
+    def disable(self) -> None:
+        self._config_loader = None
+        self.enabled = False
+
+    def _apply_config(self) -> None:
+        loader, self._config_loader = self._config_loader, None
+        if loader is not None:
+            config = loader()
+            self.exporters.extend(_exporters_from_config(config))
+            self.enabled = self.enabled or config.tracing_enabled
+
+    def span(self, name: str, **attributes: Any):
+        """
+        创建 span（在 with 语句中使用）
+
+        Args:
+            name: 阶段名称，如 "grounding.request"
+            **attributes: span 属性
+
+        Returns:
+            Span；未启用时返回空操作对象
+        """
+        if not self.enabled:
+            if self._config_loader is None:
+                return _NOOP_SPAN
+            self._apply_config()
+            if not self.enabled:
+                return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def current_span(self):
+        """当前上下文中的 span（没有或未启用时返回空操作对象）"""
+        span = _current_span.get() if self.enabled else None
+        return span if span is not None else _NOOP_SPAN
+
+    def observe(self, name: str, value_ms: float) -> None:
+        """直接向直方图记入一个延迟值（用于不适合包成 span 的指标，如首 token 延迟）"""
+        if self._config_loader is not None:
+            self._apply_config()
+        if self.enabled:
+            self._histogram(name).observe(value_ms)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """各阶段的延迟统计（毫秒）"""
+        with self._lock:
+            histograms = dict(self.histograms)
+        return {name: histogram.snapshot() for name, histogram in sorted(histograms.items())}
+
+    def prometheus_text(self, metric: str = "desktop_agent_stage_duration_ms") -> str:
+        """以 Prometheus 文本格式导出所有直方图"""
+        lines = [
+            f"# HELP {metric} Pipeline stage latency in milliseconds.",
+            f"# TYPE {metric} histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+        for name, histogram in histograms:
+            with histogram._lock:
+                counts = list(histogram.counts)
+                total, count = histogram.sum, histogram.count
+            cumulative = 0
+            for bound, n in zip(list(histogram.buckets) + ["+Inf"], counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {total}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """清空直方图"""
+        with self._lock:
+            self.histograms.clear()
+
+    def shutdown(self) -> None:
+        """关闭所有导出器"""
+        for exporter in self.exporters:
+            exporter.shutdown()
+        self.exporters.clear()
+
+    def _histogram(self, name: str) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def _finish(self, span: Span) -> None:
+        self._histogram(span.name).observe(span.duration_ms)
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"导出 span 失败: {e}")
+
+
+# 全局追踪器（由 TRACING / TRACING_EXPORTER / TRACING_PATH 配置，第一次使用时才读取配置）
+tracer = Tracer(config_loader=get_config)
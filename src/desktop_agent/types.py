@@ -1,12 +1,31 @@
 """
 类型定义模块：统一数据类型定义
+
+流水线各阶段之间仍以 dict 形式传递数据（UIElement / VisionData / Action），
+需要长期保存大量感知结果或频繁访问字段时，可转换为下面的紧凑类型：
+
+- Element: 单个 UI 元素（NamedTuple）
+- ElementTable: 按列存储的元素表（NumPy 数组 + 驻留字符串）
+- Perception: 视觉数据（ElementTable + 分辨率）
+- ActionRecord: 构造时完成字段校验的动作（NamedTuple）
+
+所有紧凑类型都能与 dict 格式无损互转（to_dict / from_dict）。
 """
-from typing import Dict, Literal, Tuple
+import json
+import sys
+from typing import Any, Dict, Iterator, List, Literal, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+import numpy as np
+
+# 可选依赖：更快的 JSON 解析
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 动作类型
-ActionType = Literal["click", "type", "press", "code"]
+ActionType = Literal["click", "type", "press", "code", "done"]
 
-# UI 元素定义：{"id": int, "bbox": [int, int, int, int], "text": str, "type": str}
+# UI 元素定义：{"id": int（部分 Grounding 服务为 str，如 "btn_ok"）, "bbox": [int, int, int, int], "text": str, "type": str}
 UIElement = Dict[str, object]
 
 # 视觉数据定义：{"elements": List[UIElement], "resolution": [int, int]}
@@ -15,5 +34,286 @@ VisionData = Dict[str, object]
 # 动作定义：包含 type 字段，以及 element_id, text, key, language, code 等字段
 Action = Dict[str, object]
 
-# 元素映射：element_id -> bbox (x1, y1, x2, y2)
-ElementMap = Dict[int, Tuple[int, int, int, int]]
+# 元素映射：element_id -> bbox (x1, y1, x2, y2)（普通 dict 或 vision.index.ElementIndex）
+ElementMap = Mapping[int, Tuple[int, int, int, int]]
+
+_ELEMENT_KEYS = ("id", "bbox", "text", "type")
+
+
+def loads_json(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """解析 JSON（安装了 orjson 时使用 orjson）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def normalize_id(element_id: Any) -> Any:
+    """
+    元素 id 的规范形式，用于查找：整数、整数值的浮点数和数字字符串（LLM 偶尔把 3 写成 "3"）统一为 int，
+    其他字符串去掉首尾空白，其余原样返回
+    """
+    if isinstance(element_id, str):
+        text = element_id.strip()
+        try:
+            return int(text)
+        except ValueError:
+            return text
+    if isinstance(element_id, float) and element_id.is_integer():
+        return int(element_id)
+    return element_id
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Element(NamedTuple):
+    """UI 元素（text/type 为 None 表示原数据中没有该字段，extra 保存其余字段）"""
+    id: Union[int, str]
+    bbox: Tuple[int, int, int, int]
+    text: Optional[str] = None
+    type: Optional[str] = None
+    extra: Optional[Dict[str, object]] = None
+
+    @classmethod
+    def from_dict(cls, element: UIElement) -> "Element":
+        extra = {k: v for k, v in element.items() if k not in _ELEMENT_KEYS}
+        return cls(
+            element["id"],
+            tuple(element["bbox"]),
+            _intern(element.get("text")),
+            _intern(element.get("type")),
+            extra or None,
+        )
+
+    def to_dict(self) -> UIElement:
+        element: UIElement = {"id": self.id, "bbox": list(self.bbox)}
+        if self.text is not None:
+            element["text"] = self.text
+        if self.type is not None:
+            element["type"] = self.type
+        if self.extra:
+            element.update(self.extra)
+        return element
+
+
+class ElementTable:
+    """
+    按列存储的 UI 元素表
+
+    - ids: (n,) int64（存在非整数 id，如 "btn_ok" 或 "3" 时为 object，按原值保存）
+    - bboxes: (n, 4) int32（坐标含小数时为 float64）
+    - type_codes: (n,) int16，对应 type_names 中的下标，-1 表示没有 type 字段
+    - texts: 驻留后的文本元组（相同文本只保存一份）
+    - extras: 其余字段（全部为空时为 None）
+
+    相比每个元素一个 dict，内存占用约小一个数量级，适合保存较长的感知历史。
+    """
+
+    __slots__ = ("ids", "bboxes", "type_codes", "type_names", "texts", "extras")
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        bboxes: np.ndarray,
+        type_codes: np.ndarray,
+        type_names: Tuple[Optional[str], ...],
+        texts: Tuple[Optional[str], ...],
+        extras: Optional[Tuple[Optional[Dict[str, object]], ...]] = None,
+    ):
+        self.ids = ids
+        self.bboxes = bboxes
+        self.type_codes = type_codes
+        self.type_names = type_names
+        self.texts = texts
+        self.extras = extras
+
+    @classmethod
+    def from_elements(cls, elements: Sequence[UIElement]) -> "ElementTable":
+        """
+        从元素 dict 列表构建
+
+        Args:
+            elements: UI 元素列表
+
+        Returns:
+            元素表
+        """
+        n = len(elements)
+        values = [element["id"] for element in elements]
+        if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+            ids = np.fromiter(values, dtype=np.int64, count=n)
+        else:
+            ids = np.empty(n, dtype=object)
+            ids[:] = values
+        bboxes = np.array([element["bbox"] for element in elements]).reshape(n, 4)
+        bboxes = bboxes.astype(np.int32 if np.issubdtype(bboxes.dtype, np.integer) else np.float64)
+
+        vocabulary: Dict[str, int] = {}
+        codes = np.empty(n, dtype=np.int16)
+        texts: List[Optional[str]] = []
+        extras: List[Optional[Dict[str, object]]] = []
+        for row, element in enumerate(elements):
+            typ = element.get("type")
+            codes[row] = -1 if typ is None else vocabulary.setdefault(typ, len(vocabulary))
+            texts.append(_intern(element.get("text")))
+            extra = {k: v for k, v in element.items() if k not in _ELEMENT_KEYS}
+            extras.append(extra or None)
+
+        return cls(
+            ids=ids,
+            bboxes=bboxes,
+            type_codes=codes,
+            type_names=tuple(_intern(name) for name in vocabulary),
+            texts=tuple(texts),
+            extras=tuple(extras) if any(extras) else None,
+        )
+
+    def to_elements(self) -> List[UIElement]:
+        """还原为元素 dict 列表"""
+        return [self.element(row).to_dict() for row in range(len(self))]
+
+    def element(self, row: int) -> Element:
+        """第 row 行的元素"""
+        code = int(self.type_codes[row])
+        x1, y1, x2, y2 = self.bboxes[row].tolist()
+        element_id = self.ids[row]
+        return Element(
+            int(element_id) if isinstance(element_id, np.integer) else element_id,
+            (x1, y1, x2, y2),
+            self.texts[row],
+            self.type_names[code] if code >= 0 else None,
+            self.extras[row] if self.extras else None,
+        )
+
+    def types(self) -> List[Optional[str]]:
+        """每行的 type"""
+        return [self.type_names[code] if code >= 0 else None for code in self.type_codes.tolist()]
+
+    @property
+    def nbytes(self) -> int:
+        """数组部分占用的字节数（不含驻留字符串；object 类型的 ids 只计指针）"""
+        return self.ids.nbytes + self.bboxes.nbytes + self.type_codes.nbytes
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Element]:
+        return (self.element(row) for row in range(len(self)))
+
+    def __getitem__(self, row: int) -> Element:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return self.element(row)
+
+    def __repr__(self) -> str:
+        return f"ElementTable({len(self)} elements)"
+
+
+class Perception(NamedTuple):
+    """视觉数据的紧凑形式（extra 保存 elements/resolution 以外的字段）"""
+    elements: ElementTable
+    resolution: Optional[Tuple[int, ...]] = None
+    extra: Optional[Dict[str, object]] = None
+
+    @classmethod
+    def from_dict(cls, vision_data: VisionData) -> "Perception":
+        resolution = vision_data.get("resolution")
+        extra = {k: v for k, v in vision_data.items() if k not in ("elements", "resolution")}
+        return cls(
+            ElementTable.from_elements(vision_data.get("elements", [])),
+            tuple(resolution) if resolution is not None else None,
+            extra or None,
+        )
+
+    @classmethod
+    def from_json(cls, data: Union[str, bytes, bytearray, memoryview]) -> "Perception":
+        """直接从 Grounding 服务返回的 JSON 构建"""
+        return cls.from_dict(loads_json(data))
+
+    def to_dict(self) -> VisionData:
+        vision_data: VisionData = {"elements": self.elements.to_elements()}
+        if self.resolution is not None:
+            vision_data["resolution"] = list(self.resolution)
+        if self.extra:
+            vision_data.update(self.extra)
+        return vision_data
+
+
+# 各动作类型的必填字段
+_REQUIRED_FIELDS = {
+    "click": ("element_id",),
+    "type": ("element_id",),
+    "press": ("key",),
+    "code": ("language", "code"),
+    # 多步任务中表示任务已完成，不产生任何输入
+    "done": (),
+}
+_ACTION_KEYS = ("type", "element_id", "text", "key", "language", "code")
+
+
+class ActionRecord(NamedTuple):
+    """
+    构造时已完成字段校验的动作
+
+    from_dict 对缺失的必填字段抛出 ValueError，之后按属性访问即可，无需再逐个 .get() 校验。
+    """
+    type: str
+    element_id: Optional[Any] = None
+    text: Optional[str] = None
+    key: Optional[str] = None
+    language: Optional[str] = None
+    code: Optional[str] = None
+    extra: Optional[Dict[str, object]] = None
+
+    @classmethod
+    def from_dict(cls, action: Action) -> "ActionRecord":
+        """
+        从动作 dict 构建
+
+        Args:
+            action: 动作
+
+        Returns:
+            动作记录
+
+        Raises:
+            ValueError: 缺少 type 或该类型的必填字段，或动作类型不支持
+        """
+        if isinstance(action, ActionRecord):
+            return action
+        typ = action.get("type")
+        if not typ:
+            raise ValueError("动作缺少 'type' 字段")
+        required = _REQUIRED_FIELDS.get(typ)
+        if required is None:
+            raise ValueError(f"不支持的动作类型: {typ}")
+        for name in required:
+            value = action.get(name)
+            if value is None or (name != "element_id" and not value):
+                missing = " 或 ".join(f"'{field}'" for field in required)
+                raise ValueError(f"{typ} 动作缺少 {missing}")
+        extra = {k: v for k, v in action.items() if k not in _ACTION_KEYS}
+        return cls(
+            typ,
+            action.get("element_id"),
+            action.get("text"),
+            action.get("key"),
+            action.get("language"),
+            action.get("code"),
+            extra or None,
+        )
+
+    def to_dict(self) -> Action:
+        action: Action = {"type": self.type}
+        for name in _ACTION_KEYS[1:]:
+            value = getattr(self, name)
+            if value is not None:
+                action[name] = value
+        if self.extra:
+            action.update(self.extra)
+        return action
@@ -1,6 +1,29 @@
 """视觉模块：截图和 UI 元素识别"""
-from .capture import capture_screenshot
+from .capture import capture_screenshot, capture_frame, CaptureOptions, FrameEncoder
 from .grounding import VisionGrounder
+from .batching import GroundingBatcher
+from .cache import GroundingCache
+from .transport import GroundingTransport
+from .balancer import EndpointBalancer
+from .index import ElementIndex
+from .tracker import ElementTracker
+from .grabbers import CaptureBackend, PyAutoGUICapture, MSSCapture
+from .continuous import ContinuousCapture
 
-__all__ = ["capture_screenshot", "VisionGrounder"]
-
+__all__ = [
+    "capture_screenshot",
+    "capture_frame",
+    "CaptureOptions",
+    "FrameEncoder",
+    "VisionGrounder",
+    "GroundingBatcher",
+    "GroundingCache",
+    "GroundingTransport",
+    "EndpointBalancer",
+    "ElementIndex",
+    "ElementTracker",
+    "CaptureBackend",
+    "PyAutoGUICapture",
+    "MSSCapture",
+    "ContinuousCapture",
+]
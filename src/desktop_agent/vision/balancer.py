@@ -0,0 +1,414 @@
+# src/desktop_agent/vision/balancer.py
+"""
+多个 Grounding 副本之间的负载均衡：按 EWMA 延迟或在途请求数选择副本，
+慢请求超过 p95 推导的截止时间后向第二个副本发送对冲请求，连续失败的副本由熔断器暂时摘除
+"""
+import asyncio
+import collections
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+BALANCE_POLICIES = ("ewma", "least_inflight")
+
+
+class Endpoint:
+    """一个 Grounding 副本的延迟、在途请求和熔断状态"""
+
+    def __init__(self, url: str, window: int = 100):
+        """
+        Args:
+            url: 副本地址
+            window: 计算延迟分位数时保留的最近样本数
+        """
+        self.url = url.rstrip("/")
+        self.ewma_ms: Optional[float] = None
+        # 最近一次成功样本的时间（monotonic）
+        self.sampled_at = 0.0
+        self.latencies: Deque[float] = collections.deque(maxlen=window)
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.ejections = 0
+        # 熔断：open_until 之前不参与选择；之后允许一个探测请求（half-open）
+        self.open_until = 0.0
+        self.probing = False
+
+    def state(self, now: Optional[float] = None) -> str:
+        """closed（正常）、open（已熔断）或 half_open（冷却结束，等待探测结果）"""
+        if self.open_until == 0.0:
+            return "closed"
+        now = time.monotonic() if now is None else now
+        return "open" if now < self.open_until else "half_open"
+
+    def quantile(self, q: float) -> Optional[float]:
+        """最近样本的延迟分位数（毫秒），没有样本时为 None"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        return {
+            "url": self.url,
+            "state": self.state(),
+            "requests": self.requests,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "ewma_ms": round(self.ewma_ms, 3) if self.ewma_ms is not None else None,
+            "p50_ms": round(p50, 3) if p50 is not None else None,
+            "p95_ms": round(p95, 3) if p95 is not None else None,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "ejections": self.ejections,
+        }
+
+
+class EndpointBalancer:
+    """
+    在多个 Grounding 副本之间分发请求
+
+    - 选择：ewma 策略取 EWMA 延迟 ×（在途请求数 + 1）最小的副本（还没有样本的副本优先），
+      长时间没有新样本的副本 EWMA 按 ewma_half_life 衰减，使变慢后恢复的副本能重新分到流量；
+      least_inflight 策略取在途请求数最少的副本；分数相同时随机选择
+    - 对冲：请求超过该副本延迟 hedge_quantile 分位数（样本不足时用所有副本的样本）仍未返回时，
+      向另一个副本发送相同的请求，先成功返回的结果胜出；首个副本直接失败时同样改发另一个副本
+    - 熔断：连续 failure_threshold 次失败（连接错误、超时或 5xx）的副本摘除 cooldown 秒，
+      冷却结束后放行一个探测请求，成功则恢复，失败则重新熔断
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        policy: str = "ewma",
+        ewma_alpha: float = 0.3,
+        ewma_half_life: float = 10.0,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_min_ms: float = 20.0,
+        hedge_min_samples: int = 10,
+        failure_threshold: int = 3,
+        cooldown: float = 10.0,
+        max_workers: int = 8,
+    ):
+        """
+        Args:
+            urls: 副本地址列表
+            policy: 选择策略（ewma/least_inflight）
+            ewma_alpha: EWMA 平滑系数（越大越偏向最近的样本）
+            ewma_half_life: 没有新样本时 EWMA 衰减的半衰期（秒）
+            hedge: 是否发送对冲请求
+            hedge_quantile: 对冲截止时间使用的延迟分位数
+            hedge_min_ms: 对冲截止时间的下限（毫秒）
+            hedge_min_samples: 计算截止时间所需的最少样本数（不足时不对冲）
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 熔断持续时间（秒）
+            max_workers: 同步请求的线程数（对冲请求需要额外的线程）
+
+        Raises:
+            ValueError: urls 为空或 policy 不支持
+        """
+        if not urls:
+            raise ValueError("至少需要一个 Grounding 地址")
+        if policy not in BALANCE_POLICIES:
+            raise ValueError(f"不支持的负载均衡策略: {policy}（可选 {', '.join(BALANCE_POLICIES)}）")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.policy = policy
+        self.ewma_alpha = ewma_alpha
+        self.ewma_half_life = ewma_half_life
+        self.hedge = hedge and len(self.endpoints) > 1
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_ms = hedge_min_ms
+        self.hedge_min_samples = hedge_min_samples
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, urls: Sequence[str], config, max_workers: int = 8) -> "EndpointBalancer":
+        return cls(
+            urls,
+            policy=config.grounding_balance_policy,
+            hedge=config.grounding_hedge,
+            hedge_quantile=config.grounding_hedge_quantile,
+            hedge_min_ms=config.grounding_hedge_min_ms,
+            failure_threshold=config.grounding_breaker_failures,
+            cooldown=config.grounding_breaker_cooldown,
+            max_workers=max_workers,
+        )
+
+    def pick(self, exclude: Sequence[Endpoint] = ()) -> Optional[Endpoint]:
+        """
+        选择一个副本并预占一个在途名额
+
+        Args:
+            exclude: 本次请求已经使用过的副本
+
+        Returns:
+            选中的副本；除 exclude 外没有可用副本时为 None（全部熔断时仍会选择最早恢复的副本）
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                ep for ep in self.endpoints
+                if ep not in exclude and (ep.state(now) == "closed" or (ep.state(now) == "half_open" and not ep.probing))
+            ]
+            if not candidates:
+                remaining = [ep for ep in self.endpoints if ep not in exclude]
+                if not remaining or exclude:
+                    return None
+                # 所有副本都已熔断：不直接失败，尝试最早恢复的副本
+                endpoint = min(remaining, key=lambda ep: ep.open_until)
+                logger.warning(f"所有 Grounding 副本均已熔断，尝试 {endpoint.url}")
+            else:
+                scores = [self._score(ep, now) for ep in candidates]
+                best = min(scores)
+                endpoint = random.choice([ep for ep, score in zip(candidates, scores) if score == best])
+            if endpoint.state(now) != "closed":
+                endpoint.probing = True
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def hedge_delay(self, endpoint: Endpoint) -> Optional[float]:
+        """
+        对冲截止时间（秒）
+
+        Returns:
+            样本不足或未启用对冲时为 None
+        """
+        if not self.hedge:
+            return None
+        with self._lock:
+            samples = list(endpoint.latencies)
+            if len(samples) < self.hedge_min_samples:
+                samples = [ms for ep in self.endpoints for ms in ep.latencies]
+        if len(samples) < self.hedge_min_samples:
+            return None
+        samples.sort()
+        deadline_ms = samples[min(len(samples) - 1, int(self.hedge_quantile * len(samples)))]
+        return max(self.hedge_min_ms, deadline_ms) / 1000
+
+    def post(self, transport, path: str, **kwargs: Any):
+        """
+        通过 transport 向选中的副本发送 POST 请求，必要时对冲或改发另一个副本
+
+        Args:
+            transport: GroundingTransport
+            path: 请求路径（如 /ground）
+            **kwargs: 透传给 transport.post 的参数
+
+        Returns:
+            先成功返回的响应（所有尝试都返回 5xx 时返回最后一个 5xx 响应）
+
+        Raises:
+            requests.RequestException: 所有尝试都连接失败或超时
+        """
+        primary = self.pick()
+        tried = [primary]
+        pending = {self._executor().submit(self._send, transport, primary, path, kwargs): primary}
+        delay = self.hedge_delay(primary)
+        hedged = False
+        last_response = None
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, _ = wait(pending, timeout=None if hedged else delay, return_when=FIRST_COMPLETED)
+            if not done:
+                # 超过截止时间：向另一个副本发送对冲请求
+                hedged = True
+                backup = self.pick(exclude=tried)
+                if backup is not None:
+                    tried.append(backup)
+                    self._count_hedge(primary)
+                    logger.debug(f"Grounding 请求超过 {delay * 1000:.0f}ms，向 {backup.url} 发送对冲请求")
+                    pending[self._executor().submit(self._send, transport, backup, path, kwargs)] = backup
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    resp = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if resp.status_code < 500:
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    if endpoint is not primary:
+                        self._count_hedge_win(primary)
+                    return resp
+                if last_response is not None:
+                    last_response.close()
+                last_response = resp
+            if not pending and not hedged:
+                # 首个副本失败：立即改发另一个副本
+                hedged = True
+                backup = self.pick(exclude=tried)
+                if backup is not None:
+                    tried.append(backup)
+                    logger.warning(f"Grounding 副本 {endpoint.url} 请求失败，改发 {backup.url}")
+                    pending[self._executor().submit(self._send, transport, backup, path, kwargs)] = backup
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    async def apost(self, transport, path: str, **kwargs: Any):
+        """post 的异步版本（对冲胜出后取消其余请求）"""
+        primary = self.pick()
+        tried = [primary]
+        pending = {self._spawn(transport, primary, path, kwargs): primary}
+        delay = self.hedge_delay(primary)
+        hedged = False
+        last_response = None
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=None if hedged else delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    backup = self.pick(exclude=tried)
+                    if backup is not None:
+                        tried.append(backup)
+                        self._count_hedge(primary)
+                        pending[self._spawn(transport, backup, path, kwargs)] = backup
+                    continue
+                for task in done:
+                    endpoint = pending.pop(task)
+                    try:
+                        resp = task.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    if resp.status_code < 500:
+                        if endpoint is not primary:
+                            self._count_hedge_win(primary)
+                        return resp
+                    last_response = resp
+                if not pending and not hedged:
+                    hedged = True
+                    backup = self.pick(exclude=tried)
+                    if backup is not None:
+                        tried.append(backup)
+                        logger.warning(f"Grounding 副本 {endpoint.url} 请求失败，改发 {backup.url}")
+                        pending[self._spawn(transport, backup, path, kwargs)] = backup
+        finally:
+            for task in pending:
+                task.cancel()
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        每个副本的统计
+
+        Returns:
+            列表，每项包含 url、state、requests、failures、in_flight、ewma_ms、p50_ms、p95_ms、
+            hedges（该副本超过截止时间触发的对冲次数）、hedge_wins（对冲请求先返回的次数）和 ejections（熔断次数）
+        """
+        with self._lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
+
+    def close(self) -> None:
+        """关闭同步请求的线程池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="grounding-balancer")
+            return self._pool
+
+    def _score(self, endpoint: Endpoint, now: float) -> float:
+        if self.policy == "least_inflight":
+            return endpoint.in_flight
+        if endpoint.ewma_ms is None:
+            return -1.0
+        ewma = endpoint.ewma_ms
+        if self.ewma_half_life > 0:
+            ewma *= 0.5 ** ((now - endpoint.sampled_at) / self.ewma_half_life)
+        return ewma * (endpoint.in_flight + 1)
+
+    def _send(self, transport, endpoint: Endpoint, path: str, kwargs: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            resp = transport.post(f"{endpoint.url}{path}", **kwargs)
+        except BaseException:
+            self._record(endpoint, None)
+            raise
+        self._record(endpoint, None if resp.status_code >= 500 else (time.perf_counter() - start) * 1000)
+        return resp
+
+    def _spawn(self, transport, endpoint: Endpoint, path: str, kwargs: Dict[str, Any]) -> "asyncio.Task":
+        task = asyncio.ensure_future(self._asend(transport, endpoint, path, kwargs))
+        # 对冲失败方被取消（可能还没开始运行）时只归还在途名额，不计为副本故障
+        task.add_done_callback(lambda t: t.cancelled() and self._release(endpoint))
+        return task
+
+    async def _asend(self, transport, endpoint: Endpoint, path: str, kwargs: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            resp = await transport.apost(f"{endpoint.url}{path}", **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            self._record(endpoint, None)
+            raise
+        self._record(endpoint, None if resp.status_code >= 500 else (time.perf_counter() - start) * 1000)
+        return resp
+
+    def _release(self, endpoint: Endpoint) -> None:
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.probing = False
+
+    def _record(self, endpoint: Endpoint, latency_ms: Optional[float]) -> None:
+        """记录一次请求结果（latency_ms 为 None 表示失败）并更新熔断状态"""
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.probing = False
+            if latency_ms is not None:
+                endpoint.latencies.append(latency_ms)
+                if endpoint.ewma_ms is None:
+                    endpoint.ewma_ms = latency_ms
+                else:
+                    endpoint.ewma_ms += self.ewma_alpha * (latency_ms - endpoint.ewma_ms)
+                endpoint.sampled_at = time.monotonic()
+                endpoint.consecutive_failures = 0
+                endpoint.open_until = 0.0
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.open_until or endpoint.consecutive_failures >= self.failure_threshold:
+                # 探测失败或连续失败达到阈值：熔断
+                endpoint.open_until = time.monotonic() + self.cooldown
+                endpoint.ejections += 1
+                logger.warning(
+                    f"Grounding 副本 {endpoint.url} 连续失败 {endpoint.consecutive_failures} 次，摘除 {self.cooldown:g} 秒"
+                )
+
+    def _count_hedge(self, endpoint: Endpoint) -> None:
+        with self._lock:
+            endpoint.hedges += 1
+
+    def _count_hedge_win(self, endpoint: Endpoint) -> None:
+        with self._lock:
+            endpoint.hedge_wins += 1
+
+
+def _close_response(future) -> None:
+    """对冲失败方的响应在返回后关闭，把连接还给连接池"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
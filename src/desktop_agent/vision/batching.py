@@ -0,0 +1,162 @@
+# src/desktop_agent/vision/batching.py
+"""
+Grounding 微批处理：把多个线程 / 协程在短时间窗口内发起的 perceive 合并为一次 perceive_batch
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+from ..types import VisionData
+
+logger = logging.getLogger(__name__)
+
+# 通知后台线程退出的哨兵
+_STOP = object()
+
+
+class GroundingBatcher:
+    """
+    微批处理收集器
+
+    第一个请求到达后最多等待 window_ms 毫秒（或凑满 max_batch 个）再统一发送，
+    结果按提交顺序分发回各调用方，形状与 perceive 的返回值相同。
+    未指定截图的请求在同一批中共用一次屏幕截图。
+
+    提供 perceive / aperceive，可直接作为 DesktopAgent 的 grounder 使用：
+        batcher = GroundingBatcher(VisionGrounder(config=config))
+        agents = [DesktopAgent(grounder=batcher) for _ in range(8)]
+    """
+
+    def __init__(
+        self,
+        grounder,
+        max_batch: int = 8,
+        window_ms: float = 5.0,
+        mode: Optional[str] = None,
+    ):
+        """
+        Args:
+            grounder: VisionGrounder
+            max_batch: 单批最多的请求数
+            window_ms: 第一个请求到达后等待后续请求的时间（毫秒）
+            mode: perceive_batch 的发送方式（默认使用 grounder.batch_mode）
+        """
+        self.grounder = grounder
+        self.max_batch = max(1, max_batch)
+        self.window_ms = window_ms
+        self.mode = mode
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self._thread = threading.Thread(target=self._loop, name="grounding-batcher", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, grounder, config) -> "GroundingBatcher":
+        return cls(
+            grounder,
+            max_batch=config.grounding_batch_size,
+            window_ms=config.grounding_batch_window_ms,
+        )
+
+    def submit(self, instruction: Optional[str] = None, frame: Optional[Image.Image] = None) -> "Future[VisionData]":
+        """
+        提交一个识别请求
+
+        Args:
+            instruction: 用户指令
+            frame: 截图（None 表示当前屏幕）
+
+        Returns:
+            视觉数据的 Future
+
+        Raises:
+            RuntimeError: 收集器已关闭
+        """
+        future: "Future[VisionData]" = Future()
+        # 检查和入队在同一把锁内：close 放入 _STOP 之后不会再有请求入队（否则其 Future 永远不会完成）
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Grounding 批处理器已关闭")
+            self._queue.put((frame, instruction, future))
+        return future
+
+    def perceive(self, instruction: Optional[str] = None, frame: Optional[Image.Image] = None) -> VisionData:
+        """提交并等待结果（与 VisionGrounder.perceive 兼容）"""
+        return self.submit(instruction, frame).result()
+
+    async def aperceive(self, instruction: Optional[str] = None, frame: Optional[Image.Image] = None) -> VisionData:
+        """perceive 的异步版本"""
+        return await asyncio.wrap_future(self.submit(instruction, frame))
+
+    def stats(self) -> Dict[str, float]:
+        """返回批次数、请求数、平均和最大批大小"""
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+            }
+
+    def close(self) -> None:
+        """处理完已提交的请求后停止后台线程"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self) -> "GroundingBatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _loop(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch: List[Tuple[Optional[Image.Image], Optional[str], Future]] = [item]
+            deadline = time.monotonic() + self.window_ms / 1000
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[Optional[Image.Image], Optional[str], Future]]) -> None:
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        live = [(frame, instruction, future) for frame, instruction, future in batch if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+        try:
+            results = self.grounder.perceive_batch(
+                [(frame, instruction) for frame, instruction, _ in live], mode=self.mode
+            )
+        except Exception as e:
+            logger.warning(f"批量 Grounding 失败（{len(live)} 个请求）: {e}")
+            for _, _, future in live:
+                future.set_exception(e)
+            return
+        for (_, _, future), vision_data in zip(live, results):
+            future.set_result(vision_data)
@@ -0,0 +1,239 @@
+# src/desktop_agent/vision/cache.py
+"""
+Grounding 结果缓存：以截图指纹 + 指令为键，复用屏幕未变化时的 VisionData
+
+感知指纹只用于分桶：低分辨率量化会把小的界面变化（勾选框、输入的一个字符）和原画面归为同一指纹，
+因此命中前还要用全分辨率像素摘要确认画面完全一致。
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+from PIL import Image
+from ..cache import LRUCache
+from ..types import VisionData
+
+logger = logging.getLogger(__name__)
+
+
+def frame_fingerprint(
+    image: Image.Image,
+    size: Tuple[int, int] = (64, 36),
+    levels: int = 32,
+) -> str:
+    """
+    计算截图的感知指纹：灰度化 → 降采样 → 亮度量化 → 哈希
+
+    降采样和量化会吸收光标闪烁、抗锯齿等像素级噪声，
+    因此"看起来一样"的两帧得到相同指纹。
+
+    Args:
+        image: 截图
+        size: 降采样后的 (宽, 高)
+        levels: 亮度量化级数（2~256，越小越宽容）
+
+    Returns:
+        十六进制指纹字符串
+    """
+    levels = max(2, min(256, levels))
+    step = 256 // levels
+    thumb = image.convert("L").resize(size, Image.BOX)
+    quantized = thumb.point([p // step for p in range(256)]).tobytes()
+    digest = hashlib.blake2b(quantized, digest_size=16)
+    digest.update(f"{size[0]}x{size[1]}:{levels}".encode())
+    return digest.hexdigest()
+
+
+def frame_digest(image: Image.Image) -> str:
+    """
+    全分辨率像素摘要（任何一个像素不同都会得到不同的摘要）
+
+    Args:
+        image: 截图
+
+    Returns:
+        十六进制摘要字符串
+    """
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+    return digest.hexdigest()
+
+
+class GroundingCache:
+    """
+    Grounding 结果缓存
+
+    - 内存层：带 TTL 的 LRU
+    - 磁盘层（可选）：每个键一个 JSON 文件，进程重启后仍可命中
+
+    条目同时保存截图的全分辨率摘要（见 frame_digest）；查询时传入当前截图的摘要，
+    指纹相同但像素不同的条目不会被复用。
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: Optional[float] = 300.0,
+        cache_dir: Optional[str] = None,
+        fingerprint_size: Tuple[int, int] = (64, 36),
+        fingerprint_levels: int = 32,
+    ):
+        """
+        Args:
+            maxsize: 内存层最大条目数（<= 0 禁用内存层）
+            ttl: 条目存活时间（秒，None 或 <= 0 表示永不过期）
+            cache_dir: 磁盘层目录（None 表示不启用）
+            fingerprint_size: 指纹降采样尺寸
+            fingerprint_levels: 指纹亮度量化级数
+        """
+        # 值为 (全分辨率摘要, VisionData)
+        self.memory: LRUCache[Tuple[Optional[str], VisionData]] = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = self.memory.ttl
+        self.cache_dir = cache_dir
+        self.fingerprint_size = fingerprint_size
+        self.fingerprint_levels = fingerprint_levels
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        # 指纹命中但全分辨率摘要不一致（画面有细小变化）的次数
+        self.rejected = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(
+        self,
+        image: Image.Image,
+        instruction: Optional[str] = None,
+        model: str = "",
+        fingerprint: Optional[str] = None,
+    ) -> str:
+        """
+        生成缓存键
+
+        Args:
+            image: 截图
+            instruction: 用户指令
+            model: Grounding 模型名称（不同模型的结果不可混用）
+            fingerprint: 已算好的截图指纹（同一帧对应多条指令时复用，见 fingerprint()）
+
+        Returns:
+            缓存键
+        """
+        if fingerprint is None:
+            fingerprint = self.fingerprint(image)
+        extra = hashlib.blake2b(
+            f"{model}\x00{image.size[0]}x{image.size[1]}\x00{instruction or ''}".encode("utf-8"),
+            digest_size=8,
+        ).hexdigest()
+        return f"{fingerprint}-{extra}"
+
+    def fingerprint(self, image: Image.Image) -> str:
+        """按本缓存的指纹参数计算截图指纹"""
+        return frame_fingerprint(image, self.fingerprint_size, self.fingerprint_levels)
+
+    def digest(self, image: Image.Image) -> str:
+        """截图的全分辨率摘要（传给 get/put 用于确认命中）"""
+        return frame_digest(image)
+
+    def get(self, key: str, digest: Optional[str] = None) -> Optional[VisionData]:
+        """
+        查询缓存（先内存后磁盘），命中时返回深拷贝，调用方可自由修改
+
+        Args:
+            key: 缓存键
+            digest: 当前截图的全分辨率摘要；提供时只有摘要一致的条目才算命中
+
+        Returns:
+            缓存的 VisionData，未命中返回 None
+        """
+        entry = self.memory.get(key)
+        if entry is None and self.cache_dir:
+            entry = self._disk_get(key)
+            if entry is not None:
+                self.disk_hits += 1
+                self.memory.put(key, entry)
+        if entry is not None and digest is not None and entry[0] != digest:
+            self.rejected += 1
+            logger.debug("截图指纹相同但像素有变化，不复用缓存的 Grounding 结果")
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: str, vision_data: VisionData, digest: Optional[str] = None) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            vision_data: Grounding 结果
+            digest: 截图的全分辨率摘要（见 digest()）
+        """
+        entry = (digest, copy.deepcopy(vision_data))
+        self.memory.put(key, entry)
+        if self.cache_dir:
+            self._disk_put(key, entry)
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层"""
+        self.memory.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_hits": self.hits - self.disk_hits,
+            "disk_hits": self.disk_hits,
+            "rejected": self.rejected,
+            "evictions": self.memory.evictions,
+            "size": len(self.memory),
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[Tuple[Optional[str], VisionData]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 Grounding 磁盘缓存失败: {e}")
+            return None
+        if self.ttl is not None and time.time() - entry.get("ts", 0) > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        if "data" not in entry:
+            return None
+        return entry.get("digest"), entry["data"]
+
+    def _disk_put(self, key: str, entry: Tuple[Optional[str], VisionData]) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        digest, vision_data = entry
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"ts": time.time(), "digest": digest, "data": vision_data}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"写入 Grounding 磁盘缓存失败: {e}")
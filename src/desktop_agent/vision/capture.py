@@ -1,33 +1,270 @@
 # src/desktop_agent/vision/capture.py
 import io
+import time
+from dataclasses import dataclass, field
 from PIL import Image
-import pyautogui
-from typing import Tuple
+from typing import Callable, Literal, Optional, Tuple, Union
+from ..tracing import tracer
+
+# 缩放滤镜：lanczos 质量最高但最慢，bilinear/box 通常是速度与识别精度的较好折中
+RESAMPLE_FILTERS = {
+    "nearest": Image.NEAREST,
+    "box": Image.BOX,
+    "bilinear": Image.BILINEAR,
+    "hamming": Image.HAMMING,
+    "bicubic": Image.BICUBIC,
+    "lanczos": Image.LANCZOS,
+}
+
+_MIME_TYPES = {
+    "png": ("screen.png", "image/png"),
+    "jpeg": ("screen.jpg", "image/jpeg"),
+    "webp": ("screen.webp", "image/webp"),
+    "raw": ("screen.raw", "application/octet-stream"),
+}
+
+
+@dataclass
+class CaptureOptions:
+    """截图编码选项"""
+    # 编码格式：png（无损）、jpeg/webp（有损）、raw（未压缩像素）
+    format: Literal["png", "jpeg", "webp", "raw"] = "png"
+    # jpeg/webp 质量（1~100）
+    quality: int = 85
+    # png 压缩级别（0~9，越小越快、体积越大）
+    png_compress_level: int = 6
+    # 缩放滤镜，见 RESAMPLE_FILTERS
+    resample: str = "lanczos"
+    # 颜色模式：RGB 或 L（灰度，体积约为 1/3）
+    color_mode: Literal["RGB", "L"] = "RGB"
+
+    def __post_init__(self):
+        self.format = self.format.lower()
+        self.resample = self.resample.lower()
+        if self.format not in _MIME_TYPES:
+            raise ValueError(f"不支持的截图编码格式: {self.format}")
+        if self.resample not in RESAMPLE_FILTERS:
+            raise ValueError(f"不支持的缩放滤镜: {self.resample}")
+        if self.color_mode not in ("RGB", "L"):
+            raise ValueError(f"不支持的颜色模式: {self.color_mode}")
+
+    @classmethod
+    def from_config(cls, config) -> "CaptureOptions":
+        return cls(
+            format=config.capture_format,
+            quality=config.capture_quality,
+            png_compress_level=config.capture_png_compress_level,
+            resample=config.capture_resample,
+            color_mode=config.capture_color_mode,
+        )
+
+    @property
+    def filename(self) -> str:
+        return _MIME_TYPES[self.format][0]
+
+    @property
+    def mime_type(self) -> str:
+        return _MIME_TYPES[self.format][1]
+
+
+@dataclass
+class CaptureTimings:
+    """截图各阶段耗时（毫秒）"""
+    grab_ms: float = 0.0
+    resize_ms: float = 0.0
+    convert_ms: float = 0.0
+    encode_ms: float = 0.0
+
+    @property
+    def total_ms(self) -> float:
+        return self.grab_ms + self.resize_ms + self.convert_ms + self.encode_ms
+
+
+@dataclass
+class EncodedFrame:
+    """
+    编码后的截图
+
+    data 可能是指向编码器内部缓冲区的 memoryview（零拷贝），
+    只在下一次 encode 之前有效；需要长期保存时请使用 bytes(frame.data)。
+    """
+    data: Union[bytes, memoryview]
+    size: Tuple[int, int]
+    options: CaptureOptions
+    timings: CaptureTimings = field(default_factory=CaptureTimings)
+
+    @property
+    def filename(self) -> str:
+        return self.options.filename
+
+    @property
+    def mime_type(self) -> str:
+        return self.options.mime_type
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class FrameEncoder:
+    """
+    可复用缓冲区的截图编码器（非线程安全，每个使用方持有一个实例）
+
+    每次编码复用同一个 BytesIO，并以 memoryview 形式返回编码结果，
+    避免 getvalue() 带来的额外拷贝。
+    """
+
+    def __init__(self, options: Optional[CaptureOptions] = None):
+        """
+        Args:
+            options: 编码选项（默认无损 PNG）
+        """
+        self.options = options or CaptureOptions()
+        self._buffer = io.BytesIO()
+        self._view: Optional[memoryview] = None
+
+    def encode(self, image: Image.Image, timings: Optional[CaptureTimings] = None) -> EncodedFrame:
+        """
+        按选项转换颜色模式并编码截图
+
+        Args:
+            image: 截图
+            timings: 已有的阶段耗时（如 grab_screen 的结果），编码耗时会累加到其中
+
+        Returns:
+            编码后的截图
+        """
+        opts = self.options
+        timings = timings or CaptureTimings()
+
+        start = time.perf_counter()
+        if image.mode != opts.color_mode:
+            image = image.convert(opts.color_mode)
+        timings.convert_ms += (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with tracer.span("capture.encode", format=opts.format) as span:
+            if opts.format == "raw":
+                data: Union[bytes, memoryview] = image.tobytes()
+            else:
+                buffer = self._reset_buffer()
+                if opts.format == "png":
+                    image.save(buffer, format="PNG", compress_level=opts.png_compress_level)
+                elif opts.format == "jpeg":
+                    image.save(buffer, format="JPEG", quality=opts.quality)
+                else:
+                    image.save(buffer, format="WEBP", quality=opts.quality, method=0)
+                self._view = data = buffer.getbuffer()
+            span.set_attribute("bytes", len(data))
+        timings.encode_ms += (time.perf_counter() - start) * 1000
+
+        return EncodedFrame(data=data, size=image.size, options=opts, timings=timings)
+
+    def _reset_buffer(self) -> io.BytesIO:
+        """释放上一次的视图并清空缓冲区；视图仍被外部引用时改用新缓冲区"""
+        if self._view is not None:
+            try:
+                self._view.release()
+            except BufferError:
+                pass
+            self._view = None
+        try:
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        except BufferError:
+            self._buffer = io.BytesIO()
+        return self._buffer
+
+
+def grab_screen(
+    target_width: int = 1920,
+    target_height: int = 1080,
+    resample: str = "lanczos",
+    timings: Optional[CaptureTimings] = None,
+    source: Optional[Callable[[], Image.Image]] = None,
+) -> Image.Image:
+    """
+    捕获主屏幕并缩放到目标分辨率（不编码）
+
+    Args:
+        target_width: 目标宽度
+        target_height: 目标高度
+        resample: 缩放滤镜，见 RESAMPLE_FILTERS
+        timings: 可选，用于记录截图和缩放耗时
+        source: 自定义取帧函数（默认用 pyautogui 截取主屏幕；离线基准测试等无显示器场景使用）
+
+    Returns:
+        缩放后的截图
+
+    Raises:
+        RuntimeError: 截图失败时抛出
+    """
+    try:
+        start = time.perf_counter()
+        with tracer.span("capture.grab"):
+            if source is not None:
+                screen = source()
+            else:
+                # 延迟导入：pyautogui 在导入时就需要连接显示器
+                import pyautogui
+                screen = pyautogui.screenshot()
+        grabbed = time.perf_counter()
+        if screen.size != (target_width, target_height):
+            with tracer.span("capture.resize", resample=resample):
+                screen = screen.resize((target_width, target_height), RESAMPLE_FILTERS[resample])
+        if timings is not None:
+            timings.grab_ms += (grabbed - start) * 1000
+            timings.resize_ms += (time.perf_counter() - grabbed) * 1000
+        return screen
+    except Exception as e:
+        raise RuntimeError(f"截图失败: {e}") from e
+
+
+def capture_frame(
+    target_width: int = 1920,
+    target_height: int = 1080,
+    encoder: Optional[FrameEncoder] = None,
+) -> EncodedFrame:
+    """
+    截图 → 缩放 → 编码，并记录各阶段耗时
+
+    Args:
+        target_width: 目标宽度
+        target_height: 目标高度
+        encoder: 编码器（复用其缓冲区；默认新建无损 PNG 编码器）
+
+    Returns:
+        编码后的截图（含 timings）
+
+    Raises:
+        RuntimeError: 截图或编码失败时抛出
+    """
+    encoder = encoder or FrameEncoder()
+    timings = CaptureTimings()
+    screen = grab_screen(target_width, target_height, encoder.options.resample, timings)
+    try:
+        return encoder.encode(screen, timings)
+    except Exception as e:
+        raise RuntimeError(f"截图编码失败: {e}") from e
+
 
 def capture_screenshot(
     target_width: int = 1920,
     target_height: int = 1080,
+    options: Optional[CaptureOptions] = None,
 ) -> Tuple[bytes, Tuple[int, int]]:
     """
     捕获主屏幕并缩放到目标分辨率（供 Grounding 模型使用）
-    
+
     Args:
         target_width: 目标宽度
         target_height: 目标高度
-    
+        options: 编码选项（默认无损 PNG + LANCZOS 缩放）
+
     Returns:
         (截图字节流, (宽度, 高度))
-    
+
     Raises:
         Exception: 截图失败时抛出异常
     """
-    try:
-        screen = pyautogui.screenshot()
-        if screen.size != (target_width, target_height):
-            screen = screen.resize((target_width, target_height), Image.LANCZOS)
-        
-        buffer = io.BytesIO()
-        screen.save(buffer, format="PNG")
-        return buffer.getvalue(), (target_width, target_height)
-    except Exception as e:
-        raise RuntimeError(f"截图失败: {e}") from e
\ No newline at end of file
+    frame = capture_frame(target_width, target_height, FrameEncoder(options))
+    return bytes(frame.data), (target_width, target_height)
@@ -0,0 +1,189 @@
+# src/desktop_agent/vision/continuous.py
+"""
+连续截图：后台线程按固定帧率抓屏，写入预分配帧组成的环形缓冲区，
+调用方（VisionGrounder.perceive、屏幕稳定检测）直接读取最新一帧，不再等待抓屏
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+import numpy as np
+from PIL import Image
+from .grabbers import CaptureBackend, create_capture_backend
+
+logger = logging.getLogger(__name__)
+
+
+class CapturedFrame(NamedTuple):
+    """环形缓冲区中的一帧"""
+    # 帧序号（从 1 开始递增）
+    seq: int
+    # 抓取完成的时间（perf_counter）
+    timestamp: float
+    image: Image.Image
+
+
+class ContinuousCapture:
+    """
+    连续截图
+
+    后台线程每 1/fps 秒把一帧写入 depth 个预分配的 (高, 宽, 3) 数组中的下一个；
+    读取时把最新一帧拷贝成 PIL 图像。每个槽位记录所存帧的序号，拷贝前后序号不一致
+    （读取期间被写入线程绕回覆盖）时重新读取，因此读到的帧不会撕裂。
+
+    实例可直接作为 VisionGrounder 的 frame_source；第一次读取时自动启动后台线程。
+    """
+
+    def __init__(self, backend: CaptureBackend, fps: float = 30.0, depth: int = 4):
+        """
+        Args:
+            backend: 截图后端
+            fps: 抓屏帧率
+            depth: 环形缓冲区的帧数（至少 2）
+        """
+        self.backend = backend
+        self.fps = fps
+        self.depth = max(2, depth)
+        self._slots: List[np.ndarray] = []
+        # 每个槽位当前保存的帧序号，写入中为 -1
+        self._slot_seq: List[int] = []
+        self._seq = 0
+        self._timestamp = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[Exception] = None
+        self.frames = 0
+        self.errors = 0
+        self.rereads = 0
+        self.grab_ms = 0.0
+        self._started_at = 0.0
+
+    @classmethod
+    def from_config(cls, config) -> "ContinuousCapture":
+        return cls(create_capture_backend(config), fps=config.capture_fps, depth=config.capture_buffer)
+
+    @property
+    def seq(self) -> int:
+        """最新一帧的序号（尚无帧时为 0）"""
+        with self._cond:
+            return self._seq
+
+    def start(self) -> "ContinuousCapture":
+        """启动后台抓屏线程（已启动时不做任何事）"""
+        with self._cond:
+            if self._thread is not None:
+                return self
+            self._stop.clear()
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="continuous-capture", daemon=True)
+            self._thread.start()
+        return self
+
+    def frame(self, newer_than: Optional[int] = None, timeout: float = 1.0) -> CapturedFrame:
+        """
+        读取最新一帧
+
+        Args:
+            newer_than: 只接受序号大于该值的帧（用于等待动作之后的新画面），默认接受任何已有的帧
+            timeout: 等待新帧的最长时间（秒）
+
+        Returns:
+            最新一帧
+
+        Raises:
+            RuntimeError: 超时仍没有满足条件的帧（通常是抓屏持续失败）
+        """
+        self.start()
+        minimum = 0 if newer_than is None else newer_than
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._seq > minimum, timeout):
+                    raise RuntimeError(f"连续截图超时（{timeout:g} 秒内没有新帧）: {self._error or '未知原因'}")
+                seq, timestamp = self._seq, self._timestamp
+                slots, slot_seq = self._slots, self._slot_seq
+            index = seq % len(slots)
+            # fromarray 会把像素拷贝到 PIL 自己的存储中
+            image = Image.fromarray(slots[index])
+            if slot_seq[index] == seq:
+                return CapturedFrame(seq, timestamp, image)
+            # 拷贝期间该槽位被覆盖（或缓冲区已重新分配），改读更新的一帧
+            self.rereads += 1
+            minimum = seq
+
+    def stats(self) -> Dict[str, Any]:
+        """返回已抓取帧数、失败次数、实际帧率、平均抓屏耗时和重读次数"""
+        elapsed = time.perf_counter() - self._started_at if self._thread is not None else 0.0
+        return {
+            "frames": self.frames,
+            "errors": self.errors,
+            "fps": round(self.frames / elapsed, 2) if elapsed else 0.0,
+            "mean_grab_ms": round(self.grab_ms / self.frames, 3) if self.frames else 0.0,
+            "rereads": self.rereads,
+            "depth": self.depth,
+        }
+
+    def close(self) -> None:
+        """停止后台线程并关闭截图后端"""
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=2.0)
+        self.backend.close()
+
+    def __call__(self) -> Image.Image:
+        return self.frame().image
+
+    def __enter__(self) -> "ContinuousCapture":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _allocate(self) -> None:
+        width, height = self.backend.size()
+        slots = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(self.depth)]
+        with self._cond:
+            self._slots = slots
+            self._slot_seq = [0] * self.depth
+        logger.debug(f"连续截图缓冲区: {self.depth} 帧 {width}x{height}")
+
+    def _run(self) -> None:
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        reallocate = True
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                if reallocate:
+                    self._allocate()
+                    reallocate = False
+                self._grab_next()
+            except ValueError as e:
+                # 分辨率变化：下一轮按新尺寸重新分配缓冲区（读取方在此之前仍读到旧缓冲区的最新帧）
+                logger.info(f"{e}，重新分配缓冲区")
+                reallocate = True
+            except Exception as e:
+                self.errors += 1
+                # 连续失败（如显示器不可用）只在第一次时警告
+                if self._error is None:
+                    logger.warning(f"连续截图失败: {e}")
+                else:
+                    logger.debug(f"连续截图失败: {e}")
+                self._error = e
+            self._stop.wait(max(0.0, interval - (time.perf_counter() - started)))
+
+    def _grab_next(self) -> None:
+        seq = self._seq + 1
+        index = seq % len(self._slots)
+        self._slot_seq[index] = -1
+        start = time.perf_counter()
+        self.backend.grab_into(self._slots[index])
+        done = time.perf_counter()
+        self._slot_seq[index] = seq
+        self.grab_ms += (done - start) * 1000
+        self.frames += 1
+        with self._cond:
+            self._seq = seq
+            self._timestamp = done
+            self._error = None
+            self._cond.notify_all()
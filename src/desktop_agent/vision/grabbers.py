@@ -0,0 +1,155 @@
+# src/desktop_agent/vision/grabbers.py
+"""
+截图后端：pyautogui（默认，Linux 上每次调用外部工具或完整抓屏）和 mss（通过 Xlib 直接读取帧缓冲，
+可用 XShm 时走共享内存，在 Xvfb 下同样可用）
+"""
+import logging
+import threading
+from typing import Dict, List, Tuple, Type
+import numpy as np
+from PIL import Image
+
+# 可选依赖：直接抓屏
+try:
+    import mss
+except ImportError:
+    mss = None
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureBackend:
+    """截图后端接口（实例可直接作为 VisionGrounder 的 frame_source）"""
+
+    def grab(self) -> Image.Image:
+        """截取整个屏幕，返回 RGB 图像"""
+        raise NotImplementedError
+
+    def grab_into(self, out: np.ndarray) -> None:
+        """
+        截取整个屏幕并写入预分配的数组
+
+        Args:
+            out: (高, 宽, 3) 的 uint8 数组
+
+        Raises:
+            ValueError: 屏幕尺寸与 out 不一致（如分辨率发生变化）
+        """
+        image = self.grab()
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        pixels = np.asarray(image)
+        if pixels.shape != out.shape:
+            raise ValueError(f"屏幕尺寸 {pixels.shape[1]}x{pixels.shape[0]} 与缓冲区不一致")
+        np.copyto(out, pixels)
+
+    def size(self) -> Tuple[int, int]:
+        """屏幕 (宽, 高)"""
+        return self.grab().size
+
+    def close(self) -> None:
+        """释放资源"""
+
+    def __call__(self) -> Image.Image:
+        return self.grab()
+
+
+class PyAutoGUICapture(CaptureBackend):
+    """pyautogui.screenshot()（与原有行为一致）"""
+
+    def grab(self) -> Image.Image:
+        # 延迟导入：pyautogui 在导入时就需要连接显示器
+        import pyautogui
+        return pyautogui.screenshot()
+
+    def size(self) -> Tuple[int, int]:
+        import pyautogui
+        width, height = pyautogui.size()
+        return width, height
+
+
+class MSSCapture(CaptureBackend):
+    """
+    mss 直接抓屏（需要 mss 库）
+
+    mss 实例绑定创建它的线程（X11 连接不能跨线程共享），每个调用线程各持有一个。
+    grab_into 把 BGRA 像素按通道倒序直接拷贝进目标数组，不经过中间的 PIL 图像。
+    """
+
+    def __init__(self, monitor: int = 1):
+        """
+        Args:
+            monitor: 显示器序号（1 为主屏幕，0 为所有显示器拼接的虚拟屏幕）
+
+        Raises:
+            ImportError: 未安装 mss
+        """
+        if mss is None:
+            raise ImportError("mss 截图后端需要 mss 库: pip install mss")
+        self.monitor = monitor
+        self._local = threading.local()
+        self._instances: List = []
+        self._lock = threading.Lock()
+
+    def grab(self) -> Image.Image:
+        shot = self._grab()
+        return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+
+    def grab_into(self, out: np.ndarray) -> None:
+        shot = self._grab()
+        if (shot.height, shot.width, 3) != out.shape:
+            raise ValueError(f"屏幕尺寸 {shot.width}x{shot.height} 与缓冲区不一致")
+        pixels = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        np.copyto(out, pixels[:, :, 2::-1])
+
+    def size(self) -> Tuple[int, int]:
+        area = self._sct().monitors[self.monitor]
+        return area["width"], area["height"]
+
+    def close(self) -> None:
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for sct in instances:
+            try:
+                sct.close()
+            except Exception as e:
+                logger.debug(f"关闭 mss 实例失败: {e}")
+        self._local = threading.local()
+
+    def _grab(self):
+        sct = self._sct()
+        return sct.grab(sct.monitors[self.monitor])
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = mss.mss()
+            with self._lock:
+                self._instances.append(sct)
+        return sct
+
+
+CAPTURE_BACKENDS: Dict[str, Type[CaptureBackend]] = {
+    "pyautogui": PyAutoGUICapture,
+    "mss": MSSCapture,
+}
+
+
+def create_capture_backend(config) -> CaptureBackend:
+    """
+    按配置创建截图后端
+
+    Args:
+        config: 配置对象
+
+    Returns:
+        截图后端
+
+    Raises:
+        ValueError: 不支持的后端名称
+        ImportError: 后端依赖的库未安装
+    """
+    name = config.capture_backend
+    if name not in CAPTURE_BACKENDS:
+        raise ValueError(f"不支持的截图后端: {name}")
+    return CAPTURE_BACKENDS[name]()
@@ -1,9 +1,27 @@
 # src/desktop_agent/vision/grounding.py
+import asyncio
+import contextvars
+import json
+import logging
+import time
 import requests
-from typing import Dict, Any, Optional
-from .capture import capture_screenshot
-from ..types import VisionData, ElementMap, UIElement
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple, Union
+from PIL import Image
+from .capture import grab_screen, CaptureOptions, CaptureTimings, EncodedFrame, FrameEncoder, RESAMPLE_FILTERS
+from .cache import GroundingCache
+from .continuous import ContinuousCapture
+from .grabbers import create_capture_backend
+from .transport import GroundingTransport, httpx
+from .balancer import EndpointBalancer
+from .index import ElementIndex
+from .incremental import Region, find_dirty_regions, expand_regions, merge_elements, region_area
+from .tracker import ElementTracker
+from ..types import VisionData, ElementMap, UIElement, loads_json
 from ..config import Config
+from ..tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 class VisionGrounder:
     """
@@ -20,21 +38,36 @@ class VisionGrounder:
     
     def __init__(
         self,
-        url: Optional[str] = None,
+        url: Optional[Union[str, Sequence[str]]] = None,
         model: Optional[str] = None,
         api_key: Optional[str] = None,
         width: Optional[int] = None,
         height: Optional[int] = None,
         config: Optional[Config] = None,
+        cache: Optional[GroundingCache] = None,
+        incremental: Optional[bool] = None,
+        capture_options: Optional[CaptureOptions] = None,
+        transport: Optional[GroundingTransport] = None,
+        frame_source: Optional[Callable[[], Image.Image]] = None,
+        balancer: Optional[EndpointBalancer] = None,
+        tracker: Optional[ElementTracker] = None,
     ):
         """
         Args:
-            url: Grounding 模型 URL
+            url: Grounding 模型 URL（多个副本时为列表或逗号分隔的字符串）
             model: Grounding 模型名称
             api_key: API 密钥
             width: 截图宽度
             height: 截图高度
             config: 配置对象（优先级高于单独参数）
+            cache: Grounding 结果缓存（如未提供则按 config 创建，size 为 0 时禁用）
+            incremental: 是否启用增量 Grounding（只上传变化区域，默认读取 config）
+            capture_options: 截图编码选项（格式、质量、缩放滤镜、颜色模式，默认读取 config）
+            transport: HTTP 传输层（连接池、超时、重试，默认读取 config）
+            frame_source: 自定义取帧函数（默认按 config 的截图后端截取主屏幕；开启 CAPTURE_CONTINUOUS 时
+                          读取后台连续截图的最新一帧；基准测试中用于注入合成画面）
+            balancer: 多个副本之间的负载均衡、对冲和熔断（有多个 URL 时默认读取 config 创建）
+            tracker: 本地元素跟踪器（界面小幅平移时不调用模型，默认在 config.grounding_tracking 开启时创建）
         """
         if config:
             self.url = url or config.grounding_url
@@ -43,17 +76,91 @@ class VisionGrounder:
             self.width = width if width is not None else config.grounding_width
             self.height = height if height is not None else config.grounding_height
         else:
-            self.url = (url or "http://localhost:8080").rstrip("/")
+            self.url = url or "http://localhost:8080"
             self.model = model or "ui-tars-1.5-7b"
             self.api_key = api_key
             self.width = width or 1920
             self.height = height or 1080
         
+        if cache is None:
+            if config:
+                cache = GroundingCache(
+                    maxsize=config.grounding_cache_size,
+                    ttl=config.grounding_cache_ttl,
+                    cache_dir=config.grounding_cache_dir,
+                )
+            else:
+                cache = GroundingCache()
+        self.cache = cache if cache.memory.maxsize > 0 or cache.cache_dir else None
+        
+        # 增量 Grounding
+        if incremental is None:
+            incremental = config.grounding_incremental if config else False
+        self.incremental = incremental
+        self.incremental_max_area = config.grounding_incremental_max_area if config else 0.5
+        self.diff_tile = config.grounding_diff_tile if config else 32
+        self.diff_threshold = config.grounding_diff_threshold if config else 16
+        self.incremental_stats = {"full": 0, "incremental": 0, "unchanged": 0, "regions": 0, "pixels_sent": 0}
+        self._last_frame: Optional[Image.Image] = None
+        self._last_instruction: Optional[str] = None
+        self._last_vision: Optional[VisionData] = None
+        
+        # 本地元素跟踪：跟踪成功时直接返回平移后的元素，失败时回退到增量/完整识别
+        if tracker is None and config and config.grounding_tracking:
+            tracker = ElementTracker.from_config(config)
+        self.tracker = tracker
+        self._tracker_instruction: Optional[str] = None
+        
+        if capture_options is None:
+            capture_options = CaptureOptions.from_config(config) if config else CaptureOptions()
+        self.capture_options = capture_options
+        self.encoder = FrameEncoder(capture_options)
+        # 按 config 创建的截图后端由本实例关闭；未设置时沿用 grab_screen 默认的 pyautogui
+        self._owns_frame_source = False
+        if frame_source is None and config:
+            if config.capture_continuous:
+                frame_source = ContinuousCapture.from_config(config)
+                self._owns_frame_source = True
+            elif config.capture_backend != "pyautogui":
+                frame_source = create_capture_backend(config)
+                self._owns_frame_source = True
+        self.frame_source = frame_source
+        # 连续截图（DesktopAgent 让屏幕稳定检测共用同一个后台线程）
+        self.capture = frame_source if isinstance(frame_source, ContinuousCapture) else None
+        # 最近一次 perceive 的各阶段耗时（毫秒）和上传字节数
+        self.last_timings: Dict[str, float] = {}
+        
         self.headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        if transport is None:
+            transport = GroundingTransport.from_config(config) if config else GroundingTransport()
+        self.transport = transport
+        
+        # 多个 Grounding 副本：请求经 balancer 选择副本；self.url 保留第一个地址
+        self.urls = self._parse_urls(self.url)
+        self.url = self.urls[0]
+        if balancer is None and len(self.urls) > 1:
+            # 对冲请求需要额外的线程，线程数取连接池大小的两倍
+            workers = transport.pool_size * 2
+            if config:
+                balancer = EndpointBalancer.from_config(self.urls, config, max_workers=workers)
+            else:
+                balancer = EndpointBalancer(self.urls, max_workers=workers)
+        self.balancer = balancer
+        
+        # 批量 Grounding：concurrent 为并发的单条请求（任何服务都支持），multipart 为一次请求携带多帧多指令
+        self.batch_mode = config.grounding_batch_mode if config else "concurrent"
+        self.batch_path = config.grounding_batch_path if config else "/ground_batch"
+        self._batch_pool: Optional[ThreadPoolExecutor] = None
 
     def perceive(self, instruction: Optional[str] = None) -> VisionData:
         """
-        完整流程：截图 → 发送 → 解析
+        完整流程：截图 → 查询缓存 → 发送 → 解析
+        
+        屏幕指纹和指令与缓存条目一致时直接返回缓存结果，不再调用模型。
+        启用元素跟踪时，先在本地重新定位上一次识别出的元素（界面小幅滚动或移动），
+        跟踪成功则直接返回平移后的结果。
+        启用增量模式时，只把相对上一次 Grounding 发生变化的区域发送给模型，
+        并将结果合并到上一次的元素列表中。
         
         Args:
             instruction: 可选的用户指令，用于指导模型关注特定区域
@@ -64,28 +171,564 @@ class VisionGrounder:
         Raises:
             requests.RequestException: API 请求失败时抛出
         """
-        try:
-            screenshot_bytes, _ = capture_screenshot(self.width, self.height)
-            
-            files = {"image": ("screen.png", screenshot_bytes, "image/png")}
-            data = {
-                "model": self.model,
-                "width": str(self.width),
-                "height": str(self.height),
-                "instruction": instruction or "Describe all UI elements with bounding boxes and text."
-            }
-            
-            resp = requests.post(
-                f"{self.url}/ground",
+        with tracer.span("grounding.perceive", model=self.model) as span:
+            try:
+                screen, timings, cache_key, cached = self._capture(instruction)
+                if cached is not None:
+                    span.set_attributes(mode="cached", elements=len(cached.get("elements", [])))
+                    return cached
+                
+                tracked = self._track(screen, instruction)
+                if tracked is not None:
+                    span.set_attributes(mode="tracked", elements=len(tracked.get("elements", [])))
+                    return self._finish(screen, instruction, cache_key, tracked, timings, tracked=True)
+                
+                vision_data = None
+                regions = self._plan_incremental(screen, instruction)
+                if regions is not None:
+                    regional = []
+                    for region in regions:
+                        frame = self.encoder.encode(screen.crop(region), timings)
+                        result = self._ground(frame, instruction, offset=region[:2])
+                        regional.append((region, result.get("elements", [])))
+                    vision_data = self._merge_incremental(regions, regional)
+                    span.set_attributes(mode="incremental", regions=len(regions))
+                if vision_data is None:
+                    vision_data = self._ground(self.encoder.encode(screen, timings), instruction)
+                    self._count_full()
+                    span.set_attribute("mode", "full")
+                
+                span.set_attribute("elements", len(vision_data.get("elements", [])))
+                return self._finish(screen, instruction, cache_key, vision_data, timings)
+            except requests.RequestException as e:
+                raise RuntimeError(f"Grounding API 请求失败: {e}") from e
+    
+    async def aperceive(self, instruction: Optional[str] = None) -> VisionData:
+        """
+        perceive 的异步版本
+        
+        截图、指纹、差分和编码等阻塞步骤放到线程池执行，不阻塞事件循环；
+        HTTP 请求使用异步客户端（需要 httpx），增量模式下各变化区域并发上传。
+        
+        Args:
+            instruction: 可选的用户指令
+        
+        Returns:
+            视觉数据（包含 elements 和 resolution）
+        
+        Raises:
+            RuntimeError: API 请求失败时抛出
+        """
+        loop = asyncio.get_running_loop()
+        with tracer.span("grounding.perceive", model=self.model) as span:
+            try:
+                screen, timings, cache_key, cached = await loop.run_in_executor(None, self._capture, instruction)
+                if cached is not None:
+                    span.set_attributes(mode="cached", elements=len(cached.get("elements", [])))
+                    return cached
+                
+                if self.tracker is not None:
+                    tracked = await loop.run_in_executor(None, self._track, screen, instruction)
+                    if tracked is not None:
+                        span.set_attributes(mode="tracked", elements=len(tracked.get("elements", [])))
+                        return self._finish(screen, instruction, cache_key, tracked, timings, tracked=True)
+                
+                vision_data = None
+                regions = await loop.run_in_executor(None, self._plan_incremental, screen, instruction)
+                if regions is not None:
+                    frames = await loop.run_in_executor(None, self._encode_regions, screen, regions, timings)
+                    results = await asyncio.gather(*[
+                        self._aground(frame, instruction, offset=region[:2])
+                        for region, frame in zip(regions, frames)
+                    ])
+                    regional = [(region, result.get("elements", [])) for region, result in zip(regions, results)]
+                    vision_data = self._merge_incremental(regions, regional)
+                    span.set_attributes(mode="incremental", regions=len(regions))
+                if vision_data is None:
+                    frame = await loop.run_in_executor(None, self._encode_owned, screen, timings)
+                    vision_data = await self._aground(frame, instruction)
+                    self._count_full()
+                    span.set_attribute("mode", "full")
+                
+                span.set_attribute("elements", len(vision_data.get("elements", [])))
+                return self._finish(screen, instruction, cache_key, vision_data, timings)
+            except requests.RequestException as e:
+                raise RuntimeError(f"Grounding API 请求失败: {e}") from e
+            except Exception as e:
+                if httpx is not None and isinstance(e, httpx.HTTPError):
+                    raise RuntimeError(f"Grounding API 请求失败: {e}") from e
+                raise
+    
+    def perceive_batch(
+        self,
+        queries: Sequence[Tuple[Optional[Image.Image], Optional[str]]],
+        mode: Optional[str] = None,
+    ) -> List[VisionData]:
+        """
+        批量识别多组 (截图, 指令)
+        
+        截图为 None 的查询共用一次当前屏幕截图（即“一帧多查询”）；相同的截图只编码一次。
+        逐条查询缓存，未命中的查询按 mode 发送：
+        - concurrent: 每条查询一个 /ground 请求，并发发送
+        - multipart: 所有查询合并为一个 batch_path 请求，表单字段 queries 为
+          [{"image": 图片序号, "instruction": 指令}, ...]，多个 image 文件按序号排列，
+          服务返回 {"results": [VisionData, ...]}，顺序与 queries 一致
+        
+        批量识别不使用也不更新增量 Grounding 的参考帧。
+        
+        Args:
+            queries: (截图, 指令) 列表，截图会被缩放到 Grounding 分辨率
+            mode: 发送方式（默认读取 config.grounding_batch_mode）
+        
+        Returns:
+            与 queries 一一对应的视觉数据
+        
+        Raises:
+            ValueError: 不支持的发送方式
+            RuntimeError: API 请求失败或返回的结果数不一致
+        """
+        mode = mode or self.batch_mode
+        if mode not in ("concurrent", "multipart"):
+            raise ValueError(f"不支持的批量发送方式: {mode}")
+        if not queries:
+            return []
+        
+        with tracer.span("grounding.perceive_batch", model=self.model, size=len(queries), mode=mode) as span:
+            try:
+                timings = CaptureTimings()
+                self.last_timings = {}
+                # 去重后的截图，以及每条查询对应的截图序号（None 表示当前屏幕）
+                frames: List[Image.Image] = []
+                frame_of: List[int] = []
+                seen: Dict[Optional[int], int] = {}
+                for image, _ in queries:
+                    key = None if image is None else id(image)
+                    if key not in seen:
+                        seen[key] = len(frames)
+                        frames.append(self._batch_frame(image, timings))
+                    frame_of.append(seen[key])
+                
+                results: List[Optional[VisionData]] = [None] * len(queries)
+                keys: List[Optional[str]] = [None] * len(queries)
+                digests: List[Optional[str]] = [None] * len(frames)
+                if self.cache is not None:
+                    fingerprints = [self.cache.fingerprint(frame) for frame in frames]
+                    digests = [self.cache.digest(frame) for frame in frames]
+                    for i, (_, instruction) in enumerate(queries):
+                        frame = frames[frame_of[i]]
+                        keys[i] = self.cache.make_key(frame, instruction, self.model, fingerprints[frame_of[i]])
+                        results[i] = self.cache.get(keys[i], digests[frame_of[i]])
+                pending = [i for i, result in enumerate(results) if result is None]
+                
+                if pending:
+                    needed = sorted({frame_of[i] for i in pending})
+                    encoded = dict(zip(needed, (self._encode_owned(frames[f], timings) for f in needed)))
+                    if mode == "multipart":
+                        grounded = self._ground_multipart(
+                            [encoded[f] for f in needed],
+                            [(needed.index(frame_of[i]), queries[i][1]) for i in pending],
+                        )
+                    else:
+                        grounded = self._ground_concurrent([(encoded[frame_of[i]], queries[i][1]) for i in pending])
+                    for i, vision_data in zip(pending, grounded):
+                        results[i] = vision_data
+                        if keys[i] is not None:
+                            self.cache.put(keys[i], vision_data, digests[frame_of[i]])
+                
+                span.set_attributes(frames=len(frames), cached=len(queries) - len(pending))
+                self._record_timings(timings)
+                return results
+            except requests.RequestException as e:
+                raise RuntimeError(f"Grounding API 请求失败: {e}") from e
+    
+    def _batch_frame(self, image: Optional[Image.Image], timings: CaptureTimings) -> Image.Image:
+        if image is None:
+            return grab_screen(self.width, self.height, self.capture_options.resample, timings, self.frame_source)
+        if image.size != (self.width, self.height):
+            return image.resize((self.width, self.height), RESAMPLE_FILTERS[self.capture_options.resample])
+        return image
+    
+    def _ground_concurrent(self, items: List[Tuple[EncodedFrame, Optional[str]]]) -> List[VisionData]:
+        """
+        每条查询一个 /ground 请求，在线程池中并发发送（并发数为连接池大小）
+
+        各线程只返回自己的请求耗时，由调用线程在取回结果后汇总到 last_timings
+        """
+        if len(items) == 1:
+            return [self._ground(*items[0])]
+        if self._batch_pool is None:
+            self._batch_pool = ThreadPoolExecutor(
+                max_workers=self.transport.pool_size, thread_name_prefix="grounding-batch"
+            )
+        # 复制上下文，使各请求的 span 挂在当前 trace 下
+        futures = [
+            self._batch_pool.submit(contextvars.copy_context().run, self._ground_timed, frame, instruction)
+            for frame, instruction in items
+        ]
+        results = []
+        for (frame, _), future in zip(items, futures):
+            vision_data, request_ms = future.result()
+            self._record_request(request_ms, len(frame))
+            results.append(vision_data)
+        return results
+    
+    def _ground_multipart(
+        self,
+        frames: List[EncodedFrame],
+        queries: List[Tuple[int, Optional[str]]],
+    ) -> List[VisionData]:
+        """
+        一次 multipart 请求发送多帧和多条指令
+        
+        Args:
+            frames: 编码后的截图
+            queries: (截图序号, 指令) 列表
+        
+        Returns:
+            与 queries 一一对应的视觉数据
+        
+        Raises:
+            RuntimeError: 返回的结果数与查询数不一致
+            requests.RequestException: API 请求失败时抛出
+        """
+        files = [("image", (frame.filename, frame.data, frame.mime_type)) for frame in frames]
+        data = {
+            "model": self.model,
+            "width": str(self.width),
+            "height": str(self.height),
+            "queries": json.dumps([
+                {
+                    "image": index,
+                    "instruction": instruction or "Describe all UI elements with bounding boxes and text.",
+                }
+                for index, instruction in queries
+            ], ensure_ascii=False),
+        }
+        if frames[0].options.format == "raw":
+            data["encoding"] = "raw"
+            data["mode"] = frames[0].options.color_mode
+        upload_bytes = sum(len(frame) for frame in frames)
+        start = time.perf_counter()
+        with tracer.span("grounding.request", upload_bytes=upload_bytes, batch=len(queries)) as span:
+            resp = self._post(
+                self.batch_path,
                 files=files,
                 data=data,
                 headers=self.headers,
-                timeout=30
             )
+            span.set_attribute("status", resp.status_code)
             resp.raise_for_status()
-            return resp.json()
-        except requests.RequestException as e:
-            raise RuntimeError(f"Grounding API 请求失败: {e}") from e
+        self._record_request((time.perf_counter() - start) * 1000, upload_bytes)
+        with tracer.span("grounding.parse"):
+            results = loads_json(resp.content).get("results", [])
+        if len(results) != len(queries):
+            raise RuntimeError(f"批量 Grounding 返回 {len(results)} 个结果，请求了 {len(queries)} 个")
+        return results
+    
+    def reset_incremental(self) -> None:
+        """丢弃增量 Grounding 和元素跟踪的参考帧，下一次 perceive 将执行完整识别"""
+        self._last_frame = None
+        self._last_instruction = None
+        self._last_vision = None
+        if self.tracker is not None:
+            self.tracker.reset()
+            self._tracker_instruction = None
+    
+    def _capture(self, instruction: Optional[str]):
+        """
+        截图并查询缓存
+        
+        Returns:
+            (截图, 阶段耗时, (缓存键, 全分辨率摘要) 或 None, 命中的缓存结果或 None)
+        """
+        timings = CaptureTimings()
+        self.last_timings = {}
+        screen = grab_screen(self.width, self.height, self.capture_options.resample, timings, self.frame_source)
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = (self.cache.make_key(screen, instruction, self.model), self.cache.digest(screen))
+            cached = self.cache.get(*cache_key)
+            if cached is not None:
+                logger.debug("屏幕未变化，复用缓存的 Grounding 结果")
+                self._remember(screen, instruction, cached)
+                self._record_timings(timings)
+                return screen, timings, cache_key, cached
+        return screen, timings, cache_key, None
+    
+    def _finish(
+        self,
+        screen: Image.Image,
+        instruction: Optional[str],
+        cache_key: Optional[Tuple[str, str]],
+        vision_data: VisionData,
+        timings: CaptureTimings,
+        tracked: bool = False,
+    ) -> VisionData:
+        self._remember(screen, instruction, vision_data, tracked)
+        if cache_key is not None:
+            key, digest = cache_key
+            self.cache.put(key, vision_data, digest)
+        self._record_timings(timings)
+        return vision_data
+    
+    def _encode_owned(self, image: Image.Image, timings: CaptureTimings) -> EncodedFrame:
+        """编码并拷贝出独立的字节串（异步并发上传时不能共享编码器缓冲区）"""
+        frame = self.encoder.encode(image, timings)
+        frame.data = bytes(frame.data)
+        return frame
+    
+    def _encode_regions(self, screen: Image.Image, regions: List[Region], timings: CaptureTimings) -> List[EncodedFrame]:
+        return [self._encode_owned(screen.crop(region), timings) for region in regions]
+    
+    def _can_increment(self, screen: Image.Image, instruction: Optional[str]) -> bool:
+        return (
+            self.incremental
+            and self._last_frame is not None
+            and self._last_frame.size == screen.size
+            and instruction == self._last_instruction
+        )
+    
+    def _remember(
+        self,
+        screen: Image.Image,
+        instruction: Optional[str],
+        vision_data: VisionData,
+        tracked: bool = False,
+    ) -> None:
+        if self.incremental:
+            self._last_frame = screen
+            self._last_instruction = instruction
+            self._last_vision = {**vision_data, "elements": [dict(e) for e in vision_data.get("elements", [])]}
+        # 跟踪模板只取自模型识别的结果，跟踪得到的结果不更新模板
+        if self.tracker is not None and not tracked:
+            self.tracker.update(screen, vision_data)
+            self._tracker_instruction = instruction
+    
+    def _track(self, screen: Image.Image, instruction: Optional[str]) -> Optional[VisionData]:
+        """在本地重新定位上一次识别出的元素，失败或不适用时返回 None"""
+        if self.tracker is None or not self.tracker.ready or instruction != self._tracker_instruction:
+            return None
+        with tracer.span("grounding.track") as span:
+            result = self.tracker.track(screen)
+            span.set_attributes(
+                confidence=round(result.confidence, 4),
+                shift=f"{result.shift[0]},{result.shift[1]}",
+                tracked=result.vision_data is not None,
+            )
+        return result.vision_data
+    
+    def _record_timings(self, timings: CaptureTimings) -> None:
+        self.last_timings.update(
+            grab_ms=timings.grab_ms,
+            resize_ms=timings.resize_ms,
+            convert_ms=timings.convert_ms,
+            encode_ms=timings.encode_ms,
+        )
+    
+    def _count_full(self) -> None:
+        self.incremental_stats["full"] += 1
+        self.incremental_stats["pixels_sent"] += self.width * self.height
+    
+    def _plan_incremental(self, screen: Image.Image, instruction: Optional[str]) -> Optional[List[Region]]:
+        """
+        计算需要重新识别的变化区域
+        
+        Returns:
+            变化区域列表（空列表表示屏幕无变化）；
+            未启用增量模式、没有参考帧或变化面积过大时返回 None（执行完整识别）
+        """
+        if not self._can_increment(screen, instruction):
+            return None
+        regions = find_dirty_regions(
+            self._last_frame, screen, tile=self.diff_tile, threshold=self.diff_threshold
+        )
+        if not regions:
+            return []
+        
+        regions = expand_regions(regions, self._last_vision["elements"], screen.size)
+        area = region_area(regions)
+        if area > self.incremental_max_area * screen.size[0] * screen.size[1]:
+            logger.debug(f"变化面积占比 {area / (screen.size[0] * screen.size[1]):.0%}，回退到完整识别")
+            return None
+        return regions
+    
+    def _merge_incremental(
+        self,
+        regions: List[Region],
+        regional: List[Tuple[Region, List[UIElement]]],
+    ) -> VisionData:
+        """将各变化区域的识别结果合并到上一次的视觉数据"""
+        previous = self._last_vision
+        if not regions:
+            self.incremental_stats["unchanged"] += 1
+            logger.debug("屏幕无变化，复用上一次 Grounding 结果")
+            return {**previous, "elements": [dict(element) for element in previous["elements"]]}
+        
+        area = region_area(regions)
+        self.incremental_stats["incremental"] += 1
+        self.incremental_stats["regions"] += len(regions)
+        self.incremental_stats["pixels_sent"] += area
+        logger.debug(f"增量识别 {len(regions)} 个变化区域，共 {area} 像素")
+        return {**previous, "elements": merge_elements(previous["elements"], regional)}
+    
+    def _request_payload(
+        self,
+        frame: EncodedFrame,
+        instruction: Optional[str] = None,
+        offset: Optional[tuple] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """构造 /ground 请求的 multipart 文件和表单字段"""
+        files = {"image": (frame.filename, frame.data, frame.mime_type)}
+        data = {
+            "model": self.model,
+            "width": str(frame.size[0]),
+            "height": str(frame.size[1]),
+            "instruction": instruction or "Describe all UI elements with bounding boxes and text."
+        }
+        if frame.options.format == "raw":
+            data["encoding"] = "raw"
+            data["mode"] = frame.options.color_mode
+        if offset is not None:
+            data["offset_x"] = str(offset[0])
+            data["offset_y"] = str(offset[1])
+            data["screen_width"] = str(self.width)
+            data["screen_height"] = str(self.height)
+        return files, data
+    
+    def _record_request(self, request_ms: float, upload_bytes: int) -> None:
+        """累加请求耗时和上传字节数（只在调用 perceive 的线程中调用）"""
+        self.last_timings["request_ms"] = self.last_timings.get("request_ms", 0.0) + request_ms
+        self.last_timings["upload_bytes"] = self.last_timings.get("upload_bytes", 0) + upload_bytes
+    
+    def _ground(
+        self,
+        frame: EncodedFrame,
+        instruction: Optional[str] = None,
+        offset: Optional[tuple] = None,
+    ) -> VisionData:
+        """
+        将已编码的截图发送到 Grounding 模型
+        
+        Args:
+            frame: 编码后的截图（或裁剪区域）
+            instruction: 可选的用户指令
+            offset: 裁剪区域在全屏中的 (x, y) 偏移（增量模式下发送）
+        
+        Returns:
+            视觉数据（bbox 为所发送图像内的坐标）
+        
+        Raises:
+            requests.RequestException: API 请求失败时抛出
+        """
+        vision_data, request_ms = self._ground_timed(frame, instruction, offset)
+        self._record_request(request_ms, len(frame))
+        return vision_data
+    
+    def _ground_timed(
+        self,
+        frame: EncodedFrame,
+        instruction: Optional[str] = None,
+        offset: Optional[tuple] = None,
+    ) -> Tuple[VisionData, float]:
+        """
+        _ground 的实现，不修改共享状态（可在工作线程中调用）
+        
+        Returns:
+            (视觉数据, 请求耗时毫秒)
+        """
+        files, data = self._request_payload(frame, instruction, offset)
+        start = time.perf_counter()
+        with tracer.span("grounding.request", upload_bytes=len(frame)) as span:
+            resp = self._post(
+                "/ground",
+                files=files,
+                data=data,
+                headers=self.headers,
+            )
+            span.set_attribute("status", resp.status_code)
+            resp.raise_for_status()
+        request_ms = (time.perf_counter() - start) * 1000
+        with tracer.span("grounding.parse"):
+            return loads_json(resp.content), request_ms
+    
+    async def _aground(
+        self,
+        frame: EncodedFrame,
+        instruction: Optional[str] = None,
+        offset: Optional[tuple] = None,
+    ) -> VisionData:
+        """_ground 的异步版本"""
+        files, data = self._request_payload(frame, instruction, offset)
+        start = time.perf_counter()
+        with tracer.span("grounding.request", upload_bytes=len(frame)) as span:
+            resp = await self._apost(
+                "/ground",
+                files=files,
+                data=data,
+                headers=self.headers,
+            )
+            span.set_attribute("status", resp.status_code)
+            resp.raise_for_status()
+        self._record_request((time.perf_counter() - start) * 1000, len(frame))
+        with tracer.span("grounding.parse"):
+            return loads_json(resp.content)
+    
+    @staticmethod
+    def _parse_urls(url: Union[str, Sequence[str]]) -> List[str]:
+        urls = url.split(",") if isinstance(url, str) else list(url)
+        urls = [u.strip().rstrip("/") for u in urls if u and u.strip()]
+        if not urls:
+            raise ValueError("未配置 Grounding 地址")
+        return urls
+    
+    def _post(self, path: str, **kwargs: Any) -> requests.Response:
+        """发送到单个地址，或经 balancer 在多个副本之间选择"""
+        if self.balancer is not None:
+            return self.balancer.post(self.transport, path, **kwargs)
+        return self.transport.post(f"{self.url}{path}", **kwargs)
+    
+    async def _apost(self, path: str, **kwargs: Any) -> "httpx.Response":
+        if self.balancer is not None:
+            return await self.balancer.apost(self.transport, path, **kwargs)
+        return await self.transport.apost(f"{self.url}{path}", **kwargs)
+    
+    def transport_stats(self) -> Dict[str, Any]:
+        """返回 HTTP 传输层的请求、重试和连接复用统计"""
+        return self.transport.stats()
+    
+    def tracker_stats(self) -> Dict[str, float]:
+        """返回元素跟踪的统计（见 ElementTracker.stats），未启用时返回空字典"""
+        return self.tracker.stats() if self.tracker is not None else {}
+    
+    def endpoint_stats(self) -> List[Dict[str, Any]]:
+        """
+        返回每个 Grounding 副本的统计（见 EndpointBalancer.stats）
+        
+        只有一个地址时返回空列表
+        """
+        return self.balancer.stats() if self.balancer is not None else []
+    
+    def close(self) -> None:
+        """关闭 HTTP 连接池、批量请求线程池、负载均衡线程池和按 config 创建的截图后端"""
+        self._close_resources()
+        self.transport.close()
+    
+    async def aclose(self) -> None:
+        """close 的异步版本（同时关闭异步 HTTP 客户端）"""
+        await self.transport.aclose()
+        self._close_resources()
+    
+    def _close_resources(self) -> None:
+        """关闭传输层以外的资源：截图后端（连续截图线程）、批量请求线程池和负载均衡线程池"""
+        if self._owns_frame_source:
+            self._owns_frame_source = False
+            self.frame_source.close()
+        if self._batch_pool is not None:
+            self._batch_pool.shutdown(wait=False)
+            self._batch_pool = None
+        if self.balancer is not None:
+            self.balancer.close()
     
     @staticmethod
     def build_element_map(vision_data: VisionData) -> ElementMap:
@@ -96,6 +739,6 @@ class VisionGrounder:
             vision_data: 视觉感知数据
         
         Returns:
-            element_id -> bbox 的映射字典
+            元素空间索引（兼容 element_id -> bbox 的只读字典）
         """
-        return {element["id"]: tuple(element["bbox"]) for element in vision_data["elements"]}
\ No newline at end of file
+        return ElementIndex(vision_data["elements"])
\ No newline at end of file
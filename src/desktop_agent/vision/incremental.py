@@ -0,0 +1,279 @@
+# src/desktop_agent/vision/incremental.py
+"""
+增量 Grounding：对比前后两帧找出变化区域，只对变化区域重新识别并合并元素
+"""
+from typing import Any, List, Optional, Sequence, Tuple
+import numpy as np
+from PIL import Image, ImageChops
+from .index import ElementIndex
+from ..types import UIElement, normalize_id
+
+# (x1, y1, x2, y2)，右下角不含
+Region = Tuple[int, int, int, int]
+
+
+def find_dirty_regions(
+    previous: Image.Image,
+    current: Image.Image,
+    tile: int = 32,
+    threshold: int = 16,
+    padding: int = 8,
+    min_pixels: int = 1,
+) -> List[Region]:
+    """
+    对比两帧，返回发生变化的矩形区域
+
+    先按像素差阈值生成变化掩码，再按 tile 网格统计每个 tile 的变化像素数，
+    变化像素数不少于 min_pixels 的 tile 为脏 tile（默认 1，任何一个像素变化都不会被忽略，
+    如输入的一个句点），相邻的脏 tile 合并为一个矩形（4 邻接连通域），最后外扩 padding 并合并重叠矩形。
+
+    Args:
+        previous: 上一次 Grounding 的截图
+        current: 当前截图（尺寸需与 previous 相同）
+        tile: 网格大小（像素）
+        threshold: 灰度差阈值（0~255）
+        padding: 每个区域向外扩展的像素数
+        min_pixels: tile 内至少有多少个变化像素才算脏 tile（大于 1 时可忽略零星噪点）
+
+    Returns:
+        变化区域列表，无变化时返回空列表
+
+    Raises:
+        ValueError: 两帧尺寸不一致
+    """
+    if previous.size != current.size:
+        raise ValueError(f"帧尺寸不一致: {previous.size} != {current.size}")
+
+    width, height = current.size
+    diff = ImageChops.difference(previous.convert("L"), current.convert("L"))
+    mask = diff.point([1 if p > threshold else 0 for p in range(256)])
+    if mask.getbbox() is None:
+        return []
+
+    regions = [
+        (max(0, x1 - padding), max(0, y1 - padding), min(width, x2 + padding), min(height, y2 + padding))
+        for x1, y1, x2, y2 in changed_regions(np.asarray(mask, dtype=np.uint8), tile, min_pixels)
+    ]
+    return merge_regions(regions)
+
+
+def changed_regions(mask: np.ndarray, tile: int = 32, min_pixels: int = 1) -> List[Region]:
+    """
+    把变化掩码按 tile 网格划分，返回相邻脏 tile（4 邻接连通域）各自的外接矩形
+
+    Args:
+        mask: (高, 宽) 的变化掩码（非零为变化像素）
+        tile: 网格大小（像素）
+        min_pixels: tile 内至少有多少个变化像素才算脏 tile
+
+    Returns:
+        连通域外接矩形列表（对齐到 tile，裁剪到掩码范围内，不合并重叠）
+    """
+    height, width = mask.shape
+    cols = (width + tile - 1) // tile
+    rows = (height + tile - 1) // tile
+    # 按 tile 求和（而不是 BOX 缩放求均值：均值会把只有一两个变化像素的 tile 舍入为 0）
+    changed = np.zeros((rows * tile, cols * tile), dtype=np.int32)
+    changed[:height, :width] = mask != 0
+    counts = changed.reshape(rows, tile, cols, tile).sum(axis=(1, 3))
+    grid = (counts >= max(1, min_pixels)).ravel().tolist()
+
+    seen = bytearray(cols * rows)
+    regions: List[Region] = []
+    for start in range(cols * rows):
+        if not grid[start] or seen[start]:
+            continue
+        # 连通域 BFS
+        seen[start] = 1
+        stack = [start]
+        min_c, min_r, max_c, max_r = cols, rows, -1, -1
+        while stack:
+            idx = stack.pop()
+            r, c = divmod(idx, cols)
+            min_c, max_c = min(min_c, c), max(max_c, c)
+            min_r, max_r = min(min_r, r), max(max_r, r)
+            for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if 0 <= nr < rows and 0 <= nc < cols:
+                    nidx = nr * cols + nc
+                    if grid[nidx] and not seen[nidx]:
+                        seen[nidx] = 1
+                        stack.append(nidx)
+        regions.append((
+            min_c * tile,
+            min_r * tile,
+            min(width, (max_c + 1) * tile),
+            min(height, (max_r + 1) * tile),
+        ))
+    return regions
+
+
+def merge_regions(regions: Sequence[Region]) -> List[Region]:
+    """
+    合并相互重叠的矩形，直到没有重叠
+
+    Args:
+        regions: 矩形列表
+
+    Returns:
+        互不重叠的矩形列表
+    """
+    merged = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        result: List[Region] = []
+        for region in merged:
+            for i, other in enumerate(result):
+                if _intersects(region, other):
+                    result[i] = _union(region, other)
+                    changed = True
+                    break
+            else:
+                result.append(region)
+        merged = result
+    return merged
+
+
+def expand_regions(
+    regions: Sequence[Region],
+    elements: Sequence[UIElement],
+    size: Tuple[int, int],
+) -> List[Region]:
+    """
+    将区域扩展到完整覆盖与之相交的旧元素，保证重新识别时这些元素不会被裁切
+
+    Args:
+        regions: 变化区域
+        elements: 上一次的元素列表
+        size: 屏幕 (宽, 高)
+
+    Returns:
+        扩展并合并后的区域列表
+    """
+    width, height = size
+    expanded = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        for i, region in enumerate(expanded):
+            for element in elements:
+                bbox = _bbox(element)
+                if not _intersects(region, bbox):
+                    continue
+                x1, y1, x2, y2 = _union(region, bbox)
+                grown = (max(0, x1), max(0, y1), min(width, x2), min(height, y2))
+                if grown != region:
+                    region = grown
+                    changed = True
+            expanded[i] = region
+        if changed:
+            expanded = merge_regions(expanded)
+    return expanded
+
+
+def merge_elements(
+    previous: Sequence[UIElement],
+    regional: Sequence[Tuple[Region, Sequence[UIElement]]],
+    iou_threshold: float = 0.5,
+) -> List[UIElement]:
+    """
+    将区域识别结果合并到上一次的元素列表
+
+    - 与变化区域相交的旧元素视为过期并丢弃
+    - 区域内的新元素 bbox 从裁剪坐标映射回全屏坐标
+    - 与被丢弃元素类型一致且 IoU 足够高的新元素沿用旧 id（如文本框内容更新），其余分配新 id
+      （整数，从旧元素中最大的整数 id 往后编号；"btn_ok" 这类非数字 id 不参与编号）
+
+    Args:
+        previous: 上一次的元素列表（全屏坐标）
+        regional: [(区域, 该区域裁剪图上识别出的元素)]
+        iou_threshold: 沿用旧 id 所需的最小 IoU
+
+    Returns:
+        按 id 排序的合并后元素列表（整数 id 在前，其余按字符串排序）
+    """
+    regions = [region for region, _ in regional]
+    kept: List[UIElement] = []
+    stale: List[UIElement] = []
+    for element in previous:
+        if any(_intersects(region, _bbox(element)) for region in regions):
+            stale.append(element)
+        else:
+            kept.append(element)
+
+    stale_index = ElementIndex(stale)
+    used_ids = {element["id"] for element in kept}
+    next_id = max(
+        (key for key in (normalize_id(element["id"]) for element in previous) if isinstance(key, int)),
+        default=0,
+    ) + 1
+    merged = list(kept)
+    for (ox, oy, rx2, ry2), elements in regional:
+        for element in elements:
+            x1, y1, x2, y2 = _bbox(element)
+            bbox = [
+                min(rx2, max(ox, x1 + ox)),
+                min(ry2, max(oy, y1 + oy)),
+                min(rx2, max(ox, x2 + ox)),
+                min(ry2, max(oy, y2 + oy)),
+            ]
+            new_element = dict(element)
+            new_element["bbox"] = bbox
+
+            match = _match_stale(new_element, stale_index, used_ids, iou_threshold)
+            if match is not None:
+                new_element["id"] = match
+            else:
+                new_element["id"] = next_id
+                next_id += 1
+            used_ids.add(new_element["id"])
+            merged.append(new_element)
+
+    merged.sort(key=lambda element: _id_order(element["id"]))
+    return merged
+
+
+def _id_order(element_id: Any) -> Tuple[int, Any]:
+    """排序键：整数 id 按数值排在前面，其余 id 按字符串排在后面（避免混合类型无法比较）"""
+    key = normalize_id(element_id)
+    return (0, key) if isinstance(key, int) else (1, str(element_id))
+
+
+def _match_stale(
+    element: UIElement,
+    stale: ElementIndex,
+    used_ids: set,
+    iou_threshold: float,
+) -> Optional[int]:
+    """在过期元素中找与新元素对应的那个（类型相同、IoU 最高，文本相同者优先），返回其 id"""
+    best_id, best_score = None, None
+    if not len(stale.elements):
+        return None
+    ious = stale.iou(_bbox(element))
+    for row in np.flatnonzero(ious >= iou_threshold):
+        old = stale.elements[row]
+        if old["id"] in used_ids or old.get("type") != element.get("type"):
+            continue
+        iou = float(ious[row])
+        score = (old.get("text") == element.get("text"), iou)
+        if best_score is None or score > best_score:
+            best_id, best_score = old["id"], score
+    return best_id
+
+def _bbox(element: UIElement) -> Region:
+    x1, y1, x2, y2 = element["bbox"]
+    return int(x1), int(y1), int(x2), int(y2)
+
+
+def _intersects(a: Region, b: Region) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(a: Region, b: Region) -> Region:
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def region_area(regions: Sequence[Region]) -> int:
+    """区域总面积（区域互不重叠时准确）"""
+    return sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+
@@ -0,0 +1,239 @@
+# src/desktop_agent/vision/index.py
+"""
+UI 元素空间索引：bbox 存放在 NumPy 数组中，支持命中测试、最近邻、重叠/IoU 和文本查询
+"""
+import re
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from ..types import UIElement, VisionData, normalize_id
+
+BBox = Tuple[float, float, float, float]
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_text(text: object) -> str:
+    return _SPACE_RE.sub(" ", str(text).strip()).lower()
+
+class ElementIndex(Mapping):
+    """
+    UI 元素空间索引
+
+    行为上等同于 {element_id: (x1, y1, x2, y2)} 的只读字典，可直接传给 Executor：
+    id 保持原样（整数或字符串），bbox 按原始值返回（浮点坐标不截断），
+    查找时 id 经 normalize_id 规范化，因此 "3" 也能找到元素 3。额外提供空间查询：
+
+    - 点查询（hit_test / element_at）通过均匀网格只检查少量候选元素
+    - 批量点查询、最近邻、区域重叠和 IoU 查询对整个 bbox 数组做向量化计算
+    - 文本查询使用规范化文本（小写、合并空白）到 id 的倒排表
+
+    查询结果中的多个元素按面积从小到大排列（同一位置上更具体的元素在前）。
+    """
+
+    def __init__(self, elements: Sequence[UIElement], cell_size: int = 128):
+        """
+        Args:
+            elements: UI 元素列表
+            cell_size: 网格单元边长（像素）
+        """
+        self.elements: List[UIElement] = list(elements)
+        self.cell_size = max(1, int(cell_size))
+        n = len(self.elements)
+
+        # 原始 id（可能是字符串），按行对齐
+        self.ids: List[Any] = [element["id"] for element in self.elements]
+        boxes = np.array([element["bbox"] for element in self.elements], dtype=np.float64).reshape(n, 4)
+        self.boxes = boxes
+        self.areas = np.maximum(0, boxes[:, 2] - boxes[:, 0]) * np.maximum(0, boxes[:, 3] - boxes[:, 1])
+        self.centers = np.floor(np.stack(
+            [(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1
+        )).astype(np.int64)
+
+        # 规范化 id -> 行号（重复 id 时以最后一个为准，与 dict 构造行为一致）
+        self._rows: Dict[Any, int] = {normalize_id(element_id): row for row, element_id in enumerate(self.ids)}
+
+        self._text: Dict[str, List[int]] = {}
+        for element in self.elements:
+            text = _normalize_text(element.get("text", ""))
+            if text:
+                self._text.setdefault(text, []).append(element["id"])
+
+        self._grid = self._build_grid()
+
+    @classmethod
+    def from_vision_data(cls, vision_data: VisionData, cell_size: int = 128) -> "ElementIndex":
+        return cls(vision_data.get("elements", []), cell_size=cell_size)
+
+    # ---- Mapping 接口（与 build_element_map 的旧返回值兼容）----
+
+    def __getitem__(self, element_id) -> BBox:
+        x1, y1, x2, y2 = self.elements[self._row(element_id)]["bbox"]
+        return x1, y1, x2, y2
+
+    def __contains__(self, element_id) -> bool:
+        try:
+            return normalize_id(element_id) in self._rows
+        except TypeError:
+            return False
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self.ids[row] for row in self._rows.values())
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __repr__(self) -> str:
+        return f"ElementIndex({len(self)} elements)"
+
+    def _row(self, element_id) -> int:
+        try:
+            return self._rows[normalize_id(element_id)]
+        except TypeError:
+            raise KeyError(element_id) from None
+
+    def element(self, element_id) -> UIElement:
+        """返回 id 对应的原始元素"""
+        return self.elements[self._row(element_id)]
+
+    def center(self, element_id) -> Tuple[int, int]:
+        """返回 id 对应元素的中心点"""
+        x, y = self.centers[self._row(element_id)].tolist()
+        return x, y
+
+    # ---- 空间查询 ----
+
+    def hit_test(self, x: float, y: float) -> List[Any]:
+        """
+        返回包含点 (x, y) 的所有元素 id（面积从小到大）
+
+        Args:
+            x: 横坐标
+            y: 纵坐标
+
+        Returns:
+            元素 id 列表
+        """
+        cell = (max(0, int(x)) // self.cell_size, max(0, int(y)) // self.cell_size)
+        candidates = self._grid.get(cell)
+        if candidates is None:
+            return []
+        boxes = self.boxes[candidates]
+        inside = (boxes[:, 0] <= x) & (x <= boxes[:, 2]) & (boxes[:, 1] <= y) & (y <= boxes[:, 3])
+        return self._ordered(candidates[inside])
+
+    def element_at(self, x: float, y: float) -> Optional[Any]:
+        """返回点 (x, y) 处最具体（面积最小）的元素 id，没有时返回 None"""
+        hits = self.hit_test(x, y)
+        return hits[0] if hits else None
+
+    def hit_test_many(self, points) -> np.ndarray:
+        """
+        批量命中测试
+
+        Args:
+            points: 形如 (m, 2) 的坐标数组
+
+        Returns:
+            长度为 m 的数组，每个点处面积最小的元素 id，无命中为 -1
+            （id 全为整数时 dtype 为 int64，否则为 object）
+        """
+        points = np.asarray(points).reshape(-1, 2)
+        integer_ids = all(isinstance(element_id, (int, np.integer)) for element_id in self.ids)
+        result = np.full(len(points), -1, dtype=np.int64 if integer_ids else object)
+        if not len(self.ids) or not len(points):
+            return result
+        px = points[:, 0:1]
+        py = points[:, 1:2]
+        b = self.boxes
+        inside = (b[:, 0] <= px) & (px <= b[:, 2]) & (b[:, 1] <= py) & (py <= b[:, 3])
+        areas = np.where(inside, self.areas, np.inf)
+        best = areas.argmin(axis=1)
+        hit = inside[np.arange(len(points)), best]
+        result[hit] = [self.ids[row] for row in best[hit]]
+        return result
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List[Any]:
+        """
+        返回离点 (x, y) 最近的 k 个元素 id（距离为点到 bbox 的距离，点在框内时为 0）
+
+        Args:
+            x: 横坐标
+            y: 纵坐标
+            k: 返回数量
+
+        Returns:
+            按距离升序（相同时面积小者优先）的元素 id 列表
+        """
+        if not len(self.ids) or k <= 0:
+            return []
+        b = self.boxes
+        dx = np.maximum(np.maximum(b[:, 0] - x, x - b[:, 2]), 0)
+        dy = np.maximum(np.maximum(b[:, 1] - y, y - b[:, 3]), 0)
+        dist = dx * dx + dy * dy
+        k = min(k, len(dist))
+        rows = np.argpartition(dist, k - 1)[:k] if k < len(dist) else np.arange(len(dist))
+        rows = rows[np.lexsort((self.areas[rows], dist[rows]))]
+        return [self.ids[row] for row in rows]
+
+    def overlapping(self, bbox: Sequence[float]) -> List[Any]:
+        """返回与区域 bbox 相交（面积大于 0）的元素 id（面积从小到大）"""
+        x1, y1, x2, y2 = bbox
+        b = self.boxes
+        mask = (b[:, 0] < x2) & (x1 < b[:, 2]) & (b[:, 1] < y2) & (y1 < b[:, 3])
+        return self._ordered(np.flatnonzero(mask))
+
+    def iou(self, bbox: Sequence[float]) -> np.ndarray:
+        """
+        计算区域 bbox 与所有元素的 IoU
+
+        Returns:
+            与 ids 对齐的 IoU 数组
+        """
+        x1, y1, x2, y2 = bbox
+        b = self.boxes
+        ix = np.maximum(0, np.minimum(b[:, 2], x2) - np.maximum(b[:, 0], x1))
+        iy = np.maximum(0, np.minimum(b[:, 3], y2) - np.maximum(b[:, 1], y1))
+        inter = ix * iy
+        union = self.areas + max(0, x2 - x1) * max(0, y2 - y1) - inter
+        return np.divide(inter, union, out=np.zeros(len(b), dtype=np.float64), where=union > 0)
+
+    def best_match(self, bbox: Sequence[float], min_iou: float = 0.5) -> Optional[Any]:
+        """返回与区域 bbox IoU 最高且不低于 min_iou 的元素 id"""
+        if not len(self.ids):
+            return None
+        ious = self.iou(bbox)
+        row = int(ious.argmax())
+        return self.ids[row] if ious[row] >= min_iou else None
+
+    def find_text(self, text: str, exact: bool = True) -> List[Any]:
+        """
+        按文本查找元素 id（忽略大小写和多余空白）
+
+        Args:
+            text: 要查找的文本
+            exact: True 时完全匹配，False 时子串匹配
+
+        Returns:
+            元素 id 列表
+        """
+        query = _normalize_text(text)
+        if exact:
+            return list(self._text.get(query, []))
+        return [element_id for key, ids in self._text.items() if query in key for element_id in ids]
+
+    def _ordered(self, rows: np.ndarray) -> List[Any]:
+        rows = rows[np.argsort(self.areas[rows], kind="stable")]
+        return [self.ids[row] for row in rows]
+
+    def _build_grid(self) -> Dict[Tuple[int, int], np.ndarray]:
+        """把每个元素登记到它覆盖的所有网格单元"""
+        if not len(self.ids):
+            return {}
+        cells = (np.maximum(self.boxes, 0) // self.cell_size).astype(np.int64)
+        grid: Dict[Tuple[int, int], List[int]] = {}
+        for row, (cx1, cy1, cx2, cy2) in enumerate(cells.tolist()):
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    grid.setdefault((cx, cy), []).append(row)
+        return {cell: np.array(rows, dtype=np.int64) for cell, rows in grid.items()}
@@ -0,0 +1,124 @@
+# src/desktop_agent/vision/settle.py
+"""
+屏幕稳定检测：动作执行后轮询低分辨率灰度帧，画面连续若干帧不再变化即认为界面已稳定
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+from PIL import Image, ImageChops
+from .capture import grab_screen
+from .continuous import ContinuousCapture
+
+
+@dataclass
+class SettleResult:
+    """一次稳定等待的结果"""
+    # 是否在超时前稳定
+    settled: bool
+    # 采样的帧数
+    frames: int
+    # 总等待时间（毫秒）
+    elapsed_ms: float
+
+
+class SettleDetector:
+    """
+    自适应的屏幕稳定检测，用来替代动作之间的固定 sleep
+
+    每隔 interval 抓取一帧缩小后的灰度图，与上一帧逐像素比较；
+    变化像素占比不超过 tolerance 的帧计为“稳定”，连续 stable_frames 帧稳定即返回。
+    使用连续截图时不再自己抓屏，而是读取环形缓冲区中比上一次采样更新的帧。
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        stable_frames: int = 3,
+        timeout: float = 5.0,
+        min_wait: float = 0.1,
+        size: Tuple[int, int] = (160, 90),
+        pixel_threshold: int = 8,
+        tolerance: float = 0.001,
+        grab: Optional[Callable[[], Image.Image]] = None,
+        capture: Optional[ContinuousCapture] = None,
+    ):
+        """
+        Args:
+            interval: 采样间隔（秒）
+            stable_frames: 需要连续稳定的帧数
+            timeout: 最长等待时间（秒），超时后直接返回
+            min_wait: 开始采样前的最短等待（秒），给界面开始响应留出时间
+            size: 采样帧的分辨率
+            pixel_threshold: 灰度差超过该值的像素视为变化
+            tolerance: 允许变化的像素占比（吸收光标闪烁等微小变化）
+            grab: 自定义取帧函数（默认截取主屏幕）
+            capture: 连续截图（优先于 grab；每次采样等待一帧新的画面，采样间隔不短于其帧间隔）
+        """
+        self.interval = interval
+        self.stable_frames = max(1, stable_frames)
+        self.timeout = timeout
+        self.min_wait = min_wait
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.tolerance = tolerance
+        self.grab = grab
+        self.capture = capture
+        self._seq = 0
+        self._lut = [0] * (pixel_threshold + 1) + [255] * (255 - pixel_threshold)
+
+    @classmethod
+    def from_config(cls, config, capture: Optional[ContinuousCapture] = None) -> "SettleDetector":
+        return cls(
+            interval=config.settle_interval,
+            stable_frames=config.settle_frames,
+            timeout=config.settle_timeout,
+            min_wait=config.settle_min_wait,
+            capture=capture,
+        )
+
+    def sample(self) -> Image.Image:
+        """抓取一帧低分辨率灰度图"""
+        if self.capture is not None:
+            captured = self.capture.frame(newer_than=self._seq, timeout=max(1.0, self.timeout))
+            self._seq = captured.seq
+            frame = captured.image.resize(self.size, Image.BOX)
+        elif self.grab is not None:
+            frame = self.grab()
+            if frame.size != self.size:
+                frame = frame.resize(self.size, Image.BOX)
+        else:
+            frame = grab_screen(self.size[0], self.size[1], resample="box")
+        return frame.convert("L")
+
+    def changed(self, previous: Image.Image, current: Image.Image) -> bool:
+        """两帧之间是否有明显变化"""
+        mask = ImageChops.difference(previous, current).point(self._lut)
+        changed = mask.histogram()[255]
+        return changed > self.tolerance * self.size[0] * self.size[1]
+
+    def wait(self) -> SettleResult:
+        """
+        等待屏幕稳定
+
+        Returns:
+            稳定等待的结果（超时时 settled 为 False）
+        """
+        start = time.perf_counter()
+        if self.capture is not None:
+            # 只采样动作之后开始抓取的帧（正在抓取的那一帧可能早于动作完成）
+            self._seq = self.capture.seq + 1
+        if self.min_wait > 0:
+            time.sleep(self.min_wait)
+        deadline = start + self.timeout
+        previous = self.sample()
+        frames, stable = 1, 0
+        while True:
+            if time.perf_counter() >= deadline:
+                return SettleResult(False, frames, (time.perf_counter() - start) * 1000)
+            time.sleep(self.interval)
+            current = self.sample()
+            frames += 1
+            stable = 0 if self.changed(previous, current) else stable + 1
+            previous = current
+            if stable >= self.stable_frames:
+                return SettleResult(True, frames, (time.perf_counter() - start) * 1000)
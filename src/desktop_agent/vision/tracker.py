@@ -0,0 +1,395 @@
+# src/desktop_agent/vision/tracker.py
+"""
+本地元素跟踪：窗口滚动或移动几个像素后，在新帧中重新定位上一次 Grounding 识别出的元素，
+不必再调用模型
+
+每个元素保存一块来自 Grounding 时截图的模板（bbox 中心区域，灰度），在新帧中以上一次位置为中心的
+搜索窗口内做归一化互相关（NCC，NumPy 向量化），按最佳匹配的位移平移 bbox。
+任何可跟踪元素的匹配分数低于阈值，或位移补偿后仍有未解释的变化时——总面积占比过大（新内容），
+或任何一块连通的变化区域超过面积上限（下拉菜单、提示框、通知等局部弹出的内容）——
+跟踪失败，由调用方回退到完整 Grounding。
+"""
+import logging
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from PIL import Image
+from .incremental import changed_regions
+from ..types import VisionData
+
+logger = logging.getLogger(__name__)
+
+# 统计未解释变化连通域时的网格大小（帧像素）
+_REGION_TILE = 16
+
+
+class Template(NamedTuple):
+    """一个元素的模板"""
+    # 灰度像素（float32）
+    pixels: np.ndarray
+    # 模板左上角相对 bbox 左上角的偏移（帧像素）
+    offset: Tuple[int, int]
+    # 纯色区域或与邻近位置相似（如只含一条长边框）的模板无法可靠定位，跟随其他元素的整体位移
+    trackable: bool
+
+
+class TrackResult(NamedTuple):
+    """一次跟踪的结果"""
+    # 更新了 bbox 的视觉数据，跟踪失败时为 None
+    vision_data: Optional[VisionData]
+    # 可跟踪元素中最低的匹配分数（0~1）
+    confidence: float
+    # 整体（中位数）位移（帧像素）
+    shift: Tuple[int, int]
+    # 位移补偿后未被元素解释的变化像素占比
+    change: float
+    # 最大一块未解释变化连通域的外接矩形面积（帧像素，按 16 像素网格统计）
+    region: int = 0
+
+
+def ncc_map(search: np.ndarray, template: np.ndarray) -> np.ndarray:
+    """
+    模板在搜索区域内每个位置的归一化互相关分数
+
+    分子对所有候选位置一次性计算（FFT 互相关，比逐位置的滑动窗口内积快一个数量级），
+    窗口的均值和能量由积分图得到。
+
+    Args:
+        search: 搜索区域灰度像素（float32，H×W）
+        template: 模板灰度像素（float32，h×w，h≤H，w≤W）
+
+    Returns:
+        (H-h+1)×(W-w+1) 的分数矩阵（-1~1，纯色窗口为 0），[y, x] 对应模板左上角位于 (x, y)
+    """
+    h, w = template.shape
+    t = template - template.mean()
+    t_norm = float(np.sqrt((t * t).sum()))
+    rows, cols = search.shape[0] - h + 1, search.shape[1] - w + 1
+    # 窗口均值与零均值模板的内积为 0，分子不需要对窗口去均值；
+    # 只取不发生循环卷绕的前 rows×cols 个位置
+    spectrum = np.fft.rfft2(search) * np.conj(np.fft.rfft2(t, search.shape))
+    numerator = np.fft.irfft2(spectrum, search.shape)[:rows, :cols]
+
+    n = h * w
+    sums = _box_sums(search.astype(np.float64), h, w)
+    squares = _box_sums(np.square(search, dtype=np.float64), h, w)
+    energy = np.maximum(squares - sums * sums / n, 0.0)
+    denominator = np.sqrt(energy) * t_norm
+    return np.where(denominator > 1e-6, numerator / np.maximum(denominator, 1e-6), 0.0)
+
+
+def match_template(search: np.ndarray, template: np.ndarray) -> Tuple[int, int, float]:
+    """
+    在搜索区域中查找与模板最相似的位置
+
+    Returns:
+        (x, y, score)：最佳匹配位置（模板左上角在搜索区域中的坐标）和 NCC 分数
+    """
+    scores = ncc_map(search, template)
+    y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+    return int(x), int(y), float(scores[y, x])
+
+
+def _box_sums(values: np.ndarray, h: int, w: int) -> np.ndarray:
+    """每个 h×w 窗口内的像素和（积分图）"""
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(values, axis=0), axis=1, out=integral[1:, 1:])
+    return integral[h:, w:] - integral[:-h, w:] - integral[h:, :-w] + integral[:-h, :-w]
+
+
+def _gray(image: Image.Image) -> np.ndarray:
+    return np.asarray(image.convert("L"), dtype=np.float32)
+
+
+class ElementTracker:
+    """
+    元素跟踪器
+
+    update 在每次 Grounding 之后保存参考帧和元素模板；track 在新帧中重新定位这些元素，
+    成功时返回 bbox 已平移的视觉数据，失败时返回 None（调用方执行完整 Grounding 并再次 update）。
+    连续跟踪时搜索窗口以上一次跟踪到的位置为中心，模板始终来自最近一次 Grounding。
+    """
+
+    def __init__(
+        self,
+        search_radius: int = 32,
+        patch_size: int = 32,
+        min_confidence: float = 0.9,
+        max_change: float = 0.02,
+        diff_threshold: int = 16,
+        min_std: float = 2.0,
+        max_region: int = 4096,
+    ):
+        """
+        Args:
+            search_radius: 每个方向的最大位移（帧像素）
+            patch_size: 模板的最大边长（取 bbox 中心区域，帧像素）
+            min_confidence: 每个可跟踪元素所需的最低 NCC 分数
+            max_change: 位移补偿后允许的未解释变化像素占比（超过时视为出现了新内容）
+            diff_threshold: 判定像素变化的灰度差阈值（0~255）
+            min_std: 模板灰度标准差低于该值时视为纯色区域，不单独定位
+            max_region: 单块未解释变化区域允许的最大面积（帧像素；即使总占比不超过 max_change，
+                        出现一块 200×200 的下拉菜单也说明有新元素需要识别）
+        """
+        self.search_radius = search_radius
+        self.patch_size = patch_size
+        self.min_confidence = min_confidence
+        self.max_change = max_change
+        self.diff_threshold = diff_threshold
+        self.min_std = min_std
+        self.max_region = max_region
+        self._frame: Optional[np.ndarray] = None
+        self._vision: Optional[VisionData] = None
+        self._templates: Dict[Any, Template] = {}
+        self._scale = (1.0, 1.0)
+        self.tracked = 0
+        self.fallbacks = 0
+        self.track_ms = 0.0
+        self.last_confidence = 0.0
+
+    @classmethod
+    def from_config(cls, config) -> "ElementTracker":
+        return cls(
+            search_radius=config.grounding_tracking_radius,
+            patch_size=config.grounding_tracking_patch,
+            min_confidence=config.grounding_tracking_min_score,
+            max_change=config.grounding_tracking_max_change,
+            max_region=config.grounding_tracking_max_region,
+            diff_threshold=config.grounding_diff_threshold,
+        )
+
+    @property
+    def ready(self) -> bool:
+        """是否已有参考帧"""
+        return self._frame is not None
+
+    def update(self, screen: Image.Image, vision_data: VisionData) -> None:
+        """
+        以一次 Grounding 的结果作为新的参考
+
+        Args:
+            screen: Grounding 使用的截图
+            vision_data: 该截图的视觉数据
+        """
+        frame = _gray(screen)
+        self._scale = self._scale_for(frame, vision_data)
+        self._templates = {}
+        for element in vision_data.get("elements", []):
+            template = self._cut_template(frame, element["bbox"])
+            if template is not None:
+                self._templates[element["id"]] = template
+        self._frame = frame
+        self._vision = {**vision_data, "elements": [dict(element) for element in vision_data.get("elements", [])]}
+
+    def reset(self) -> None:
+        """丢弃参考帧和模板"""
+        self._frame = None
+        self._vision = None
+        self._templates = {}
+
+    def track(self, screen: Image.Image) -> TrackResult:
+        """
+        在新帧中重新定位元素
+
+        Args:
+            screen: 当前截图（尺寸需与参考帧相同）
+
+        Returns:
+            跟踪结果；vision_data 为 None 表示需要完整 Grounding
+        """
+        if self._frame is None:
+            return TrackResult(None, 0.0, (0, 0), 0.0)
+        start = time.perf_counter()
+        try:
+            result = self._track(_gray(screen))
+        finally:
+            self.track_ms += (time.perf_counter() - start) * 1000
+        self.last_confidence = result.confidence
+        if result.vision_data is None:
+            self.fallbacks += 1
+        else:
+            self.tracked += 1
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        """返回跟踪成功/回退次数、成功率、平均耗时和最近一次的置信度"""
+        total = self.tracked + self.fallbacks
+        return {
+            "tracked": self.tracked,
+            "fallbacks": self.fallbacks,
+            "hit_rate": self.tracked / total if total else 0.0,
+            "mean_ms": round(self.track_ms / total, 3) if total else 0.0,
+            "last_confidence": round(self.last_confidence, 4),
+        }
+
+    def _track(self, frame: np.ndarray) -> TrackResult:
+        if frame.shape != self._frame.shape:
+            logger.debug("帧尺寸变化，无法跟踪")
+            return TrackResult(None, 0.0, (0, 0), 0.0)
+
+        sx, sy = self._scale
+        shifts: Dict[Any, Tuple[int, int]] = {}
+        scores: List[float] = []
+        for element in self._vision["elements"]:
+            template = self._templates.get(element["id"])
+            if template is None or not template.trackable:
+                continue
+            x1, y1 = self._to_frame(element["bbox"][:2])
+            found = self._locate(frame, template, x1 + template.offset[0], y1 + template.offset[1])
+            if found is None:
+                return TrackResult(None, 0.0, (0, 0), 0.0)
+            dx, dy, score = found
+            scores.append(score)
+            if score < self.min_confidence:
+                logger.debug(f"元素 {element['id']} 匹配分数 {score:.2f} 低于阈值，回退到完整识别")
+                return TrackResult(None, min(scores), (0, 0), 0.0)
+            shifts[element["id"]] = (dx, dy)
+
+        if not shifts:
+            return TrackResult(None, 0.0, (0, 0), 0.0)
+        confidence = min(scores)
+        shift_x = int(np.median([dx for dx, _ in shifts.values()]))
+        shift_y = int(np.median([dy for _, dy in shifts.values()]))
+
+        height, width = frame.shape
+        # 内部保存未裁剪的位置（下一次跟踪以此为中心），返回给调用方的 bbox 裁剪到画面内
+        elements = []
+        visible = []
+        moved = []
+        for element in self._vision["elements"]:
+            dx, dy = shifts.get(element["id"], (shift_x, shift_y))
+            x1, y1, x2, y2 = element["bbox"]
+            bbox = [x1 + dx / sx, y1 + dy / sy, x2 + dx / sx, y2 + dy / sy]
+            if isinstance(x1, int):
+                bbox = [int(round(value)) for value in bbox]
+            elements.append({**element, "bbox": bbox})
+            limits = (width / sx, height / sy, width / sx, height / sy)
+            visible.append({**element, "bbox": [
+                type(value)(min(max(value, 0), limit)) for value, limit in zip(bbox, limits)
+            ]})
+            if (dx, dy) != (shift_x, shift_y):
+                moved.append((element["bbox"], bbox))
+
+        mask = self._unexplained_change(frame, shift_x, shift_y, moved)
+        if mask is None:
+            return TrackResult(None, confidence, (shift_x, shift_y), 1.0)
+        change = float(mask.mean())
+        if change > self.max_change:
+            logger.debug(f"位移补偿后仍有 {change:.1%} 的像素变化，回退到完整识别")
+            return TrackResult(None, confidence, (shift_x, shift_y), change)
+        region = 0
+        if change:
+            region = max((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in changed_regions(mask, _REGION_TILE))
+        if region > self.max_region:
+            logger.debug(f"位移补偿后出现 {region} 像素的局部变化区域，回退到完整识别")
+            return TrackResult(None, confidence, (shift_x, shift_y), change, region)
+
+        self._frame = frame
+        self._vision = {**self._vision, "elements": elements}
+        if shift_x or shift_y or moved:
+            logger.debug(f"跟踪到 {len(shifts)} 个元素，整体位移 ({shift_x}, {shift_y})，最低分数 {confidence:.2f}")
+        return TrackResult(
+            {**self._vision, "elements": visible},
+            confidence,
+            (shift_x, shift_y),
+            change,
+            region,
+        )
+
+    def _locate(
+        self,
+        frame: np.ndarray,
+        template: Template,
+        x: int,
+        y: int
+    ) -> Optional[Tuple[int, int, float]]:
+        """在 (x, y) 附近搜索模板，返回位移和分数；模板完全移出画面时返回 None"""
+        height, width = frame.shape
+        h, w = template.pixels.shape
+        # 位置未变的元素（静止界面中的大多数）直接命中，不做搜索
+        if 0 <= x and 0 <= y and x + w <= width and y + h <= height:
+            if np.array_equal(frame[y:y + h, x:x + w], template.pixels):
+                return 0, 0, 1.0
+        left, top, right, bottom = self._window(frame, x, y, w, h)
+        if right - left < w or bottom - top < h:
+            return None
+        mx, my, score = match_template(frame[top:bottom, left:right], template.pixels)
+        return left + mx - x, top + my - y, score
+
+    def _window(self, frame: np.ndarray, x: int, y: int, w: int, h: int) -> Tuple[int, int, int, int]:
+        """以 (x, y) 处 w×h 区域为中心、向外扩展 search_radius 的搜索窗口（裁剪到画面内）"""
+        height, width = frame.shape
+        r = self.search_radius
+        return max(0, x - r), max(0, y - r), min(width, x + w + r), min(height, y + h + r)
+
+    def _distinct(self, frame: np.ndarray, pixels: np.ndarray, x: int, y: int) -> bool:
+        """
+        模板在自身搜索窗口内是否唯一：除真实位置附近（±2 像素）外，
+        没有达到 min_confidence 的其他匹配（否则平移后可能被错认到相似位置）
+        """
+        h, w = pixels.shape
+        left, top, right, bottom = self._window(frame, x, y, w, h)
+        scores = ncc_map(frame[top:bottom, left:right], pixels)
+        cx, cy = x - left, y - top
+        scores[max(0, cy - 2):cy + 3, max(0, cx - 2):cx + 3] = -1.0
+        return float(scores.max()) < self.min_confidence
+
+    def _unexplained_change(
+        self,
+        frame: np.ndarray,
+        dx: int,
+        dy: int,
+        moved: List[Tuple[List[float], List[float]]]
+    ) -> Optional[np.ndarray]:
+        """
+        按整体位移对齐前后两帧后，重叠区域内的变化掩码（不含单独移动的元素新旧位置）
+
+        滚动新露出的区域没有可比较的旧像素，不计入（位移不超过 search_radius，露出的只是窄条）。
+
+        Returns:
+            重叠区域大小的布尔掩码；两帧没有重叠时为 None
+        """
+        height, width = frame.shape
+        previous = self._frame
+        x0, x1 = max(0, dx), min(width, width + dx)
+        y0, y1 = max(0, dy), min(height, height + dy)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        mask = np.abs(frame[y0:y1, x0:x1] - previous[y0 - dy:y1 - dy, x0 - dx:x1 - dx]) > self.diff_threshold
+        for old, new in moved:
+            for bbox in (old, new):
+                bx1, by1 = self._to_frame(bbox[:2])
+                bx2, by2 = self._to_frame(bbox[2:])
+                mask[max(0, by1 - y0):max(0, by2 - y0), max(0, bx1 - x0):max(0, bx2 - x0)] = False
+        return mask
+
+    def _cut_template(self, frame: np.ndarray, bbox) -> Optional[Template]:
+        height, width = frame.shape
+        x1, y1 = self._to_frame(bbox[:2])
+        x2, y2 = self._to_frame(bbox[2:])
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(width, x2), min(height, y2)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None
+        w = min(self.patch_size, x2 - x1)
+        h = min(self.patch_size, y2 - y1)
+        px = x1 + (x2 - x1 - w) // 2
+        py = y1 + (y2 - y1 - h) // 2
+        pixels = frame[py:py + h, px:px + w].copy()
+        bx, by = self._to_frame(bbox[:2])
+        trackable = float(pixels.std()) >= self.min_std and self._distinct(frame, pixels, px, py)
+        return Template(pixels, (px - bx, py - by), trackable)
+
+    def _to_frame(self, point) -> Tuple[int, int]:
+        """视觉数据坐标 → 帧像素坐标"""
+        sx, sy = self._scale
+        return int(round(point[0] * sx)), int(round(point[1] * sy))
+
+    @staticmethod
+    def _scale_for(frame: np.ndarray, vision_data: VisionData) -> Tuple[float, float]:
+        """视觉数据的坐标系（resolution）与帧像素的比例"""
+        height, width = frame.shape
+        resolution = vision_data.get("resolution")
+        if not resolution or not resolution[0] or not resolution[1]:
+            return 1.0, 1.0
+        return width / resolution[0], height / resolution[1]
@@ -0,0 +1,274 @@
+# src/desktop_agent/vision/transport.py
+"""
+Grounding HTTP 传输层：长连接池 + 超时 + 带抖动退避的重试
+"""
+import asyncio
+import contextlib
+import logging
+import random
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, ContextManager, Dict, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+
+# 可选依赖：异步 HTTP 客户端
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+class GroundingTransport:
+    """
+    持有一个 requests.Session，所有 Grounding 请求复用 keep-alive 连接
+
+    对连接错误、超时和 5xx 响应进行重试，重试间隔为指数退避 + 全抖动
+    （在 [0, min(backoff_max, backoff * 2^n)] 内均匀随机），避免多个客户端同时重试。
+
+    异步请求的 httpx.AsyncClient 与事件循环绑定，每个事件循环一个；事件循环结束时
+    （asyncio.run 退出前会清理异步生成器）自动关闭，多次 asyncio.run 不会遗留连接池。
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 4,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        backoff_max: float = 8.0,
+        headers: Optional[Dict[str, str]] = None,
+        limiter: Optional[ContextManager] = None,
+    ):
+        """
+        Args:
+            pool_size: 每个主机的连接池大小
+            connect_timeout: 连接超时（秒）
+            read_timeout: 读取超时（秒）
+            max_retries: 最大重试次数（不含首次请求）
+            backoff: 退避基数（秒）
+            backoff_max: 单次退避上限（秒）
+            headers: 每个请求附带的请求头
+            limiter: 同步请求的并发限制器（如多个进程共享的 multiprocessing.Semaphore），每次尝试期间持有
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.limiter = limiter if limiter is not None else contextlib.nullcontext()
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self.pool_size = pool_size
+        self.headers = dict(headers or {})
+        # 事件循环 -> (AsyncClient, 循环结束时关闭它的异步生成器)
+        self._aclients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[Any, Any]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.attempts = 0
+        self.async_attempts = 0
+        self.retries = 0
+        self.failures = 0
+
+    @classmethod
+    def from_config(cls, config, headers: Optional[Dict[str, str]] = None) -> "GroundingTransport":
+        return cls(
+            pool_size=config.grounding_pool_size,
+            connect_timeout=config.grounding_connect_timeout,
+            read_timeout=config.grounding_read_timeout,
+            max_retries=config.grounding_max_retries,
+            backoff=config.grounding_retry_backoff,
+            backoff_max=config.grounding_retry_backoff_max,
+            headers=headers,
+        )
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        """
+        发送 POST 请求，失败时按策略重试
+
+        Args:
+            url: 请求地址
+            **kwargs: 透传给 Session.post 的参数（files、data 等）
+
+        Returns:
+            最后一次请求的响应（重试耗尽后的 5xx 响应也会原样返回，由调用方 raise_for_status）
+
+        Raises:
+            requests.RequestException: 重试耗尽后仍然连接失败或超时
+        """
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout))
+        with self._lock:
+            self.requests += 1
+
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                self.attempts += 1
+            try:
+                with self.limiter:
+                    resp = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                logger.warning(f"Grounding 请求失败（第 {attempt + 1} 次）: {e}，准备重试")
+                self._sleep(attempt)
+                continue
+
+            if resp.status_code >= 500 and attempt < self.max_retries:
+                logger.warning(f"Grounding 服务返回 {resp.status_code}（第 {attempt + 1} 次），准备重试")
+                resp.close()
+                self._sleep(attempt)
+                continue
+            if resp.status_code >= 500:
+                with self._lock:
+                    self.failures += 1
+            return resp
+
+        raise AssertionError("unreachable")
+
+    async def apost(self, url: str, **kwargs: Any) -> "httpx.Response":
+        """
+        异步发送 POST 请求（基于 httpx.AsyncClient），重试策略与 post 相同
+
+        Args:
+            url: 请求地址
+            **kwargs: 透传给 AsyncClient.post 的参数（files、data 等）
+
+        Returns:
+            最后一次请求的响应
+
+        Raises:
+            ImportError: 未安装 httpx
+            httpx.HTTPError: 重试耗尽后仍然连接失败或超时
+        """
+        client = await self._async_client()
+        with self._lock:
+            self.requests += 1
+
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                self.async_attempts += 1
+            try:
+                resp = await client.post(url, **kwargs)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                if attempt >= self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                logger.warning(f"Grounding 请求失败（第 {attempt + 1} 次）: {e}，准备重试")
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+
+            if resp.status_code >= 500 and attempt < self.max_retries:
+                logger.warning(f"Grounding 服务返回 {resp.status_code}（第 {attempt + 1} 次），准备重试")
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+            if resp.status_code >= 500:
+                with self._lock:
+                    self.failures += 1
+            return resp
+
+        raise AssertionError("unreachable")
+
+    async def _async_client(self) -> "httpx.AsyncClient":
+        """获取当前事件循环对应的 AsyncClient（不存在时创建，并登记为在该循环结束时关闭）"""
+        if httpx is None:
+            raise ImportError("异步 Grounding 需要 httpx 库: pip install httpx")
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._aclients.get(loop)
+        if entry is not None:
+            return entry[0]
+        client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+            ),
+        )
+        # 第一次迭代时事件循环登记该生成器，loop.shutdown_asyncgens() 会调用它的 aclose
+        guard = self._close_with_loop(client)
+        await guard.__anext__()
+        with self._lock:
+            self._aclients[loop] = (client, guard)
+        return client
+
+    async def _close_with_loop(self, client: "httpx.AsyncClient") -> AsyncIterator[None]:
+        """挂起直到被关闭（事件循环结束或 aclose），然后在所属事件循环中关闭 client"""
+        try:
+            yield
+        finally:
+            # 不在生成器中引用事件循环本身，否则弱引用字典的键永远不会被回收
+            with self._lock:
+                for loop, (owned, _) in list(self._aclients.items()):
+                    if owned is client:
+                        del self._aclients[loop]
+            await client.aclose()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        with self._lock:
+            self.retries += 1
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    def _sleep(self, attempt: int) -> None:
+        time.sleep(self._backoff_delay(attempt))
+
+    def connections_opened(self) -> int:
+        """连接池累计新建的连接数"""
+        pools = self.adapter.poolmanager.pools
+        total = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                total += pool.num_connections
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        """返回请求、重试和连接复用统计（连接复用只统计同步连接池）"""
+        opened = self.connections_opened()
+        reused = max(0, self.attempts - opened)
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "async_attempts": self.async_attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "connections_opened": opened,
+            "connections_reused": reused,
+            "reuse_rate": reused / self.attempts if self.attempts else 0.0,
+        }
+
+    def close(self) -> None:
+        """关闭连接池"""
+        self.session.close()
+
+    async def aclose(self) -> None:
+        """
+        关闭连接池和当前事件循环的异步客户端
+
+        其他线程中仍在运行的事件循环的客户端在各自的循环中关闭（不等待完成）。
+        """
+        self.session.close()
+        current = asyncio.get_running_loop()
+        with self._lock:
+            entries = list(self._aclients.items())
+        for loop, (_, guard) in entries:
+            if loop is current:
+                await guard.aclose()
+            elif loop.is_running() and not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(guard.aclose(), loop)